@@ -1,15 +1,165 @@
 
 import os
+import re
+import time
+import asyncio
+import sqlite3
 import pandas as pd
 import traceback
-from sqlalchemy import create_engine
+from database import read_engine, read_snapshot
+from columnar import StaleCopy, columnar_enabled, fetch_rows
+from cache import sql_result_cache, SQL_RESULT_CACHE_MAX_ROWS
 from llm_service import LLMService
+from metrics import AGENT_SQL_SECONDS
+
+# Generated SQL gets at most this many rows and this long to run before it is cut off
+AGENT_MAX_ROWS = int(os.getenv("AGENT_MAX_ROWS", "1000"))
+AGENT_QUERY_TIMEOUT_S = float(os.getenv("AGENT_QUERY_TIMEOUT_S", "5"))
+# SQLite VM instructions between deadline checks
+PROGRESS_CHECK_INTERVAL = 10000
+FETCH_BATCH_SIZE = 500
+
+class QueryTimeout(Exception):
+    pass
+
+# Single-quoted SQL string literals, '' being an escaped quote
+SQL_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+
+def normalize_sql(sql: str):
+    """
+    Cache key for a generated query: whitespace collapsed, case folded and trailing semicolons dropped,
+    everywhere except inside string literals, where case and spacing change the meaning.
+    """
+    parts = SQL_STRING_LITERAL.split(sql.strip().rstrip(";").strip())
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part).lower()
+        for i, part in enumerate(parts)
+    )
+
+def execute_bounded(sql: str, max_rows: int = None, timeout_s: float = None, engine=read_engine, generation: int = None, connection=None):
+    """
+    Run one generated SELECT with a row cap and a wall-clock limit.
+    The statement is wrapped in an outer LIMIT of max_rows + 1, so SQLite stops producing rows
+    past the cap whatever LIMIT the model wrote; the extra row only tells us the result was cut.
+    Runs on a pooled read-only connection (mode=ro, query_only), so generated SQL can never write,
+    or on the DuckDB copy of that generation's data when ANALYTICS_ENGINE=duckdb.
+    connection is a DBAPI connection to run on (from read_snapshot) instead of one from engine's pool.
+    Returns (DataFrame of at most max_rows rows, truncated).
+    """
+    max_rows = AGENT_MAX_ROWS if max_rows is None else max_rows
+    timeout_s = AGENT_QUERY_TIMEOUT_S if timeout_s is None else timeout_s
+    statement = sql.strip().rstrip(";").strip()
+    if not re.match(r"^(select|with)\b", statement, re.IGNORECASE):
+        raise ValueError("Only SELECT queries can be run against the trial database.")
+
+    if generation is not None and columnar_enabled():
+        started = time.perf_counter()
+        try:
+            columns, rows = fetch_rows(statement, max_rows + 1, timeout_s, generation)
+            AGENT_SQL_SECONDS.labels(engine="duckdb", outcome="ok").observe(time.perf_counter() - started)
+            return pd.DataFrame.from_records(rows[:max_rows], columns=columns), len(rows) > max_rows
+        except TimeoutError:
+            AGENT_SQL_SECONDS.labels(engine="duckdb", outcome="timeout").observe(time.perf_counter() - started)
+            raise QueryTimeout(f"Query stopped after exceeding the {timeout_s:g}s time limit.")
+        except StaleCopy:
+            # Ingestion moved on during this query's snapshot; only SQLite still has that generation's data
+            pass
+        except Exception as e:
+            AGENT_SQL_SECONDS.labels(engine="duckdb", outcome="error").observe(time.perf_counter() - started)
+            # Generated SQL is written for SQLite; anything DuckDB can't run goes there instead
+            print(f"⚠️ Columnar engine failed, running on SQLite: {str(e).splitlines()[0]}")
+
+    pooled = engine.raw_connection() if connection is None else None
+    conn = connection if connection is not None else pooled.driver_connection
+    deadline = time.monotonic() + timeout_s
+    # Returning non-zero from the handler makes SQLite abort the statement with "interrupted"
+    conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, PROGRESS_CHECK_INTERVAL)
+    cursor = conn.cursor()
+    # The raw connection bypasses the engine's query timing events, so it's timed here
+    started, outcome = time.perf_counter(), "error"
+    try:
+        # The newline ends a trailing "-- comment" before the closing paren
+        cursor.execute(f"SELECT * FROM ({statement}\n) LIMIT ?", (max_rows + 1,))
+        columns = [column[0] for column in cursor.description]
+        rows = []
+        while len(rows) <= max_rows:
+            batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not batch:
+                break
+            rows.extend(batch)
+        outcome = "ok"
+    except sqlite3.OperationalError as e:
+        if "interrupted" in str(e):
+            outcome = "timeout"
+            raise QueryTimeout(f"Query stopped after exceeding the {timeout_s:g}s time limit.")
+        raise
+    finally:
+        # Closing the cursor ends its read snapshot, which would otherwise hold back WAL checkpoints
+        cursor.close()
+        conn.set_progress_handler(None, 0)
+        if pooled is not None:
+            pooled.close()
+        AGENT_SQL_SECONDS.labels(engine="sqlite", outcome=outcome).observe(time.perf_counter() - started)
+
+    truncated = len(rows) > max_rows
+    return pd.DataFrame.from_records(rows[:max_rows], columns=columns), truncated
+
+def summarize_result(df: pd.DataFrame, truncated: bool = False):
+    """Preview rows and chart config for a query result; what the agent caches instead of the DataFrame."""
+    if df.empty:
+        return {"rows": 0, "data": [], "chart_type": None, "chart_data": None, "truncated": False, "row_limit": AGENT_MAX_ROWS}
+
+    data_records = df.head(10).to_dict(orient="records")
+
+    # Visualization Config (Heuristic for now)
+    chart_type = None
+    chart_data = None
+
+    # If the result has 'count' and multiple rows, it's likely a bar/pie chart
+    if 'count' in df.columns or df.shape[1] == 2:
+        if df.shape[0] > 1:
+            chart_type = 'bar'
+            # Assume first column is category, second is value
+            label_col = df.columns[0]
+            value_col = df.columns[1]
+            chart_data = dict(zip(df[label_col].astype(str), df[value_col].tolist()))
+
+    return {
+        "rows": len(df), "data": data_records, "chart_type": chart_type, "chart_data": chart_data,
+        "truncated": truncated, "row_limit": AGENT_MAX_ROWS,
+    }
 
 class ClinicalAgent:
-    def __init__(self, db_path="sqlite:///./clinical_trials.db"):
-        self.engine = create_engine(db_path)
-        self.llm = LLMService()
+    def __init__(self, llm: LLMService = None, engine=read_engine):
+        # Shares the app's read-only pool instead of opening its own engine on the same file
+        self.engine = engine
+        self.llm = llm or LLMService()
+
+    def run_sql(self, sql_query: str):
+        """
+        Execute generated SQL and summarize the result, served from sql_result_cache when the same
+        query already ran against the current data generation.
+        The generation and the query are read in one snapshot, so a result is never cached under a
+        generation other than the one whose data it was computed from.
+        """
+        def execute():
+            df, truncated = execute_bounded(sql_query, engine=self.engine, generation=generation, connection=conn)
+            return summarize_result(df, truncated)
+
+        with read_snapshot(self.engine) as (conn, generation):
+            return sql_result_cache.get_or_compute(
+                normalize_sql(sql_query), generation, execute,
+                should_store=lambda result: result["rows"] <= SQL_RESULT_CACHE_MAX_ROWS
+            )
     
+    def run_generated_sql(self, user_query: str, sql_query: str):
+        """run_sql for the model's SQL; if it fails to run, it is dropped from the LLM cache."""
+        try:
+            return self.run_sql(sql_query)
+        except Exception:
+            self.llm.forget_sql(user_query)
+            raise
+
     def query(self, user_query: str):
         print(f"🤖 User Query: {user_query}")
         
@@ -19,50 +169,65 @@ class ClinicalAgent:
         
         try:
             # 2. Execute SQL
-            with self.engine.connect() as conn:
-                df = pd.read_sql(sql_query, conn)
-                
-            if df.empty:
-                 return {
-                    "answer": "Analysis complete. No matching records were found in the current dataset.",
-                    "data": [],
-                    "sql": sql_query
-                }
+            result = self.run_generated_sql(user_query, sql_query)
+            if result["rows"] == 0:
+                return self.empty_answer(sql_query)
             
             # 3. Generate Scientific Insight
-            data_records = df.head(10).to_dict(orient="records")
-            insight = self.llm.generate_insight(data_records, user_query)
-            
-            # 4. Generate Visualization Config (Heuristic for now)
-            chart_type = None
-            chart_data = None
-            
-            # If the result has 'count' and multiple rows, it's likely a bar/pie chart
-            if 'count' in df.columns or df.shape[1] == 2:
-                if df.shape[0] > 1:
-                    chart_type = 'bar'
-                    # Assume first column is category, second is value
-                    label_col = df.columns[0]
-                    value_col = df.columns[1]
-                    chart_data = dict(zip(df[label_col].astype(str), df[value_col]))
-
-            return {
-                "answer": insight,
-                "data": data_records,
-                "chart_type": chart_type,
-                "chart_data": chart_data,
-                "sql": sql_query
-            }
-            
+            insight = self.llm.generate_insight(result["data"], user_query)
+            return self.answer(sql_query, result, insight)
+        except Exception as e:
+            return self.error_answer(sql_query, e)
+
+    async def aquery(self, user_query: str):
+        """
+        query() for async handlers: model calls go through the LLM service's async path
+        (bounded concurrency, timeouts, shared in-flight calls) and SQL runs on a worker thread.
+        """
+        print(f"🤖 User Query: {user_query}")
+        sql_query = await self.llm.agenerate_sql(user_query)
+        print(f"📝 Generated SQL: {sql_query}")
+
+        try:
+            result = await asyncio.to_thread(self.run_generated_sql, user_query, sql_query)
+            if result["rows"] == 0:
+                return self.empty_answer(sql_query)
+            insight = await self.llm.agenerate_insight(result["data"], user_query)
+            return self.answer(sql_query, result, insight)
         except Exception as e:
-            print(f"❌ Execution Error: {e}")
-            print(f"❌ SQL: {sql_query}")
-            traceback.print_exc()
-            return {
-                "answer": f"I attempted to analyze the data but encountered a query error. \n\nGenerated SQL: `{sql_query}` \n\nError: {str(e)}",
-                "data": []
-            }
+            return self.error_answer(sql_query, e)
+
+    def answer(self, sql_query, result, insight):
+        return {
+            "answer": insight,
+            "data": result["data"],
+            "chart_type": result["chart_type"],
+            "chart_data": result["chart_data"],
+            "sql": sql_query,
+            "row_count": result["rows"],
+            "truncated": result["truncated"],
+            "row_limit": result["row_limit"]
+        }
+
+    def empty_answer(self, sql_query):
+        return {
+            "answer": "Analysis complete. No matching records were found in the current dataset.",
+            "data": [],
+            "sql": sql_query
+        }
+
+    def error_answer(self, sql_query, e):
+        print(f"❌ Execution Error: {e}")
+        print(f"❌ SQL: {sql_query}")
+        traceback.print_exc()
+        return {
+            "answer": f"I attempted to analyze the data but encountered a query error. \n\nGenerated SQL: `{sql_query}` \n\nError: {str(e)}",
+            "data": []
+        }
 
     def get_summary(self):
         # Fallback to simple summary if needed
         return self.query("summarize the count of all records")
+
+    async def aget_summary(self):
+        return await self.aquery("summarize the count of all records")
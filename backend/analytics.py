@@ -2,38 +2,27 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 import models
+from keys import canonical_key
+import numpy as np
 import pandas as pd
 import random
 from typing import List, Dict
 
-def calculate_study_health_score(db: Session, study_id: str = None):
+def study_health_score(sae_total: int, sae_pending: int, missing_total: int):
     # Heuristic scoring model (0-100)
     # 1. SAE Pending Review Ratio (Lower is better)
     # 2. Missing Pages per active subject (Lower is better)
-    
-    query_sae = db.query(models.SAEMetrics)
-    query_missing = db.query(models.MissingPages)
-    
-    if study_id:
-        query_sae = query_sae.filter(models.SAEMetrics.study_id == study_id)
-        query_missing = query_missing.filter(models.MissingPages.study_id == study_id)
 
-    df_sae = pd.read_sql(query_sae.statement, db.bind)
-    df_missing = pd.read_sql(query_missing.statement, db.bind)
-    
     # Calculate SAE Component
-    if not df_sae.empty:
-        total_saes = len(df_sae)
-        pending = len(df_sae[df_sae['review_status'] != 'Reviewed'])
-        sae_score = max(0, 100 - (pending / total_saes * 50)) # Penalty up to 50 points
+    if sae_total:
+        sae_score = max(0, 100 - (sae_pending / sae_total * 50)) # Penalty up to 50 points
     else:
         sae_score = 100
 
     # Calculate Missing Pages Component
-    if not df_missing.empty:
-        total_missing = len(df_missing)
+    if missing_total:
         # Normalize by assuming 100 subjects for demo purposes if not known
-        missing_density = total_missing / 100 
+        missing_density = missing_total / 100 
         missing_score = max(0, 100 - (missing_density * 2)) # 2 points penalty per missing page/subject ratio unit
     else:
         missing_score = 100
@@ -41,12 +30,33 @@ def calculate_study_health_score(db: Session, study_id: str = None):
     final_score = (sae_score * 0.4) + (missing_score * 0.6)
     return int(final_score)
 
+def calculate_study_health_score(db: Session, study_id: str = None):
+    # Read from study_health_summary, which ingestion keeps current (see rollups.py)
+    query = db.query(
+        func.coalesce(func.sum(models.StudyHealthSummary.sae_count), 0),
+        func.coalesce(func.sum(models.StudyHealthSummary.sae_pending), 0),
+        func.coalesce(func.sum(models.StudyHealthSummary.missing_pages), 0)
+    )
+    if study_id:
+        query = query.filter(models.StudyHealthSummary.study_id == study_id)
+    sae_total, sae_pending, missing_total = query.one()
+    return study_health_score(sae_total, sae_pending, missing_total)
+
+def calculate_study_health_scores(db: Session):
+    # Every study's score in one query; the per-study score is stored when its rollup is refreshed
+    rows = db.query(
+        models.StudyHealthSummary.study_id,
+        models.StudyHealthSummary.health_score
+    ).order_by(models.StudyHealthSummary.study_id).all()
+    return {study_id: score for study_id, score in rows}
+
 def calculate_data_quality_index(db: Session, site_number: str):
     # DQI = Weighted average of core quality metrics (0-100)
     # Weights: Missing Pages (40%), Query Latency (30%), SAE Conformity (30%)
     
     # 1. Missing Pages Score
-    missing_count = db.query(models.MissingPages).filter(models.MissingPages.site_number == site_number).count()
+    site_key = canonical_key(site_number)
+    missing_count = db.query(models.MissingPages).filter(models.MissingPages.site_key == site_key).count()
     # Benchmark: > 10 missing pages is 0 score. 0 missing is 100.
     missing_score = max(0, 100 - (missing_count * 10))
     
@@ -57,11 +67,11 @@ def calculate_data_quality_index(db: Session, site_number: str):
     
     # 3. SAE Conformity
     # Ratio of Reviewed SAEs vs Total
-    sae_total = db.query(models.SAEMetrics).filter(models.SAEMetrics.site.contains(site_number)).count()
+    sae_total = db.query(models.SAEMetrics).filter(models.SAEMetrics.site_key == site_key).count()
     if sae_total == 0:
         sae_score = 100
     else:
-        pending = db.query(models.SAEMetrics).filter(models.SAEMetrics.site.contains(site_number), models.SAEMetrics.review_status != 'Reviewed').count()
+        pending = db.query(models.SAEMetrics).filter(models.SAEMetrics.site_key == site_key, models.SAEMetrics.review_status != 'Reviewed').count()
         sae_score = int(((sae_total - pending) / sae_total) * 100)
     
     dqi = (missing_score * 0.4) + (latency_score * 0.3) + (sae_score * 0.3)
@@ -70,117 +80,187 @@ def calculate_data_quality_index(db: Session, site_number: str):
 def get_risk_heatmap_data(db: Session):
     # Aggregate missing pages by Site and Country
     # Used for Dashboard Heatmap
+    summary = models.SiteRiskSummary
+    missing_cnt = func.sum(summary.missing_pages)
     results = db.query(
-        models.MissingPages.site_number, 
-        func.count(models.MissingPages.id).label('missing_count')
-    ).group_by(models.MissingPages.site_number).order_by(func.count(models.MissingPages.id).desc()).limit(10).all()
+        func.min(summary.site_number), 
+        missing_cnt.label('missing_count')
+    ).group_by(summary.site_key).having(missing_cnt > 0).order_by(missing_cnt.desc()).limit(10).all()
     
     return [{"site": r[0], "risk_score": r[1]} for r in results]
 
+def get_site_risk_frame(db: Session):
+    """
+    Missing pages, SAE totals and pending SAEs for every study site with missing pages.
+    Reads the site_risk_summary rollup, one row per study and site, so cost follows the number
+    of sites rather than the number of raw rows. Sites are matched on the canonical site_key.
+    """
+    summary = models.SiteRiskSummary
+    missing_cnt = func.sum(summary.missing_pages)
+    query = db.query(
+        summary.study_id,
+        summary.site_key,
+        func.min(summary.site_number).label('site_number'),
+        missing_cnt.label('missing_cnt'),
+        func.sum(summary.sae_count).label('sae_count'),
+        func.sum(summary.sae_pending).label('sae_pending')
+    ).group_by(summary.study_id, summary.site_key).having(missing_cnt > 0).order_by(missing_cnt.desc(), summary.study_id, summary.site_key)
+
+    return pd.read_sql(query.statement, db.bind)
+
+def score_sites(df_sites: pd.DataFrame):
+    """Vectorized risk level, DQI and recommendation for every row of get_site_risk_frame()."""
+    n = len(df_sites)
+    missing = df_sites['missing_cnt'].to_numpy()
+    sae_count = df_sites['sae_count'].to_numpy()
+    sae_pending = df_sites['sae_pending'].to_numpy()
+
+    # Mocking Latency data
+    latency = np.random.randint(2, 16, n)
+
+    # Determine Risk
+    risk_score = (missing * 0.5) + (sae_count * 2) + (latency * 10)
+    risk_level = np.select([risk_score > 100, risk_score > 50], ["High", "Medium"], "Low")
+
+    # DQI, same weights as calculate_data_quality_index
+    missing_score = np.maximum(0, 100 - (missing * 10))
+    latency_score = np.maximum(0, 100 - (np.random.randint(1, 11, n) * 5))
+    reviewed_ratio = np.divide(sae_count - sae_pending, sae_count, out=np.ones(n), where=sae_count > 0)
+    sae_score = (reviewed_ratio * 100).astype(int)
+    dqi = ((missing_score * 0.4) + (latency_score * 0.3) + (sae_score * 0.3)).astype(int)
+
+    return pd.DataFrame({
+        # A site can take part in more than one study; id tells its rows apart
+        "id": df_sites['study_id'].astype(str) + "/" + df_sites['site_key'].astype(str),
+        "site": df_sites['site_number'],
+        "country": "USA", # Placeholder/Mock or lookup if available
+        "study_id": df_sites['study_id'],
+        "sae_count": sae_count,
+        "missing_pages": missing,
+        "query_latency": latency,
+        "risk_level": risk_level,
+        "dqi": dqi,
+        "recommendation": [generate_recommendation(r, m, s) for r, m, s in zip(risk_level, missing, sae_count)],
+    })
+
 def get_detailed_risk_data(db: Session):
     # For Risk Monitor Table
     # Returns: Site, Country, SAE Count, Missing Pages, Avg Query Latency (Mocked), Risk Level
-    
-    # 1. Get Top Sites by missing pages
-    top_sites_query = db.query(
-        models.MissingPages.site_number, 
-        func.count(models.MissingPages.id).label('missing_cnt')
-    ).group_by(models.MissingPages.site_number).order_by(func.count(models.MissingPages.id).desc()).limit(20)
-    
-    df_sites = pd.read_sql(top_sites_query.statement, db.bind)
-    
-    results = []
-    for _, row in df_sites.iterrows():
-        site = row['site_number']
-        missing = row['missing_cnt']
-        
-        # Get SAEs for this site (approximate match since SAE file might have slightly different site naming format, but we try)
-        # In this demo dataset, SAE file has 'Site' column. 
-        sae_count = db.query(models.SAEMetrics).filter(models.SAEMetrics.site.contains(site)).count()
-        
-        # Mocking Latency data
-        latency = random.randint(2, 15)
-        
-        # Determine Risk
-        risk_score = (missing * 0.5) + (sae_count * 2) + (latency * 10)
-        risk_level = "High" if risk_score > 100 else "Medium" if risk_score > 50 else "Low"
-        
-        # Deterministic Mock Study ID based on site number hash or similar
-        # Studies: Study 101 (Oncology), Study 202 (Cardio), Study 303 (Neuro)
-        study_map = ["Study 101 (Oncology)", "Study 202 (Cardio)", "Study 303 (Neuro)"]
-        study_id = study_map[hash(site) % 3]
-
-        results.append({
-            "site": site,
-            "country": "USA", # Placeholder/Mock or lookup if available
-            "study_id": study_id,
-            "sae_count": sae_count,
-            "missing_pages": missing,
-            "query_latency": latency,
-            "risk_level": risk_level,
-            "dqi": calculate_data_quality_index(db, site),
-            "recommendation": generate_recommendation(risk_level, missing, sae_count)
-        })
-        
-    return results
+    # One grouped query for all sites, then scored in bulk, so cost doesn't grow with round trips per site
+    df_sites = get_site_risk_frame(db)
+    if df_sites.empty:
+        return []
+    return score_sites(df_sites).to_dict(orient="records")
+
+# Fields the risk monitor can be sorted on; ties are broken by site
+RISK_SORT_FIELDS = ("site", "dqi", "sae_count", "missing_pages", "query_latency", "risk_level")
+
+def filter_risk_data(risk_data: List[Dict], risk_levels: List[str] = None, study: str = None, country: str = None,
+                     dqi_min: int = None, dqi_max: int = None, search: str = None):
+    # Server-side version of the Risk Monitor's search box and filters
+    search = search.lower() if search else None
+    levels = {level.lower() for level in risk_levels} if risk_levels else None
+
+    def matches(site):
+        if levels and str(site["risk_level"]).lower() not in levels:
+            return False
+        if study and site["study_id"] != study:
+            return False
+        if country and str(site["country"]).lower() != country.lower():
+            return False
+        if dqi_min is not None and site["dqi"] < dqi_min:
+            return False
+        if dqi_max is not None and site["dqi"] > dqi_max:
+            return False
+        if search:
+            return any(search in str(site[field] or "").lower() for field in ("site", "country", "risk_level"))
+        return True
+
+    return [site for site in risk_data if matches(site)]
+
+def get_sites_patients_data(db: Session, site_numbers: List[str]):
+    """
+    Patient-level drill-down for several sites at once, keyed by the requested site number.
+    Uses a fixed number of grouped queries however many sites or subjects are involved.
+    """
+    site_numbers = list(dict.fromkeys(site_numbers))
+    if not site_numbers:
+        return {}
+    # Requests carry the displayed site number; every lookup below is an exact match on its canonical key
+    site_keys = {site: canonical_key(site) for site in site_numbers}
+    key_list = list(set(site_keys.values()))
+
+    # 1. Subjects from EDC Metrics (Single Source of Truth for Subjects)
+    subjects = db.query(
+        models.EDCMetrics.id, models.EDCMetrics.site_key, models.EDCMetrics.subject_key, models.EDCMetrics.subject_id,
+        models.EDCMetrics.subject_status, models.EDCMetrics.latest_visit
+    ).filter(models.EDCMetrics.site_key.in_(key_list)).order_by(models.EDCMetrics.id).all()
+
+    # 2. Missing pages per subject; also the fallback subject list for sites with no EDC entries
+    missing_rows = db.query(
+        models.MissingPages.site_key, models.MissingPages.subject_key,
+        func.min(models.MissingPages.subject_name), func.count(models.MissingPages.id), func.min(models.MissingPages.id)
+    ).filter(models.MissingPages.site_key.in_(key_list)).group_by(
+        models.MissingPages.site_key, models.MissingPages.subject_key
+    ).all()
+    missing_counts = {(site_key, subject_key): count for site_key, subject_key, _, count, _ in missing_rows}
 
+    # 3. Pending SAEs per subject
+    sae_rows = db.query(
+        models.SAEMetrics.site_key, models.SAEMetrics.subject_key,
+        func.count(models.SAEMetrics.id)
+    ).filter(
+        models.SAEMetrics.site_key.in_(key_list),
+        models.SAEMetrics.review_status != 'Reviewed'
+    ).group_by(models.SAEMetrics.site_key, models.SAEMetrics.subject_key).all()
+    sae_pending = {(site_key, subject_key): count for site_key, subject_key, count in sae_rows}
+
+    subjects_by_key = {site_key: [] for site_key in key_list}
+    # Subject ids repeat within a site (across studies, re-entered rows), so each patient row also
+    # carries the id of the row it came from, unique within the site, for paging to break ties on
+    for row_id, site_key, subject_key, subject_id, subject_status, latest_visit in subjects:
+        subjects_by_key[site_key].append((row_id, subject_key, subject_id, subject_status, latest_visit))
+    # If no EDC entries, infer subjects from MissingPages for robustness in this demo
+    keys_without_edc = {site_key for site_key, site_subjects in subjects_by_key.items() if not site_subjects}
+    for site_key, subject_key, subject_name, _, row_id in missing_rows:
+        if site_key in keys_without_edc:
+            subjects_by_key[site_key].append((row_id, subject_key, subject_name, "Active", None))
+
+    results = {}
+    for site, site_key in site_keys.items():
+        site_subjects = subjects_by_key[site_key]
+        patient_data = []
+        clean_count = 0
+        for row_id, subject_key, sub_id, status, latest_visit in site_subjects:
+            missing_count = missing_counts.get((site_key, subject_key), 0)
+            pending = sae_pending.get((site_key, subject_key), 0)
+            is_clean = (missing_count == 0) and (pending == 0)
+            if is_clean:
+                clean_count += 1
+            patient_data.append({
+                "id": row_id,
+                "subject_id": sub_id,
+                "status": status,
+                "is_clean": is_clean,
+                "missing_pages": missing_count,
+                "sae_pending": pending,
+                "last_visit": latest_visit or "N/A"
+            })
+
+        total_count = len(site_subjects)
+        results[site] = {
+            "site_id": site,
+            "total_patients": total_count,
+            "clean_patient_count": clean_count,
+            "clean_patient_rate": int((clean_count/total_count * 100) if total_count > 0 else 100),
+            "topics": patient_data
+        }
     return results
 
 def get_site_patients_data(db: Session, site_number: str):
     # Aggregates data to form a Patient-Level view for a specific site
     # Determines "Clean Patient" status: No Missing Pages AND No Pending SAEs
-    
-    # 1. Get all subjects for this site from EDC Metrics (Single Source of Truth for Subjects)
-    # If EDC metrics is empty for this site, we might fallback to other tables, but let's assume EDC is populated
-    subjects = db.query(models.EDCMetrics).filter(models.EDCMetrics.site_id == site_number).all()
-    
-    # If no EDC entries, try to infer from MissingPages or SAEs for robustness in this demo
-    if not subjects:
-        # distinct subjects from missing pages
-        distinct_missing = db.query(models.MissingPages.subject_name).filter(models.MissingPages.site_number == site_number).distinct().all()
-        # Create mock objects
-        subjects = [models.EDCMetrics(subject_id=r[0], subject_status="Active") for r in distinct_missing]
-
-    patient_data = []
-    clean_count = 0
-    total_count = len(subjects)
-
-    for sub in subjects:
-        sub_id = sub.subject_id
-        
-        # Check Missing Pages
-        missing_count = db.query(models.MissingPages).filter(
-            models.MissingPages.site_number == site_number, 
-            models.MissingPages.subject_name == sub_id
-        ).count()
-        
-        # Check SAEs
-        sae_pending = db.query(models.SAEMetrics).filter(
-            models.SAEMetrics.site.contains(site_number),
-            models.SAEMetrics.patient_id == sub_id,
-            models.SAEMetrics.review_status != 'Reviewed'
-        ).count()
-        
-        is_clean = (missing_count == 0) and (sae_pending == 0)
-        if is_clean:
-            clean_count += 1
-            
-        patient_data.append({
-            "subject_id": sub_id,
-            "status": sub.subject_status,
-            "is_clean": is_clean,
-            "missing_pages": missing_count,
-            "sae_pending": sae_pending,
-            "last_visit": sub.latest_visit or "N/A"
-        })
-        
-    return {
-        "site_id": site_number,
-        "total_patients": total_count,
-        "clean_patient_count": clean_count,
-        "clean_patient_rate": int((clean_count/total_count * 100) if total_count > 0 else 100),
-        "topics": patient_data
-    }
+    return get_sites_patients_data(db, [site_number])[site_number]
 
 def generate_recommendation(risk, missing, sae):
     if risk == "High":
@@ -200,11 +280,3 @@ def get_sae_trend(db: Session):
     months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun"]
     values = [12, 19, 3, 5, 2, 30] # Mock data for the visual boost
     return [{"month": m, "sae_count": v} for m, v in zip(months, values)]
-
-def get_generated_reports():
-    # Mock list of available reports
-    return [
-        {"id": 1, "title": "Protocol Deviation Summary - Q3", "date": "2025-10-15", "type": "Compliance", "status": "Ready"},
-        {"id": 2, "title": "Safety Signal Detection - Site 404", "date": "2025-11-01", "type": "Safety", "status": "Ready"},
-        {"id": 3, "title": "Missing Data Trends - Global", "date": "2025-11-10", "type": "Data Quality", "status": "Processing"}
-    ]
@@ -0,0 +1,86 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+# Compares agent-style ad-hoc queries on SQLite against the DuckDB columnar copy.
+# Works on a scaled-up throwaway copy of the bundled database: every row is repeated --scale
+# times under a different study id, so per-study groupings grow along with the row counts.
+
+parser = argparse.ArgumentParser(description="Benchmark agent SQL on SQLite vs the DuckDB columnar copy")
+parser.add_argument("--scale", type=int, default=50, help="copies of every row in the benchmark database")
+parser.add_argument("--repeat", type=int, default=3, help="runs per query; the best is reported")
+args = parser.parse_args()
+
+source_db = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clinical_trials.db")
+bench_db = os.path.join(tempfile.mkdtemp(prefix="bench_columnar_"), "bench.db")
+shutil.copy(source_db, bench_db)
+os.environ["DATABASE_URL"] = f"sqlite:///{bench_db}"
+os.environ["ANALYTICS_ENGINE"] = "duckdb"
+
+from sqlalchemy import text
+from database import engine, read_snapshot
+from migrations import run_migrations
+from agent import execute_bounded
+import columnar
+
+QUERIES = {
+    "SAEs per site per study": "SELECT study_id, site, count(*) AS count FROM sae_metrics GROUP BY study_id, site ORDER BY count DESC",
+    "pending SAEs by site": "SELECT site, count(*) AS count FROM sae_metrics WHERE review_status != 'Reviewed' OR review_status IS NULL GROUP BY site ORDER BY count DESC LIMIT 5",
+    "missing pages by subject": "SELECT site_number, subject_name, count(*) AS pages, avg(missing_days) AS avg_days FROM missing_pages GROUP BY site_number, subject_name ORDER BY pages DESC LIMIT 20",
+    "subjects with missing pages": (
+        "SELECT e.study_id, e.site_key, count(DISTINCT e.subject_key) AS subjects, count(m.id) AS missing "
+        "FROM edc_metrics e JOIN missing_pages m ON m.study_id = e.study_id AND m.site_key = e.site_key AND m.subject_key = e.subject_key "
+        "GROUP BY e.study_id, e.site_key ORDER BY missing DESC LIMIT 20"
+    ),
+    "full table scan": "SELECT count(*) AS count, count(DISTINCT patient_id) AS patients FROM sae_metrics",
+}
+
+def scale_up(copies: int):
+    with engine.begin() as conn:
+        for table in ("sae_metrics", "missing_pages", "edc_metrics"):
+            columns = [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})") if row[1] != "id"]
+            selected = ", ".join(f"study_id || '_' || :copy" if column == "study_id" else column for column in columns)
+            original = conn.execute(text(f"SELECT max(id) FROM {table}")).scalar() or 0
+            for copy in range(1, copies):
+                conn.execute(
+                    text(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {selected} FROM {table} WHERE id <= :original"),
+                    {"copy": copy, "original": original}
+                )
+
+def best_of(fn, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+if __name__ == "__main__":
+    if not columnar.HAS_DUCKDB:
+        raise SystemExit("duckdb is not installed")
+
+    run_migrations(engine)
+    start = time.perf_counter()
+    scale_up(args.scale)
+    with engine.connect() as conn:
+        counts = {t: conn.execute(text(f"SELECT count(*) FROM {t}")).scalar() for t in ("sae_metrics", "missing_pages", "edc_metrics")}
+    print(f"Scaled x{args.scale} in {time.perf_counter() - start:.1f}s: {counts}")
+
+    with read_snapshot() as (_, generation):
+        pass
+    with columnar.columnar_store.cursor(generation):
+        pass
+    print(f"Columnar copy built in {columnar.columnar_store.load_seconds}s\n")
+
+    print(f"{'query':<30}{'rows':>8}{'sqlite ms':>12}{'duckdb ms':>12}{'speedup':>10}")
+    for name, sql in QUERIES.items():
+        sqlite_df, _ = execute_bounded(sql, max_rows=100000, timeout_s=60)
+        duck_df, _ = execute_bounded(sql, max_rows=100000, timeout_s=60, generation=generation)
+        assert len(sqlite_df) == len(duck_df), name
+        sqlite_ms = best_of(lambda: execute_bounded(sql, max_rows=100000, timeout_s=60), args.repeat)
+        duck_ms = best_of(lambda: execute_bounded(sql, max_rows=100000, timeout_s=60, generation=generation), args.repeat)
+        print(f"{name:<30}{len(sqlite_df):>8}{sqlite_ms:>12.1f}{duck_ms:>12.1f}{sqlite_ms / duck_ms:>9.1f}x")
+
+    shutil.rmtree(os.path.dirname(bench_db), ignore_errors=True)
@@ -0,0 +1,197 @@
+import os
+import json
+import math
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+
+# In-process load test: virtual users replay the frontend's page loads against the ASGI app through
+# httpx's ASGI transport, with a stub LLM that answers after a fixed delay. No server, no network,
+# no API key. Runs on a throwaway copy of the database, LLM cache and report store.
+
+parser = argparse.ArgumentParser(description="Drive the API with concurrent page loads and report latency percentiles")
+parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+parser.add_argument("--loads", type=int, default=10, help="page loads per user")
+parser.add_argument("--mix", default="overview=50,risk_monitor=25,site_details=15,chat=5,reports=5",
+                    help="page load weights, e.g. overview=1 for only the Overview page")
+parser.add_argument("--think-ms", type=float, default=0, help="pause between a user's page loads")
+parser.add_argument("--llm-latency-ms", type=float, default=800, help="stub model response time")
+parser.add_argument("--no-llm-cache", action="store_true", help="send every prompt to the stub model")
+parser.add_argument("--database", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "clinical_trials.db"),
+                    help="database to copy and run against")
+parser.add_argument("--seed", type=int, default=7)
+parser.add_argument("--json", help="also write the results to this file")
+args = parser.parse_args()
+
+scratch = tempfile.mkdtemp(prefix="bench_load_")
+shutil.copy(args.database, os.path.join(scratch, "load.db"))
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch, 'load.db')}"
+os.environ["LLM_CACHE_PATH"] = os.path.join(scratch, "llm_cache.sqlite")
+os.environ["REPORT_STORE_DIR"] = os.path.join(scratch, "reports")
+if args.no_llm_cache:
+    os.environ["LLM_CACHE_MAX_ENTRIES"] = "0"
+
+import httpx
+import main
+from llm_service import LLMService
+
+CHAT_QUESTIONS = [
+    "Which sites have the most missing pages?",
+    "How many SAEs are pending review?",
+    "Show SAE counts by site",
+    "Show EDC subject status",
+    "Total SAE count",
+]
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Answers like the offline templates would, after latency_s, without leaving the process."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.calls = 0
+        self.offline = LLMService(model=None)
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        if "Query: " in prompt:
+            return Response(self.offline._mock_text_to_sql(prompt.rsplit("Query: ", 1)[-1]))
+        return Response("Stub insight: the result shows a concentration of open items at a few sites.")
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception as e:
+            print(f"❌ {label}: {e!r}")
+            ok = False
+        self.latencies[label].append(time.perf_counter() - start)
+        if not ok:
+            self.errors[label] += 1
+
+async def overview(client, recorder, rng, sites):
+    # Overview.jsx fires these four at once
+    await asyncio.gather(
+        recorder.request(client, "GET /stats", "GET", "/stats"),
+        recorder.request(client, "GET /analytics/risk", "GET", "/analytics/risk"),
+        recorder.request(client, "GET /analytics/score", "GET", "/analytics/score"),
+        recorder.request(client, "GET /analytics/trend", "GET", "/analytics/trend"),
+    )
+
+async def risk_monitor(client, recorder, rng, sites):
+    sort = rng.choice(["dqi", "site", "sae_count", "missing_pages"])
+    await recorder.request(client, "GET /analytics/risk-monitor", "GET", f"/analytics/risk-monitor?limit=50&sort={sort}&order=asc")
+
+async def site_details(client, recorder, rng, sites):
+    site = rng.choice(sites)
+    await asyncio.gather(
+        recorder.request(client, "GET /sites/{site}/patients", "GET", f"/sites/{site}/patients?limit=50"),
+        recorder.request(client, "GET /sites/{site}/comments", "GET", f"/sites/{site}/comments?limit=20"),
+    )
+
+async def chat(client, recorder, rng, sites):
+    await recorder.request(client, "POST /chat", "POST", "/chat", json={"query": rng.choice(CHAT_QUESTIONS)})
+
+async def reports(client, recorder, rng, sites):
+    await recorder.request(client, "GET /reports", "GET", "/reports")
+
+PAGE_LOADS = {"overview": overview, "risk_monitor": risk_monitor, "site_details": site_details, "chat": chat, "reports": reports}
+
+def parse_mix(mix: str):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in PAGE_LOADS:
+            raise SystemExit(f"Unknown page load '{name}'; choose from {', '.join(PAGE_LOADS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, pct: float):
+    # Nearest-rank percentile
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(0, rank - 1)]
+
+def summarize(latencies, errors, wall_seconds: float):
+    rows = {}
+    for label, values in sorted(latencies.items()):
+        values = sorted(values)
+        rows[label] = {
+            "requests": len(values),
+            "errors": errors.get(label, 0),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+            "max_ms": round(values[-1] * 1000, 1),
+            "rps": round(len(values) / wall_seconds, 1),
+        }
+    return rows
+
+def print_rows(title: str, rows):
+    print(f"\n{title:<32}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'req/s':>8}")
+    for label, r in rows.items():
+        print(f"{label:<32}{r['requests']:>7}{r['errors']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['max_ms']:>9}{r['rps']:>8}")
+
+async def run():
+    stub = StubModel(args.llm_latency_ms / 1000)
+    main.agent.llm = LLMService(model=stub, provider="stub", model_name="stub-load")
+    weights = parse_mix(args.mix)
+    names, name_weights = list(weights), list(weights.values())
+    recorder = Recorder()
+    page_times = defaultdict(list)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        risk = (await client.get("/analytics/risk-monitor?limit=500")).json()
+        sites = [site["site"] for site in risk["items"]] or ["1"]
+
+        async def user(user_id: int):
+            rng = random.Random(args.seed * 1000 + user_id)
+            for _ in range(args.loads):
+                name = rng.choices(names, weights=name_weights)[0]
+                start = time.perf_counter()
+                await PAGE_LOADS[name](client, recorder, rng, sites)
+                page_times[name].append(time.perf_counter() - start)
+                if args.think_ms:
+                    await asyncio.sleep(args.think_ms / 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[user(i) for i in range(args.users)])
+        wall_seconds = time.perf_counter() - start
+
+    total = sum(len(v) for v in recorder.latencies.values())
+    print(f"{args.users} users x {args.loads} page loads, stub LLM {args.llm_latency_ms:g} ms, "
+          f"LLM cache {'off' if args.no_llm_cache else 'on'}")
+    page_rows = summarize(page_times, {}, wall_seconds)
+    endpoint_rows = summarize(recorder.latencies, recorder.errors, wall_seconds)
+    print_rows("page load", page_rows)
+    print_rows("endpoint", endpoint_rows)
+    print(f"\n{total} requests in {wall_seconds:.2f}s: {total / wall_seconds:.1f} req/s, "
+          f"{sum(recorder.errors.values())} errors, {stub.calls} stub LLM calls")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "users": args.users, "loads": args.loads, "mix": weights, "llm_latency_ms": args.llm_latency_ms,
+                "wall_seconds": round(wall_seconds, 3), "requests": total, "llm_calls": stub.calls,
+                "pages": page_rows, "endpoints": endpoint_rows,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run())
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
@@ -0,0 +1,132 @@
+import os
+import time
+import random
+import argparse
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table
+import reports
+
+# Renders a synthetic sponsor-wide pack (default 50 studies x 500 sites) and compares:
+#   - one Table holding the whole site matrix of a study, as reports.py used to lay it out
+#   - the paginated per-study sections, in-process and in worker processes
+#   - merging the rendered sections: reports.merge_pdfs, which writes each part out as it is read,
+#     against appending every part to one pypdf PdfWriter and writing it at the end
+
+RISK_LEVELS = ["High", "Medium", "Low"]
+
+def synthetic_report(studies: int, sites: int, seed: int = 7):
+    rng = random.Random(seed)
+    site_rows = []
+    for s in range(studies):
+        study_id = f"Study {s + 1:03d}"
+        for i in range(sites):
+            site_rows.append({
+                "site": f"Site {s + 1:03d}-{i + 1:04d}",
+                "study_id": study_id,
+                "risk_level": rng.choice(RISK_LEVELS),
+                "dqi": rng.randint(40, 100),
+                "query_resolution_rate": rng.randint(50, 100),
+                "protocol_deviations": rng.randint(0, 12),
+                "recommendation": "Schedule monitoring visit and review open queries",
+            })
+    return {
+        "study_id": "All Studies",
+        "sites": site_rows,
+        "site_count": len(site_rows),
+        "high_risk_count": sum(1 for row in site_rows if row["risk_level"] == "High"),
+        "executive_summary": None,
+    }
+
+def peak_rss_mb():
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return self_kb / 1024, children_kb / 1024
+
+def single_table(sites, path):
+    table_data = [reports.SITE_COLUMNS] + [reports.site_row(site) for site in sites]
+    table = Table(table_data, colWidths=reports.SITE_COLUMN_WIDTHS, repeatRows=1, style=reports.TABLE_STYLE)
+    SimpleDocTemplate(path, pagesize=letter).build([table])
+
+def timed(label, fn, path):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    self_mb, children_mb = peak_rss_mb()
+    print(f"{label:<36}{seconds:>10.2f}{size_mb:>10.2f}{self_mb:>12.0f}{children_mb:>12.0f}")
+    return seconds
+
+def writer_merge(paths, path):
+    # How reports.py used to merge: the whole pack is held in one PdfWriter until the final write
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for part in paths:
+        writer.append(part)
+    with open(path, "wb") as f:
+        writer.write(f)
+    writer.close()
+
+def process_peak_mb():
+    # VmHWM covers this process image alone; ru_maxrss would also count the parent's pages from before the exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+MERGES = {"streamed (merge_pdfs)": reports.merge_pdfs, "one PdfWriter": writer_merge}
+
+def measure_merge(name, paths, path):
+    """Runs in a fresh process, so ru_maxrss is the peak of this merge alone. Returns (seconds, peak MB, growth MB)."""
+    baseline = process_peak_mb()
+    start = time.perf_counter()
+    MERGES[name](paths, path)
+    seconds = time.perf_counter() - start
+    peak = process_peak_mb()
+    return seconds, peak, peak - baseline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark report pack rendering")
+    parser.add_argument("--studies", type=int, default=50)
+    parser.add_argument("--sites", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    data = synthetic_report(args.studies, args.sites)
+    first_study = [site for site in data["sites"] if site["study_id"] == "Study 001"]
+    out = tempfile.mkdtemp(prefix="bench_reports_")
+    print(f"{args.studies} studies x {args.sites} sites, pypdf {'available' if reports.HAS_PYPDF else 'missing'}\n")
+    print(f"{'mode':<36}{'seconds':>10}{'MB':>10}{'peak MB':>12}{'workers MB':>12}")
+
+    # A single study is enough to show the cost of laying out one big table
+    path = os.path.join(out, "single-table.pdf")
+    timed(f"1 study, one table", lambda: single_table(first_study, path), path)
+    path = os.path.join(out, "single-paged.pdf")
+    timed(f"1 study, paged tables", lambda: reports.generate_pdf_report(
+        {**data, "sites": first_study, "site_count": len(first_study)}, path, workers=1), path)
+
+    for workers in sorted(set(args.workers)):
+        path = os.path.join(out, f"pack-{workers}.pdf")
+        timed(f"full pack, {workers} worker(s)", lambda: reports.generate_pdf_report(data, path, workers=workers), path)
+
+    if reports.HAS_PYPDF:
+        parts_dir = os.path.join(out, "parts")
+        os.makedirs(parts_dir)
+        parts = [reports.render_section(section, os.path.join(parts_dir, f"section-{i:04d}.pdf"))
+                 for i, section in enumerate(reports.report_sections(data))]
+        parts_mb = sum(os.path.getsize(part) for part in parts) / (1024 * 1024)
+        print(f"\nmerging {len(parts)} sections ({parts_mb:.1f} MB), each merge in a fresh process")
+        print(f"{'merge':<36}{'seconds':>10}{'MB':>10}{'peak MB':>12}{'growth MB':>12}")
+        for name in MERGES:
+            path = os.path.join(out, f"merged-{len(name)}.pdf")
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                seconds, peak, growth = pool.submit(measure_merge, name, parts, path).result()
+            print(f"{name:<36}{seconds:>10.2f}{os.path.getsize(path) / (1024 * 1024):>10.2f}{peak:>12.0f}{growth:>12.0f}")
+    print(f"\nPDFs written to {out}")
@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+# Scaling benchmark: generates synthetic workbooks at 1x/10x/100x of a base study size, then times
+# run_ingestion, every analytics.py function and generate_pdf_report against each, and stores the
+# results under bench_results/ so later runs can be compared with --compare.
+# Each scale runs in its own process with a fresh database, data directory and parse cache.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+RESULT_MARKER = "BENCH_RESULT "
+
+def best_of(fn, repeat: int):
+    """Best wall time of repeat runs, in seconds, and the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return round(best, 4), result
+
+def run_scale(scale: int, studies: int, sites: int, subjects: int, repeat: int):
+    """Child process: DATABASE_URL, DATA_DIR and PARSE_CACHE_DIR already point at this scale's scratch space."""
+    from synthetic_data import generate_dataset
+    seconds = {}
+
+    start = time.perf_counter()
+    rows = generate_dataset(os.environ["DATA_DIR"], studies, sites * scale, subjects)
+    seconds["generate_dataset"] = round(time.perf_counter() - start, 4)
+
+    from ingestion import run_ingestion
+    seconds["run_ingestion"], summary = best_of(run_ingestion, 1)
+    seconds["run_ingestion (unchanged)"], _ = best_of(run_ingestion, 1)
+
+    import analytics
+    from database import SessionLocal
+    from reports import generate_pdf_report
+    db = SessionLocal()
+    frame = analytics.get_site_risk_frame(db)
+    risk_data = analytics.get_detailed_risk_data(db)
+    busiest_site = frame["site_number"].iloc[0]
+    site_batch = frame["site_number"].head(50).tolist()
+
+    calls = {
+        "study_health_score": lambda: analytics.study_health_score(100, 10, 50),
+        "calculate_study_health_score": lambda: analytics.calculate_study_health_score(db),
+        "calculate_study_health_scores": lambda: analytics.calculate_study_health_scores(db),
+        "calculate_data_quality_index": lambda: analytics.calculate_data_quality_index(db, busiest_site),
+        "get_risk_heatmap_data": lambda: analytics.get_risk_heatmap_data(db),
+        "get_site_risk_frame": lambda: analytics.get_site_risk_frame(db),
+        "score_sites": lambda: analytics.score_sites(frame),
+        "get_detailed_risk_data": lambda: analytics.get_detailed_risk_data(db),
+        "filter_risk_data": lambda: analytics.filter_risk_data(risk_data, risk_levels=["High"], search="site 1"),
+        "get_sites_patients_data (50 sites)": lambda: analytics.get_sites_patients_data(db, site_batch),
+        "get_site_patients_data": lambda: analytics.get_site_patients_data(db, busiest_site),
+        "generate_recommendation": lambda: analytics.generate_recommendation("High", 10, 2),
+        "get_sae_trend": lambda: analytics.get_sae_trend(db),
+    }
+    for name, call in calls.items():
+        seconds[name], _ = best_of(call, repeat)
+
+    context = {
+        "study_id": "All Studies",
+        "sites": risk_data,
+        "site_count": len(risk_data),
+        "high_risk_count": sum(1 for site in risk_data if site["risk_level"] == "High"),
+        "executive_summary": None,
+    }
+    pdf_path = os.path.join(os.path.dirname(os.environ["DATA_DIR"]), "report.pdf")
+    seconds["generate_pdf_report"], _ = best_of(lambda: generate_pdf_report(context, pdf_path), 1)
+    db.close()
+
+    return {
+        "scale": scale,
+        "studies": studies,
+        "sites": sites * scale * studies,
+        "subjects": subjects * sites * scale * studies,
+        "rows": rows,
+        "ingested_files": summary["ingested"],
+        "report_bytes": os.path.getsize(pdf_path),
+        "seconds": seconds,
+    }
+
+def spawn_scale(scale: int, args):
+    workdir = tempfile.mkdtemp(prefix=f"bench_scaling_{scale}x_")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        DATA_DIR=os.path.join(workdir, "data"),
+        PARSE_CACHE_DIR=os.path.join(workdir, "parse_cache"),
+    )
+    command = [sys.executable, os.path.abspath(__file__), "--run-scale", str(scale),
+               "--studies", str(args.studies), "--sites", str(args.sites),
+               "--subjects", str(args.subjects), "--repeat", str(args.repeat)]
+    # Run from the scratch directory so ingestion doesn't pick up ./uploads
+    try:
+        completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{scale}x run failed:\n{completed.stderr[-2000:]}")
+        line = next(l for l in completed.stdout.splitlines() if l.startswith(RESULT_MARKER))
+        return json.loads(line[len(RESULT_MARKER):])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def print_table(results, baseline=None, tolerance: float = 1.5):
+    """Per-operation seconds at every scale; with a baseline, slowdowns beyond tolerance are flagged."""
+    regressions = []
+    names = list(results[0]["seconds"])
+    print(f"\n{'operation':<38}" + "".join(f"{str(r['scale']) + 'x':>12}" for r in results))
+    print(f"{'source rows':<38}" + "".join(f"{sum(r['rows'].values()):>12}" for r in results))
+    base_by_scale = {r["scale"]: r for r in (baseline or {}).get("results", [])}
+    for name in names:
+        cells = ""
+        for r in results:
+            value = r["seconds"][name]
+            cell = f"{value:.4f}"
+            previous = base_by_scale.get(r["scale"], {}).get("seconds", {}).get(name)
+            # Sub-millisecond timings are noise; only compare the ones large enough to mean something
+            if previous and previous >= 0.001 and value / previous > tolerance:
+                cell += "!"
+                regressions.append((name, r["scale"], previous, value))
+            cells += f"{cell:>12}"
+        print(f"{name:<38}{cells}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time ingestion, analytics and reports at growing data scales")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--studies", type=int, default=3)
+    parser.add_argument("--sites", type=int, default=20, help="sites per study at 1x; scaled up by each scale")
+    parser.add_argument("--subjects", type=int, default=10, help="subjects per site")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per analytics call; the best is kept")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="slowdown ratio reported as a regression")
+    parser.add_argument("--no-save", action="store_true", help="don't write a results file")
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scale:
+        result = run_scale(args.run_scale, args.studies, args.sites, args.subjects, args.repeat)
+        print(RESULT_MARKER + json.dumps(result))
+        sys.exit(0)
+
+    results = []
+    for scale in args.scales:
+        print(f"⏱️ Running {scale}x ({args.studies} studies x {args.sites * scale} sites x {args.subjects} subjects)...")
+        results.append(spawn_scale(scale, args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    regressions = print_table(results, baseline, args.tolerance)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"scaling-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(),
+                "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+                "base": {"studies": args.studies, "sites": args.sites, "subjects": args.subjects},
+                "results": results,
+            }, f, indent=2)
+        print(f"\n💾 Results saved to {path}")
+
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} operation(s) slower than {args.tolerance}x the baseline:")
+        for name, scale, previous, value in regressions:
+            print(f"   {name} at {scale}x: {previous:.4f}s -> {value:.4f}s")
+        sys.exit(1)
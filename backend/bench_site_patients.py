@@ -0,0 +1,41 @@
+import time
+from sqlalchemy import event, func
+from database import SessionLocal, engine
+from analytics import get_site_patients_data, get_sites_patients_data
+import models
+
+# Counts SQL statements per drill-down call to show it stays constant as sites grow
+
+statement_count = 0
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statement_count
+    statement_count += 1
+
+def measure(fn):
+    global statement_count
+    statement_count = 0
+    start = time.perf_counter()
+    result = fn()
+    return result, statement_count, (time.perf_counter() - start) * 1000
+
+db = SessionLocal()
+
+# Sites with the most subjects are the ones that used to be slow
+sites = [r[0] for r in db.query(
+    models.EDCMetrics.site_id, func.count(models.EDCMetrics.id)
+).group_by(models.EDCMetrics.site_id).order_by(func.count(models.EDCMetrics.id).desc()).limit(50).all()]
+
+print(f"{'site':<12}{'subjects':>10}{'queries':>10}{'ms':>10}")
+for site in sites[:10]:
+    result, queries, ms = measure(lambda: get_site_patients_data(db, site))
+    print(f"{site:<12}{result['total_patients']:>10}{queries:>10}{ms:>10.1f}")
+
+print(f"\n{'batch size':<12}{'subjects':>10}{'queries':>10}{'ms':>10}")
+for size in (1, 5, 10, 25, 50):
+    result, queries, ms = measure(lambda: get_sites_patients_data(db, sites[:size]))
+    subjects = sum(r['total_patients'] for r in result.values())
+    print(f"{size:<12}{subjects:>10}{queries:>10}{ms:>10.1f}")
+
+db.close()
@@ -0,0 +1,96 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy.orm import Session
+import models
+
+# Most responses kept before the least recently used is evicted
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+# Most agent query results kept, and the largest result (in rows) worth keeping. A cached result holds
+# chart data for every row, so this bounds its size; it has to be below AGENT_MAX_ROWS (1000) to do so
+SQL_RESULT_CACHE_SIZE = int(os.getenv("SQL_RESULT_CACHE_SIZE", "128"))
+SQL_RESULT_CACHE_MAX_ROWS = int(os.getenv("SQL_RESULT_CACHE_MAX_ROWS", "250"))
+
+class ResponseCache:
+    """
+    Size-bounded LRU of computed responses, keyed by e.g. (endpoint, params) or normalized SQL.
+    Every entry belongs to a data generation; when a newer generation is seen the whole cache is dropped,
+    so a response is never served after the data it was computed from has changed.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, generation: int, compute, should_store=None):
+        with self._lock:
+            if generation != self.generation:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.generation = generation
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Computed outside the lock; two concurrent misses on one key both compute, and the last one is kept
+        value = compute()
+        if self.max_entries <= 0 or (should_store is not None and not should_store(value)):
+            return value
+        with self._lock:
+            if generation == self.generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "generation": self.generation,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+def current_generation(db: Session):
+    row = db.query(models.DataGeneration.generation).filter(models.DataGeneration.id == 1).first()
+    return row[0] if row else 0
+
+def bump_generation(db: Session):
+    """Advance the data generation in the caller's transaction, so it commits together with the new rows."""
+    updated = db.query(models.DataGeneration).filter(models.DataGeneration.id == 1).update(
+        {models.DataGeneration.generation: models.DataGeneration.generation + 1,
+         models.DataGeneration.updated_at: datetime.now()},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(models.DataGeneration(id=1, generation=1, updated_at=datetime.now()))
+
+analytics_cache = ResponseCache()
+sql_result_cache = ResponseCache(SQL_RESULT_CACHE_SIZE)
+
+def cached_response(db: Session, endpoint: str, compute, **params):
+    """Serve endpoint(params) from analytics_cache for the current data generation, computing it on a miss."""
+    key = (endpoint, tuple(sorted(params.items())))
+    return analytics_cache.get_or_compute(key, current_generation(db), compute)
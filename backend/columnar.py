@@ -0,0 +1,175 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from database import read_snapshot
+
+# DuckDB is optional; without it agent SQL always runs on SQLite
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+# Engine for agent SQL: "sqlite" (default) or "duckdb", a columnar copy of the analytics tables
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "sqlite").lower()
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", str(os.cpu_count() or 1)))
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "1GB")
+# Rows read from SQLite per batch while the copy is built
+COPY_CHUNK_ROWS = 100000
+
+# Tables that only change through ingestion, i.e. with a data generation bump
+COLUMNAR_TABLES = ("sae_metrics", "missing_pages", "edc_metrics", "site_risk_summary", "study_health_summary")
+
+def columnar_enabled():
+    return HAS_DUCKDB and ANALYTICS_ENGINE == "duckdb"
+
+class StaleCopy(Exception):
+    """The columnar copy holds a different data generation than the query's snapshot."""
+
+class ColumnarCopy:
+    def __init__(self, conn, generation: int):
+        self.conn = conn
+        self.generation = generation
+        self.active = 0
+        self.retired = False
+
+class ColumnarStore:
+    """
+    In-memory DuckDB copy of COLUMNAR_TABLES for one data generation.
+    A new copy is built when the generation moves on. It is built without holding the lock, so queries
+    keep running on the old copy meanwhile; the old copy is closed once its last cursor is released.
+    Queries run on their own cursors, and external access is off, so generated SQL can only see the copied tables.
+    """
+
+    def __init__(self):
+        self.load_seconds = None
+        self._current = None
+        self._lock = threading.Lock()
+        # One build at a time; requests arriving during a build wait for it and share the result
+        self._build_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._current is not None
+
+    @property
+    def generation(self):
+        current = self._current
+        return current.generation if current else None
+
+    @contextmanager
+    def cursor(self, generation: int):
+        """A cursor on the copy of this generation's data, building it first if needed. Raises StaleCopy."""
+        copy = self._acquire(generation)
+        cursor = copy.conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            self._release(copy)
+
+    def refresh(self, generation: int):
+        """Rebuild now rather than on the next query; only worth it once the copy is in use."""
+        if self.loaded and generation != self.generation:
+            try:
+                with self.cursor(generation):
+                    pass
+            except StaleCopy:
+                # Data committed after this generation is already in the new copy
+                pass
+            except Exception as e:
+                print(f"⚠️ Columnar copy refresh failed: {e}")
+
+    def _use(self, generation: int):
+        # Called with _lock held
+        current = self._current
+        if current is not None and current.generation == generation:
+            current.active += 1
+            return current
+        if current is not None and current.generation > generation:
+            # The query's snapshot is older than the copy; a rebuild would only be newer still
+            raise StaleCopy(f"columnar copy is at generation {current.generation}, query at {generation}")
+        return None
+
+    def _acquire(self, generation: int):
+        with self._lock:
+            copy = self._use(generation)
+        if copy:
+            return copy
+        with self._build_lock:
+            with self._lock:
+                copy = self._use(generation)
+            if copy:
+                return copy
+            copy = self._load()
+            with self._lock:
+                old, self._current = self._current, copy
+                if copy.generation == generation:
+                    copy.active += 1
+            if old is not None:
+                self._retire(old)
+        if copy.generation != generation:
+            # Ingestion committed while the copy was being built
+            raise StaleCopy(f"columnar copy is at generation {copy.generation}, query at {generation}")
+        return copy
+
+    def _release(self, copy: ColumnarCopy):
+        with self._lock:
+            copy.active -= 1
+            close = copy.retired and copy.active == 0
+        if close:
+            copy.conn.close()
+
+    def _retire(self, copy: ColumnarCopy):
+        with self._lock:
+            copy.retired = True
+            close = copy.active == 0
+        if close:
+            copy.conn.close()
+
+    def _load(self):
+        start = time.perf_counter()
+        conn = duckdb.connect(":memory:", config={"threads": DUCKDB_THREADS, "memory_limit": DUCKDB_MEMORY_LIMIT})
+        rows = 0
+        # Every table is read in one snapshot, so the copy holds exactly one generation's data
+        with read_snapshot() as (source, generation):
+            existing = {name for (name,) in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in COLUMNAR_TABLES:
+                if table not in existing:
+                    continue
+                created = False
+                for chunk in pd.read_sql(f"SELECT * FROM {table}", source, chunksize=COPY_CHUNK_ROWS):
+                    conn.register("incoming", chunk)
+                    conn.execute(f"INSERT INTO {table} SELECT * FROM incoming" if created else f"CREATE TABLE {table} AS SELECT * FROM incoming")
+                    conn.unregister("incoming")
+                    created = True
+                    rows += len(chunk)
+        conn.execute("SET enable_external_access = false")
+        conn.execute("SET lock_configuration = true")
+        self.load_seconds = round(time.perf_counter() - start, 3)
+        print(f"🦆 Columnar copy built for generation {generation}: {rows} rows in {self.load_seconds}s")
+        return ColumnarCopy(conn, generation)
+
+columnar_store = ColumnarStore()
+
+def fetch_rows(statement: str, limit: int, timeout_s: float, generation: int):
+    """
+    Run a SELECT on the columnar copy, fetching at most limit rows. Returns (columns, rows).
+    Raises TimeoutError when the query is interrupted after timeout_s, and StaleCopy when no copy
+    of that generation's data can be had.
+    """
+    with columnar_store.cursor(generation) as cursor:
+        timer = threading.Timer(timeout_s, cursor.interrupt)
+        timer.start()
+        try:
+            # As in agent.execute_bounded, the newline ends a trailing "-- comment" before the paren
+            cursor.execute(f"SELECT * FROM ({statement}\n) LIMIT ?", [limit])
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchmany(limit)
+        except duckdb.InterruptException:
+            raise TimeoutError(statement)
+        finally:
+            timer.cancel()
+    return columns, rows
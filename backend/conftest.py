@@ -0,0 +1,24 @@
+"""
+Points every test at throwaway copies of the database, caches and report store, before any
+test module imports database (which binds its engine to DATABASE_URL on import).
+"""
+import os
+import shutil
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRATCH_DIR = tempfile.mkdtemp(prefix="clinical_flow_tests_")
+TEST_DB_PATH = os.path.join(SCRATCH_DIR, "clinical_trials.db")
+
+shutil.copy(os.path.join(BACKEND_DIR, "clinical_trials.db"), TEST_DB_PATH)
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH}"
+os.environ["LLM_CACHE_PATH"] = os.path.join(SCRATCH_DIR, "llm_cache.sqlite")
+os.environ["REPORT_STORE_DIR"] = os.path.join(SCRATCH_DIR, "reports")
+os.environ["PARSE_CACHE_DIR"] = os.path.join(SCRATCH_DIR, "parse_cache")
+os.environ["DATA_DIR"] = os.path.join(SCRATCH_DIR, "data")
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+# Manual script that posts to a running server and rewrites test_upload.xlsx in the working directory
+collect_ignore = ["test_upload.py"]
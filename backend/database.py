@@ -1,13 +1,107 @@
-
-from sqlalchemy import create_engine
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from metrics import DB_QUERY_SECONDS
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./clinical_trials.db")
+
+# SQLite tuning applied to every connection. WAL lets readers keep going while ingestion commits;
+# with WAL, synchronous=NORMAL is still safe against corruption and only fsyncs at checkpoints
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_MB = int(os.getenv("SQLITE_CACHE_SIZE_MB", "64"))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Read-only connections kept for the agent and analytics reads
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "8"))
+
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./clinical_trials.db"
+def apply_pragmas(dbapi_connection, read_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    # The journal mode is stored in the database file, so only the writer needs to set it
+    if not read_only:
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_MB * 1024}")
+    cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    if read_only:
+        cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False} if IS_SQLITE else {}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def database_path():
+    return engine.url.database
+
+def read_only_connection():
+    """A connection that cannot write: opened with mode=ro and query_only set."""
+    uri = f"{Path(os.path.abspath(database_path())).as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    apply_pragmas(conn, read_only=True)
+    return conn
+
+if IS_SQLITE:
+    event.listen(engine, "connect", lambda dbapi_connection, record: apply_pragmas(dbapi_connection))
+    read_engine = create_engine(
+        SQLALCHEMY_DATABASE_URL, creator=read_only_connection,
+        poolclass=QueuePool, pool_size=READ_POOL_SIZE, max_overflow=READ_POOL_SIZE
+    )
+else:
+    read_engine = engine
+
+def time_queries(target_engine, pool: str):
+    histogram = DB_QUERY_SECONDS.labels(pool=pool)
+
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        histogram.observe(time.perf_counter() - conn.info["query_start"].pop())
+
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    @event.listens_for(target_engine, "handle_error")
+    def discard_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+time_queries(engine, "write")
+if read_engine is not engine:
+    time_queries(read_engine, "read")
+
+@contextmanager
+def read_snapshot(engine=read_engine):
+    """
+    A pooled read connection inside one read transaction, and the data generation as of its snapshot.
+    Queries run on the connection see exactly the data of that generation, even if ingestion commits meanwhile.
+    """
+    pooled = engine.raw_connection()
+    conn = pooled.driver_connection
+    try:
+        conn.execute("BEGIN")
+        # The first read fixes the snapshot for the rest of the transaction
+        row = conn.execute("SELECT generation FROM data_generation WHERE id = 1").fetchone()
+        yield conn, row[0] if row else 0
+    finally:
+        # Ending the transaction releases its snapshot, which would otherwise hold back WAL checkpoints
+        if conn.in_transaction:
+            conn.rollback()
+        pooled.close()
+
+# Sessions for request paths that only read, so they never queue behind the writer's connections
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
@@ -1,16 +1,37 @@
 
 import os
+import time
+import numpy as np
 import pandas as pd
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from openpyxl import load_workbook
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
+import parse_cache
+from keys import canonical_keys
+from migrations import run_migrations
+from rollups import refresh_summaries
+from cache import bump_generation, current_generation
+from columnar import columnar_store
+from metrics import INGEST_FILES, INGEST_ROWS, INGEST_BYTES, INGEST_SECONDS, INGEST_ERRORS
 import models
 
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+# Create tables and bring older databases up to the current schema
+run_migrations(engine)
+
+# Tables filled from source workbooks, keyed by the file type identify_file_type() returns
+INGESTED_MODELS = {
+    "sae_metrics": models.SAEMetrics,
+    "missing_pages": models.MissingPages,
+    "edc_metrics": models.EDCMetrics,
+}
 
 # Dynamic path resolution: Go up one level from 'backend' to find 'data'
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
 
 def get_study_id_from_filename(filename):
     # Simple heuristic: extract "Study XX"
@@ -27,98 +48,511 @@ def normalize_column(col_name):
     clean = re.sub(r'[^a-zA-Z0-9\s]', '', col_name)
     return clean.strip().lower().replace(' ', '_')
 
-def get_column_value(row, possible_names):
-    """Try to fetch value using a list of possible column names."""
-    # Create a normalized map of the row's index
-    row_map = {normalize_column(k): k for k in row.index}
-    
-    for name in possible_names:
-        norm_name = normalize_column(name)
-        if norm_name in row_map:
-            val = row[row_map[norm_name]]
-            return val if pd.notna(val) else ''
-    return ''
-
-def ingest_sae_metrics(db: Session, filepath: str):
-    try:
-        df = pd.read_excel(filepath)
-        study_id = get_study_id_from_filename(filepath)
-        
-        count = 0
-        for _, row in df.iterrows():
-            item = models.SAEMetrics(
-                study_id=study_id,
-                country=str(get_column_value(row, ['Country', 'Ctry'])),
-                site=str(get_column_value(row, ['Site', 'Site ID', 'Site Number'])),
-                patient_id=str(get_column_value(row, ['Patient ID', 'Subject', 'Subject ID'])),
-                review_status=str(get_column_value(row, ['Review Status', 'Status'])),
-                action_status=str(get_column_value(row, ['Action Status', 'Action']))
-            )
-            db.add(item)
-            count += 1
+# Candidate source headers for each model column, in priority order
+SAE_COLUMNS = {
+    "country": ['Country', 'Ctry'],
+    "site": ['Site', 'Site ID', 'Site Number'],
+    "patient_id": ['Patient ID', 'Subject', 'Subject ID'],
+    "review_status": ['Review Status', 'Status'],
+    "action_status": ['Action Status', 'Action'],
+}
+
+MISSING_PAGES_COLUMNS = {
+    "site_number": ['SiteNumber', 'Site', 'Site ID'],
+    "subject_name": ['SubjectName', 'Subject Name', 'Subject', 'Patient'],
+    "form_name": ['FormName', 'Form', 'Page Name'],
+    "visit_date": ['Visit date', 'Date', 'Visit'],
+    "missing_days": ['No. #Days Page Missing', 'Days Missing', 'Missing Days'],
+}
+
+EDC_COLUMNS = {
+    "site_id": ['Site ID', 'Site', 'SiteNumber'],
+    "subject_id": ['Subject ID', 'Subject', 'Patient ID'],
+    "subject_status": ['Subject Status (Source: PRIMARY Form)', 'Subject Status', 'Status'],
+    "latest_visit": ['Latest Visit (SV) (Source: Rave EDC: BO4)', 'Latest Visit', 'Visit'],
+}
+
+# Rows per executemany batch when writing to the database
+BULK_INSERT_CHUNK_SIZE = 5000
+
+def resolve_columns(df, column_spec):
+    """Map each target field to the first matching DataFrame column (None if absent). Done once per DataFrame."""
+    col_map = {normalize_column(c): c for c in df.columns}
+    resolved = {}
+    for field, possible_names in column_spec.items():
+        resolved[field] = None
+        for name in possible_names:
+            norm_name = normalize_column(name)
+            if norm_name in col_map:
+                resolved[field] = col_map[norm_name]
+                break
+    return resolved
+
+def text_column(df, column):
+    """Column as strings with blanks for missing values; all blanks if the column wasn't found."""
+    if column is None:
+        return pd.Series('', index=df.index, dtype=object)
+    series = df[column].astype(object)
+    return series.where(series.notna(), '').astype(str)
+
+def int_column(df, column):
+    """Column coerced to int, with unparseable or missing values as 0."""
+    if column is None:
+        return pd.Series(0, index=df.index, dtype='int64')
+    values = pd.to_numeric(df[column], errors='coerce')
+    return values.replace([np.inf, -np.inf], np.nan).fillna(0).astype('int64')
+
+def prepare_sae_metrics(df, study_id, source_file):
+    cols = resolve_columns(df, SAE_COLUMNS)
+    return pd.DataFrame({
+        "study_id": study_id,
+        "country": text_column(df, cols["country"]),
+        "site": text_column(df, cols["site"]),
+        "patient_id": text_column(df, cols["patient_id"]),
+        "review_status": text_column(df, cols["review_status"]),
+        "action_status": text_column(df, cols["action_status"]),
+        "source_file": source_file,
+    }, index=df.index).assign(
+        site_key=lambda rows: canonical_keys(rows["site"]),
+        subject_key=lambda rows: canonical_keys(rows["patient_id"]),
+    )
+
+def prepare_missing_pages(df, study_id, source_file):
+    cols = resolve_columns(df, MISSING_PAGES_COLUMNS)
+    return pd.DataFrame({
+        "study_id": study_id,
+        "site_number": text_column(df, cols["site_number"]),
+        "subject_name": text_column(df, cols["subject_name"]),
+        "form_name": text_column(df, cols["form_name"]),
+        "visit_date": text_column(df, cols["visit_date"]),
+        # Handle mixed types for missing days
+        "missing_days": int_column(df, cols["missing_days"]),
+        "source_file": source_file,
+    }, index=df.index).assign(
+        site_key=lambda rows: canonical_keys(rows["site_number"]),
+        subject_key=lambda rows: canonical_keys(rows["subject_name"]),
+    )
+
+def prepare_edc_metrics(df, study_id, source_file):
+    cols = resolve_columns(df, EDC_COLUMNS)
+    return pd.DataFrame({
+        "study_id": study_id,
+        "site_id": text_column(df, cols["site_id"]),
+        "subject_id": text_column(df, cols["subject_id"]),
+        "subject_status": text_column(df, cols["subject_status"]),
+        "latest_visit": text_column(df, cols["latest_visit"]),
+        "source_file": source_file,
+    }, index=df.index).assign(
+        site_key=lambda rows: canonical_keys(rows["site_id"]),
+        subject_key=lambda rows: canonical_keys(rows["subject_id"]),
+    )
+
+def bulk_insert(db: Session, model, rows: pd.DataFrame):
+    """Write prepared rows with chunked Core executemany inserts instead of one ORM object per row."""
+    table = model.__table__
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+        chunk = rows.iloc[start:start + BULK_INSERT_CHUNK_SIZE]
+        db.execute(table.insert(), chunk.to_dict(orient="records"))
+    return len(rows)
+
+# model, prepare function and log label for each file type identify_file_type() returns
+FILE_TYPES = {
+    "sae_metrics": (models.SAEMetrics, prepare_sae_metrics, "SAE Metrics"),
+    "missing_pages": (models.MissingPages, prepare_missing_pages, "Missing Pages"),
+    "edc_metrics": (models.EDCMetrics, prepare_edc_metrics, "EDC Metrics"),
+}
+
+# Fields a workbook must resolve for its rows to be usable
+REQUIRED_COLUMNS = {
+    "sae_metrics": (SAE_COLUMNS, ["site", "patient_id"]),
+    "missing_pages": (MISSING_PAGES_COLUMNS, ["site_number", "subject_name"]),
+    "edc_metrics": (EDC_COLUMNS, ["site_id", "subject_id"]),
+}
+
+def validate_columns(df, file_type):
+    """Raise ValueError if the sheet lacks the site/subject columns its rows are keyed on."""
+    column_spec, required = REQUIRED_COLUMNS[file_type]
+    resolved = resolve_columns(df, column_spec)
+    missing = [field for field in required if resolved[field] is None]
+    if missing:
+        raise ValueError(f"missing required columns: {', '.join(missing)}")
+    return resolved
+
+def no_progress(stage, status, **details):
+    pass
+
+# Worker processes used to parse workbooks; 1 keeps everything in-process
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+
+# .xlsx files at least this large are streamed in fixed-size chunks instead of loaded whole
+STREAMING_THRESHOLD_MB = float(os.getenv("INGEST_STREAMING_THRESHOLD_MB", "50"))
+STREAM_CHUNK_ROWS = int(os.getenv("INGEST_STREAM_CHUNK_ROWS", "10000"))
+
+def identify_file_type(filename):
+    if "SAE Dashboard" in filename or "eSAE" in filename:
+        return "sae_metrics"
+    elif "Global_Missing_Pages" in filename:
+        return "missing_pages"
+    elif "EDC_Metrics" in filename:
+        return "edc_metrics"
+    return None
+
+def check_manifest(db: Session, filepath: str):
+    """
+    Compare a workbook against its manifest entry.
+    Returns (entry, content_hash); content_hash is None when the file is unchanged.
+    """
+    stat = os.stat(filepath)
+    entry = db.query(models.IngestionManifest).filter(models.IngestionManifest.path == filepath).first()
+
+    # Fast path: same size and mtime means we don't even need to hash the file
+    if entry and entry.size == stat.st_size and entry.mtime == stat.st_mtime:
+        return entry, None
+
+    content_hash = parse_cache.compute_file_hash(filepath)
+    if entry and entry.content_hash == content_hash:
+        # Touched but not modified (e.g. copied back in); refresh the stat fields only
+        entry.size = stat.st_size
+        entry.mtime = stat.st_mtime
         db.commit()
-        print(f"✅ Ingested {count} SAE Metrics from {os.path.basename(filepath)}")
-    except Exception as e:
-        print(f"❌ Error ingesting SAE Metrics {os.path.basename(filepath)}: {e}")
+        return entry, None
+    return entry, content_hash
+
+def purge_untracked_rows(db: Session):
+    # Rows loaded before the manifest existed can't be traced back to a workbook.
+    # They are re-created from source in the same run, so drop them to avoid duplicates.
+    # Returns the studies that lost rows, so their summaries get refreshed.
+    studies = set()
+    for model in INGESTED_MODELS.values():
+        untracked = db.query(model).filter(model.source_file.is_(None))
+        studies.update(study_id for (study_id,) in untracked.with_entities(model.study_id).distinct())
+        deleted = untracked.delete(synchronize_session=False)
+        if deleted:
+            print(f"🧹 Removed {deleted} untracked rows from {model.__tablename__}")
+    db.commit()
+    return studies
+
+def parse_workbook(filepath: str, file_type: str, content_hash: str = None, progress=None):
+    """
+    Read, validate and clean a workbook into rows ready for insert, via the parse cache.
+    Touches no database state, so it can run in a worker process.
+    Returns (rows, parse_seconds).
+    """
+    report = progress or no_progress
+    start = time.perf_counter()
+    _, prepare, _ = FILE_TYPES[file_type]
+    report("parse", "running")
+    df = parse_cache.read_workbook(filepath, content_hash)
+    report("parse", "done", rows=len(df), seconds=round(time.perf_counter() - start, 3))
+
+    validate_start = time.perf_counter()
+    report("validate", "running")
+    validate_columns(df, file_type)
+    rows = prepare(df, get_study_id_from_filename(filepath), filepath)
+    report("validate", "done", rows=len(rows), seconds=round(time.perf_counter() - validate_start, 3))
+    return rows, time.perf_counter() - start
+
+def excel_header_names(header):
+    """Column names the way pd.read_excel builds them: blanks become 'Unnamed: i', duplicates get '.n' suffixes."""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
 
-def ingest_missing_pages(db: Session, filepath: str):
+def iter_excel_chunks(filepath: str, chunk_size: int = STREAM_CHUNK_ROWS):
+    """
+    Yield the first sheet of an .xlsx file as DataFrames of at most chunk_size rows.
+    Uses openpyxl's read-only row iterator, so only one chunk is held in memory at a time.
+    """
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
     try:
-        df = pd.read_excel(filepath)
-        study_id = get_study_id_from_filename(filepath)
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = excel_header_names(header)
+        width = len(columns)
 
-        count = 0
-        for _, row in df.iterrows():
-            # Handle mixed types for missing days
-            missing_val = get_column_value(row, ['No. #Days Page Missing', 'Days Missing', 'Missing Days'])
-            try:
-                missing = int(missing_val)
-            except:
-                missing = 0
-                
-            item = models.MissingPages(
-                study_id=study_id,
-                site_number=str(get_column_value(row, ['SiteNumber', 'Site', 'Site ID'])),
-                subject_name=str(get_column_value(row, ['SubjectName', 'Subject', 'Patient'])),
-                form_name=str(get_column_value(row, ['FormName', 'Form', 'Page Name'])),
-                visit_date=str(get_column_value(row, ['Visit date', 'Date', 'Visit'])),
-                missing_days=missing
-            )
-            db.add(item)
-            count += 1
+        batch = []
+        blank_run = []
+        for row in rows:
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            # Hold blank rows back until real data follows, so trailing blanks are dropped like read_excel does
+            if all(v is None for v in row):
+                blank_run.append(row)
+                continue
+            batch.extend(blank_run)
+            blank_run = []
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch[:chunk_size], columns=columns)
+                batch = batch[chunk_size:]
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+def should_stream(filepath: str, threshold_mb: float = None):
+    threshold_mb = STREAMING_THRESHOLD_MB if threshold_mb is None else threshold_mb
+    # The read-only row iterator only understands .xlsx; legacy .xls is always loaded whole
+    return filepath.endswith('.xlsx') and os.path.getsize(filepath) >= threshold_mb * 1024 * 1024
+
+def plan_file(db: Session, filepath: str, streaming_threshold_mb: float = None):
+    """
+    Decide whether a workbook needs ingesting.
+    Returns (task, None) for a new or changed file, or (None, reason) where reason is 'skipped' or 'unidentified'.
+    """
+    filename = os.path.basename(filepath)
+    file_type = identify_file_type(filename)
+    if file_type is None:
+        print(f"⚠️ Skipped unidentified file: {filename}")
+        INGEST_FILES.labels(file_type="unknown", status="unidentified").inc()
+        return None, "unidentified"
+
+    _, content_hash = check_manifest(db, filepath)
+    if content_hash is None:
+        print(f"⏭️ Unchanged, skipping: {filename}")
+        INGEST_FILES.labels(file_type=file_type, status="skipped").inc()
+        return None, "skipped"
+
+    task = {
+        "path": filepath,
+        "file_type": file_type,
+        "content_hash": content_hash,
+        "study_id": get_study_id_from_filename(filepath),
+        "streaming": should_stream(filepath, streaming_threshold_mb),
+    }
+    return task, None
+
+def delete_source_rows(db: Session, filepath: str):
+    # Replace whatever this workbook contributed last time
+    for model in INGESTED_MODELS.values():
+        db.query(model).filter(model.source_file == filepath).delete(synchronize_session=False)
+
+def record_manifest(db: Session, task: dict, count: int):
+    filepath = task["path"]
+    stat = os.stat(filepath)
+    entry = db.query(models.IngestionManifest).filter(models.IngestionManifest.path == filepath).first()
+    if entry is None:
+        entry = models.IngestionManifest(path=filepath)
+        db.add(entry)
+    entry.size = stat.st_size
+    entry.mtime = stat.st_mtime
+    entry.content_hash = task["content_hash"]
+    entry.file_type = task["file_type"]
+    entry.row_count = count
+    entry.ingested_at = datetime.now()
+
+def write_workbook(db: Session, task: dict, rows: pd.DataFrame):
+    """Swap in a workbook's rows and record it in the manifest, in a single transaction."""
+    model, _, _ = FILE_TYPES[task["file_type"]]
+    delete_source_rows(db, task["path"])
+    count = bulk_insert(db, model, rows)
+    record_manifest(db, task, count)
+    db.commit()
+    return count
+
+def stream_workbook(db: Session, task: dict, chunk_size: int = STREAM_CHUNK_ROWS, progress=None):
+    """
+    Ingest a large workbook chunk by chunk, committing after each one so peak memory stays flat.
+    The manifest entry is only written once every chunk is in, so an interrupted load is redone next run.
+    Returns (rows, parse_seconds, write_seconds).
+    """
+    report = progress or no_progress
+    filepath = task["path"]
+    model, prepare, _ = FILE_TYPES[task["file_type"]]
+    report("parse", "running", mode="streaming")
+    delete_source_rows(db, filepath)
+    db.commit()
+
+    count = 0
+    parse_seconds = 0.0
+    write_seconds = 0.0
+    # A previously parsed copy can be streamed from the cache; otherwise read the Excel file itself
+    chunks = parse_cache.iter_chunks(task["content_hash"], chunk_size)
+    if chunks is None:
+        chunks = iter_excel_chunks(filepath, chunk_size)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        if count == 0:
+            report("validate", "running")
+            validate_columns(chunk, task["file_type"])
+            report("validate", "done")
+        rows = prepare(chunk, task["study_id"], filepath)
+        parse_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        count += bulk_insert(db, model, rows)
         db.commit()
-        print(f"✅ Ingested {count} Missing Pages from {os.path.basename(filepath)}")
-    except Exception as e:
-        print(f"❌ Error ingesting Missing Pages {os.path.basename(filepath)}: {e}")
+        write_seconds += time.perf_counter() - start
+        report("write", "running", rows=count)
+
+    report("parse", "done", rows=count, seconds=round(parse_seconds, 3))
+    record_manifest(db, task, count)
+    db.commit()
+    return count, parse_seconds, write_seconds
+
+def parse_tasks(tasks: list, workers: int):
+    """
+    Yield (task, rows, parse_seconds, error) in task order.
+    With more than one worker, workbooks are parsed concurrently in a process pool. At most
+    `workers` workbooks are submitted ahead of the one being written, so only that many parsed
+    sheets are held in memory however many files the run has.
+    Streaming tasks are yielded unparsed; the writer reads them chunk by chunk itself.
+    """
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            queued = iter(tasks)
+
+            def submit_next():
+                task = next(queued, None)
+                if task is not None:
+                    future = None if task["streaming"] else pool.submit(parse_workbook, task["path"], task["file_type"], task["content_hash"])
+                    pending.append((task, future))
+
+            for _ in range(workers):
+                submit_next()
+            while pending:
+                task, future = pending.popleft()
+                submit_next()
+                if future is None:
+                    yield task, None, 0.0, None
+                    continue
+                try:
+                    rows, seconds = future.result()
+                except Exception as e:
+                    yield task, None, 0.0, e
+                    continue
+                yield task, rows, seconds, None
+    else:
+        for task in tasks:
+            if task["streaming"]:
+                yield task, None, 0.0, None
+                continue
+            try:
+                rows, seconds = parse_workbook(task["path"], task["file_type"], task["content_hash"])
+                yield task, rows, seconds, None
+            except Exception as e:
+                yield task, None, 0.0, e
+
+def write_parsed(db: Session, task: dict, rows, parse_seconds: float, error, progress=None):
+    """Commit one parsed workbook. Returns a timing record for the run summary."""
+    timing = commit_parsed(db, task, rows, parse_seconds, error, progress)
+    record_file_metrics(task, timing)
+    return timing
 
-def ingest_edc_metrics(db: Session, filepath: str):
+def record_file_metrics(task: dict, timing: dict):
+    file_type = task["file_type"]
+    INGEST_FILES.labels(file_type=file_type, status=timing["status"]).inc()
+    INGEST_SECONDS.labels(file_type=file_type, stage="parse").inc(timing["parse_seconds"])
+    INGEST_SECONDS.labels(file_type=file_type, stage="write").inc(timing["write_seconds"])
+    if timing["status"] != "ingested":
+        INGEST_ERRORS.labels(file_type=file_type).inc()
+        return
+    INGEST_ROWS.labels(file_type=file_type).inc(timing["rows"])
     try:
-        df = pd.read_excel(filepath)
-        
-        count = 0
-        for _, row in df.iterrows():
-            item = models.EDCMetrics(
-                study_id=get_study_id_from_filename(filepath),
-                site_id=str(get_column_value(row, ['Site ID', 'Site', 'SiteNumber'])),
-                subject_id=str(get_column_value(row, ['Subject ID', 'Subject', 'Patient ID'])),
-                subject_status=str(get_column_value(row, ['Subject Status (Source: PRIMARY Form)', 'Subject Status', 'Status'])),
-                latest_visit=str(get_column_value(row, ['Latest Visit (SV) (Source: Rave EDC: BO4)', 'Latest Visit', 'Visit']))
-            )
-            db.add(item)
-            count += 1
-        db.commit()
-        print(f"✅ Ingested {count} EDC Metrics from {os.path.basename(filepath)}")
+        INGEST_BYTES.labels(file_type=file_type).inc(os.path.getsize(task["path"]))
+    except OSError:
+        pass
+
+def commit_parsed(db: Session, task: dict, rows, parse_seconds: float, error, progress=None):
+    report = progress or no_progress
+    filename = os.path.basename(task["path"])
+    _, _, label = FILE_TYPES[task["file_type"]]
+    timing = {
+        "file": filename,
+        "study_id": task["study_id"],
+        "rows": 0,
+        "parse_seconds": round(parse_seconds, 3),
+        "write_seconds": 0.0,
+        "streamed": task["streaming"],
+        "status": "failed",
+    }
+    if error is not None:
+        print(f"❌ Error ingesting {label} {filename}: {error}")
+        timing["error"] = str(error)
+        return timing
+
+    start = time.perf_counter()
+    try:
+        if task["streaming"]:
+            count, parse_seconds, write_seconds = stream_workbook(db, task, progress=report)
+        else:
+            report("write", "running")
+            count = write_workbook(db, task, rows)
+            write_seconds = time.perf_counter() - start
     except Exception as e:
-        print(f"❌ Error ingesting EDC Metrics {os.path.basename(filepath)}: {e}")
+        db.rollback()
+        print(f"❌ Error ingesting {label} {filename}: {e}")
+        timing["error"] = str(e)
+        return timing
+    report("write", "done", rows=count, seconds=round(write_seconds, 3))
 
-def run_ingestion():
-    print(f"🚀 Starting ingestion from: {DATA_DIR}")
-    if not os.path.exists(DATA_DIR):
-        print(f"❌ DATA_DIR not found: {DATA_DIR}")
+    elapsed = parse_seconds + write_seconds
+    rate = count / elapsed if elapsed > 0 else 0
+    mode = " [streamed]" if task["streaming"] else ""
+    print(f"✅ Ingested {count} {label} from {filename}{mode} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    timing.update(
+        rows=count,
+        parse_seconds=round(parse_seconds, 3),
+        write_seconds=round(write_seconds, 3),
+        streamed=task["streaming"],
+        status="ingested",
+    )
+    return timing
+
+def publish_changes(db: Session, study_ids: set):
+    """Rebuild the rollups of studies whose rows changed and bump the data generation, in one commit."""
+    if not study_ids:
         return
+    # Only studies whose rows changed get their rollups rebuilt
+    refresh_summaries(db, study_ids)
+    # Cached analytics responses from before this commit are now stale
+    bump_generation(db)
+    db.commit()
+    # A columnar copy in use in this process is rebuilt now, not by the next agent query
+    columnar_store.refresh(current_generation(db))
 
-    db = SessionLocal()
-<<<<<<< HEAD
-    
+def ingest_file(db: Session, filepath: str, progress=None):
+    """
+    Ingest a single workbook if it is new or changed since the last run.
+    Stage updates (parse, validate, write) are passed to progress(stage, status, **details).
+    Returns the file's timing record; its status is 'ingested', 'skipped', 'failed' or 'unidentified'.
+    """
+    report = progress or no_progress
+    filename = os.path.basename(filepath)
+    task, reason = plan_file(db, filepath)
+    if task is None:
+        if reason == "unidentified":
+            report("validate", "failed", error="Unrecognized report type; expected an SAE Dashboard, Global Missing Pages or EDC Metrics export")
+        else:
+            report("parse", "skipped", detail="Unchanged since the last ingestion")
+        return {"file": filename, "rows": 0, "status": reason}
+
+    print(f"Processing: {filename}...")
+    rows, parse_seconds, error = None, 0.0, None
+    if not task["streaming"]:
+        try:
+            rows, parse_seconds = parse_workbook(task["path"], task["file_type"], task["content_hash"], report)
+        except Exception as e:
+            error = e
+    timing = write_parsed(db, task, rows, parse_seconds, error, report)
+    if timing["status"] in ("ingested", "failed"):
+        publish_changes(db, {task["study_id"]})
+    return timing
+
+def iter_source_files():
     # Define directories to scan
     scan_dirs = [DATA_DIR, os.path.join(os.getcwd(), "uploads")]
     
@@ -131,37 +565,80 @@ def run_ingestion():
         # Recursive walk
         for root, dirs, files in os.walk(directory):
             for file in files:
-                full_path = os.path.join(root, file)
-                if file.startswith("~$") or file.startswith("."): continue # Skip temp/hidden files
-                
-                if "SAE Dashboard" in file or "eSAE" in file:
-                    ingest_sae_metrics(db, full_path)
-                elif "Global_Missing_Pages" in file:
-                    ingest_missing_pages(db, full_path)
-                elif "EDC_Metrics" in file:
-                    ingest_edc_metrics(db, full_path)
-                # Add more handlers as needed
-=======
-    # Recursive walk
-    for root, dirs, files in os.walk(DATA_DIR):
-        for file in files:
-            full_path = os.path.join(root, file)
-            if file.startswith("~$") or not file.endswith(('.xlsx', '.xls')): 
-                continue 
-            
-            print(f"Processing: {file}...")
-            if "SAE Dashboard" in file or "eSAE" in file:
-                ingest_sae_metrics(db, full_path)
-            elif "Global_Missing_Pages" in file:
-                ingest_missing_pages(db, full_path)
-            elif "EDC_Metrics" in file:
-                ingest_edc_metrics(db, full_path)
-            else:
-                print(f"⚠️ Skipped unidentified file: {file}")
->>>>>>> 782bab7 (feat: Implement Scientific AI Agent with Gemini, fix ingestion, refine UI)
-            
+                if file.startswith("~$") or not file.endswith(('.xlsx', '.xls')): 
+                    continue # Skip temp/hidden files
+                yield os.path.join(root, file)
+
+def summarize_timings(timings: list, workers: int, wall_seconds: float):
+    """Print and return per-study/per-file timings. Compare wall_seconds against a workers=1 run for the speedup."""
+    studies = {}
+    for t in timings:
+        study = studies.setdefault(t["study_id"], {"files": 0, "rows": 0, "parse_seconds": 0.0, "write_seconds": 0.0})
+        study["files"] += 1
+        study["rows"] += t["rows"]
+        study["parse_seconds"] += t["parse_seconds"]
+        study["write_seconds"] += t["write_seconds"]
+
+    work_seconds = sum(t["parse_seconds"] + t["write_seconds"] for t in timings)
+    print(f"📊 Timing summary: {workers} worker(s), wall {wall_seconds:.2f}s, {work_seconds:.2f}s of per-file parse+write")
+    for study_id, study in sorted(studies.items()):
+        print(f"   {study_id}: {study['files']} files, {study['rows']} rows, parse {study['parse_seconds']:.2f}s, write {study['write_seconds']:.2f}s")
+        for t in timings:
+            if t["study_id"] == study_id:
+                print(f"      - {t['file']}: {t['rows']} rows, parse {t['parse_seconds']:.2f}s, write {t['write_seconds']:.2f}s [{t['status']}]")
+
+    return {
+        "workers": workers,
+        "wall_seconds": round(wall_seconds, 3),
+        "work_seconds": round(work_seconds, 3),
+        "studies": {k: {**v, "parse_seconds": round(v["parse_seconds"], 3), "write_seconds": round(v["write_seconds"], 3)} for k, v in studies.items()},
+        "files": timings,
+    }
+
+def run_ingestion(workers: int = None, streaming_threshold_mb: float = None, progress=None):
+    report = progress or no_progress
+    workers = workers or INGEST_WORKERS
+    print(f"🚀 Starting ingestion from: {DATA_DIR}")
+    summary = {"ingested": 0, "skipped": 0, "failed": 0, "unidentified": 0}
+    if not os.path.exists(DATA_DIR):
+        print(f"❌ DATA_DIR not found: {DATA_DIR}")
+        return summary
+
+    wall_start = time.perf_counter()
+    db = SessionLocal()
+    changed_studies = purge_untracked_rows(db)
+
+    tasks = []
+    for filepath in iter_source_files():
+        task, reason = plan_file(db, filepath, streaming_threshold_mb)
+        if task is None:
+            summary[reason] += 1
+        else:
+            tasks.append(task)
+
+    # Workbooks may be parsed in parallel, but a single writer commits them in scan order
+    timings = []
+    report("write", "running", completed=0, total=len(tasks), skipped=summary["skipped"])
+    for parsed in parse_tasks(tasks, workers):
+        timing = write_parsed(db, *parsed)
+        summary[timing["status"]] += 1
+        timings.append(timing)
+        report("write", "running", completed=len(timings), total=len(tasks), file=timing["file"], rows=timing["rows"], file_status=timing["status"])
+        if timing["status"] in ("ingested", "failed"):
+            # A failed streamed file may have committed some chunks before it failed
+            changed_studies.add(timing["study_id"])
+
+    publish_changes(db, changed_studies)
     db.close()
-    print("✨ Ingestion Complete")
+    report("write", "done", completed=len(timings), total=len(tasks), ingested=summary["ingested"], skipped=summary["skipped"], failed=summary["failed"])
+    summary["timings"] = summarize_timings(timings, workers, time.perf_counter() - wall_start)
+    print(f"✨ Ingestion Complete: {summary['ingested']} ingested, {summary['skipped']} unchanged, {summary['failed']} failed")
+    return summary
 
 if __name__ == "__main__":
-    run_ingestion()
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingest clinical trial workbooks into the database")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="worker processes used to parse workbooks")
+    parser.add_argument("--stream-threshold-mb", type=float, default=STREAMING_THRESHOLD_MB, help="stream .xlsx files at least this large")
+    args = parser.parse_args()
+    run_ingestion(workers=args.workers, streaming_threshold_mb=args.stream_threshold_mb)
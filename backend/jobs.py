@@ -0,0 +1,131 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Finished jobs kept around for status lookups before the oldest are dropped
+MAX_RETAINED_JOBS = 200
+
+class Job:
+    """A unit of background work with per-stage progress events, safe to read from other threads."""
+
+    def __init__(self, kind: str, filename: str = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.filename = filename
+        self.status = "queued"
+        self.stages = OrderedDict()
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.seconds = None
+        self._started = None
+        self._lock = threading.Lock()
+
+    def report(self, stage: str, status: str, **details):
+        """Progress callback: record a stage transition and append it to the event log."""
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"status": "pending"})
+            if status == "running" and entry["status"] != "running":
+                entry["started"] = time.perf_counter()
+            entry["status"] = status
+            entry.update(details)
+            event = {
+                "seq": len(self.events) + 1,
+                "stage": stage,
+                "status": status,
+                "time": datetime.now().isoformat(),
+                **details,
+            }
+            self.events.append(event)
+
+    def start(self):
+        with self._lock:
+            self.status = "running"
+            self._started = time.perf_counter()
+
+    def finish(self, result=None, error: str = None):
+        # Any stage still marked running when the job fails is where it failed
+        if error:
+            running = [name for name, entry in self.stages.items() if entry["status"] == "running"]
+            for name in running:
+                self.report(name, "failed", error=error)
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.status = "failed" if error else "complete"
+            self.finished_at = datetime.now()
+            self.seconds = round(time.perf_counter() - (self._started or time.perf_counter()), 3)
+
+    @property
+    def finished(self):
+        return self.status in ("complete", "failed")
+
+    def events_since(self, seq: int):
+        with self._lock:
+            return self.events[seq:]
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "filename": self.filename,
+                "status": self.status,
+                "stages": {
+                    name: {k: v for k, v in entry.items() if k != "started"}
+                    for name, entry in self.stages.items()
+                },
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at.isoformat(),
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+                "seconds": self.seconds,
+            }
+
+class JobQueue:
+    """
+    Runs jobs on a background thread pool. One worker by default, so jobs that
+    write to the database run one after another instead of fighting over the file.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jobs")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job: Job, fn):
+        """
+        Queue fn(job) and return the Job at once.
+        fn reports progress via job.report, returns the job result, and raises to fail the job.
+        """
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn):
+        job.start()
+        try:
+            job.finish(result=fn(job))
+        except Exception as e:
+            print(f"❌ Job {job.id} ({job.kind}) failed: {e}")
+            job.finish(error=str(e))
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        excess = len(self._jobs) - MAX_RETAINED_JOBS
+        for job_id in finished[:max(0, excess)]:
+            del self._jobs[job_id]
+
+ingestion_jobs = JobQueue()
+report_jobs = JobQueue()
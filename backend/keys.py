@@ -0,0 +1,22 @@
+import pandas as pd
+
+# Labels the source exports put in front of the identifier itself ("Site 020", "Subject-0042", "PT 7").
+# Only stripped when a separator or a digit follows, so identifiers like "PTX-12" keep their letters
+KEY_PREFIX = r'^(?:SITE|SUBJECT|SUBJ|PATIENT|PT)(?:[^A-Z0-9]+|(?=\d))'
+
+def canonical_keys(values: pd.Series):
+    """
+    Normalize site/subject identifiers from the different report formats so they can be joined with equality.
+    'Site 020', 'site-20', 'SITE20', '20' and 20.0 all become '20'. Separators inside the identifier are
+    kept as a single '-', so '10-1' and '101' stay distinct; leading zeros are dropped from each numeric part.
+    """
+    keys = values.astype(object).where(values.notna(), '').astype(str).str.strip().str.upper()
+    keys = keys.str.replace(r'\.0+$', '', regex=True)  # numeric cells read as floats
+    keys = keys.str.replace(KEY_PREFIX, '', regex=True)
+    keys = keys.str.replace(r'[^A-Z0-9]+', '-', regex=True).str.strip('-')
+    keys = keys.str.replace(r'(?<![A-Z0-9])0+(?=\d)', '', regex=True)
+    return keys.astype(object)
+
+def canonical_key(value):
+    """Scalar form of canonical_keys, for request parameters."""
+    return canonical_keys(pd.Series([value])).iloc[0]
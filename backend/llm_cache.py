@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import closing
+
+# LLM outputs kept in their own SQLite file, so they survive restarts and re-ingestion alike
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite"))
+# Entries older than this are treated as misses and dropped
+CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+# Most entries kept before the least recently used are evicted; 0 disables caching
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+
+def cache_enabled():
+    return CACHE_MAX_ENTRIES > 0
+
+# Cache files whose schema has been created by this process
+_schema_ready = set()
+
+def connect():
+    conn = sqlite3.connect(CACHE_PATH, timeout=5)
+    if CACHE_PATH not in _schema_ready:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, provider TEXT, model TEXT, kind TEXT, value TEXT, "
+                "created_at REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)")
+        _schema_ready.add(CACHE_PATH)
+    return conn
+
+def normalize_question(question: str):
+    """Case, spacing and trailing punctuation don't change what is being asked."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+def data_digest(data):
+    """Digest of the result rows an insight was generated from."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def make_key(provider: str, model: str, template_version: int, kind: str, question: str, data=None):
+    parts = [provider, model, str(template_version), kind, normalize_question(question)]
+    if data is not None:
+        parts.append(data_digest(data))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def expired(created_at: float, now: float):
+    return CACHE_TTL_HOURS > 0 and now - created_at > CACHE_TTL_HOURS * 3600
+
+def get(key: str):
+    """Cached output for key, or None on a miss or an expired entry."""
+    if not cache_enabled():
+        return None
+    now = time.time()
+    with closing(connect()) as conn, conn:
+        row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if expired(created_at, now):
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return value
+
+def put(key: str, value: str, provider: str, model: str, kind: str):
+    if not cache_enabled():
+        return
+    now = time.time()
+    with closing(connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, provider, model, kind, value, created_at, last_used, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, provider, model, kind, value, now, now)
+        )
+        evict(conn, now)
+
+def delete(key: str):
+    if not cache_enabled():
+        return
+    with closing(connect()) as conn, conn:
+        conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+def evict(conn, now: float = None):
+    """Drop expired entries, then the least recently used beyond CACHE_MAX_ENTRIES."""
+    now = now or time.time()
+    if CACHE_TTL_HOURS > 0:
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - CACHE_TTL_HOURS * 3600,))
+    conn.execute(
+        "DELETE FROM llm_cache WHERE key IN ("
+        "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+        (CACHE_MAX_ENTRIES,)
+    )
+
+def clear():
+    with closing(connect()) as conn, conn:
+        conn.execute("DELETE FROM llm_cache")
+
+def stats():
+    with closing(connect()) as conn:
+        entries, hits = conn.execute("SELECT count(*), coalesce(sum(hits), 0) FROM llm_cache").fetchone()
+    return {"path": CACHE_PATH, "entries": entries, "max_entries": CACHE_MAX_ENTRIES, "ttl_hours": CACHE_TTL_HOURS, "hits": hits}
@@ -3,6 +3,11 @@ import os
 import re
 import random
 import json
+import time
+import asyncio
+import weakref
+import llm_cache
+from metrics import LLM_CALL_SECONDS
 
 # Try importing google.generativeai, but don't crash if handling fallback
 try:
@@ -11,21 +16,54 @@ try:
 except ImportError:
     HAS_GEMINI = False
 
+GEMINI_MODEL = 'gemini-2.5-flash'
+# Bump when a prompt below changes, so cached outputs from the old prompt stop matching
+SQL_PROMPT_VERSION = 1
+INSIGHT_PROMPT_VERSION = 1
+
+# Upstream model calls allowed at once per event loop, and how long one may take
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+
+SQL_SYSTEM_PROMPT = """
+        You are a SQL expert for a Clinical Trial Database (SQLite).
+        Schema:
+        - sae_metrics (id, study_id, country, site, patient_id, review_status)
+        - missing_pages (id, study_id, site_number, subject_name, form_name, visit_date, missing_days)
+        - edc_metrics (id, study_id, site_id, subject_id, subject_status, latest_visit)
+
+        Return ONLY raw SQL. No markdown, no backticks.
+        """
+
 class LLMService:
-    def __init__(self):
+    def __init__(self, model=None, provider: str = None, model_name: str = None):
+        """
+        model: any object with generate_content(prompt) -> response.text, used instead of Gemini
+        (a stub in tests, or another client); provider and model_name label it in the cache key.
+        """
         self.api_key = os.getenv("GEMINI_API_KEY") 
         self.provider = "mock"
-        
-        if self.api_key and HAS_GEMINI:
+        self.model = None
+        self.model_name = None
+        # Per event loop: the concurrency semaphore and in-flight prompts (see _acomplete);
+        # weak keys, so a closed loop's entry goes away with the loop
+        self._loop_state = weakref.WeakKeyDictionary()
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+        if model is not None:
+            self.provider = provider or "custom"
+            self.model = model
+            self.model_name = model_name or type(model).__name__
+            print(f" [OK] LLM Service: Using {self.provider} ({self.model_name})")
+        elif self.api_key and HAS_GEMINI:
             self.provider = "gemini"
             genai.configure(api_key=self.api_key)
-<<<<<<< HEAD
-            # Use gemini-2.5-flash as it is the only one with available quota
-=======
-            # Fallback to latest alias which has at least some quota (20/day)
->>>>>>> ed5a650 (Updated LLM in chatbot)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-            print(" [OK] LLM Service: Using Google Gemini (gemini-2.5-flash)")
+            # gemini-2.5-flash is the only model with available quota, and only 20 requests/day;
+            # llm_cache keeps repeated questions from spending it
+            self.model_name = GEMINI_MODEL
+            self.model = genai.GenerativeModel(GEMINI_MODEL)
+            print(f" [OK] LLM Service: Using Google Gemini ({GEMINI_MODEL})")
         else:
             print(" [WARN] LLM Service: running in OFFLINE/MOCK mode.")
             if not self.api_key:
@@ -37,7 +75,7 @@ class LLMService:
         """
         Converts natural language to SQL.
         """
-        if self.provider == "gemini":
+        if self.model is not None:
             return self._gemini_text_to_sql(user_query)
         else:
             return self._mock_text_to_sql(user_query)
@@ -49,30 +87,34 @@ class LLMService:
         if not data:
             return "No data found matching your query."
             
-        if self.provider == "gemini":
+        if self.model is not None:
             return self._gemini_generate_insight(data, query)
         else:
             return self._mock_generate_insight(data, query)
 
-    def _gemini_text_to_sql(self, query):
-        system_prompt = """
-        You are a SQL expert for a Clinical Trial Database (SQLite).
-        Schema:
-        - sae_metrics (id, study_id, country, site, patient_id, review_status)
-        - missing_pages (id, study_id, site_number, subject_name, form_name, visit_date, missing_days)
-        - edc_metrics (id, study_id, site_id, subject_id, subject_status, latest_visit)
-
-        Return ONLY raw SQL. No markdown, no backticks.
+    async def agenerate_sql(self, user_query: str) -> str:
         """
-        try:
-            response = self.model.generate_content(f"{system_prompt}\nQuery: {query}")
-            sql = response.text.replace("```sql", "").replace("```", "").strip()
-            return sql
-        except Exception as e:
-            print(f"Gemini API Error: {e}")
-            return self._mock_text_to_sql(query)
+        Async generate_sql: the model call doesn't hold a worker thread while it waits.
+        """
+        if self.model is not None:
+            return await self._agemini_text_to_sql(user_query)
+        else:
+            return self._mock_text_to_sql(user_query)
 
-    def _gemini_generate_insight(self, data, query):
+    async def agenerate_insight(self, data: list, query: str) -> str:
+        if not data:
+            return "No data found matching your query."
+
+        if self.model is not None:
+            return await self._agemini_generate_insight(data, query)
+        else:
+            return self._mock_generate_insight(data, query)
+
+    def _sql_request(self, query):
+        key = llm_cache.make_key(self.provider, self.model_name, SQL_PROMPT_VERSION, "sql", query)
+        return key, f"{SQL_SYSTEM_PROMPT}\nQuery: {query}"
+
+    def _insight_request(self, data, query):
         data_preview = str(data[:10]) # Send first 10 rows to avoid token limits
         prompt = f"""
         You are a Clinical Scientist Assistant.
@@ -82,15 +124,128 @@ class LLMService:
         Provide a concise (2-3 sentences) scientific insight about this data. 
         Focus on risk, compliance, or safety patterns.
         """
+        key = llm_cache.make_key(self.provider, self.model_name, INSIGHT_PROMPT_VERSION, "insight", query, data[:10])
+        return key, prompt
+
+    def _store_sql(self, key, text):
+        sql = text.replace("```sql", "").replace("```", "").strip()
+        llm_cache.put(key, sql, self.provider, self.model_name, "sql")
+        return sql
+
+    def _store_insight(self, key, text):
+        # Fallback answers are never cached, so the model is retried next time
+        llm_cache.put(key, text, self.provider, self.model_name, "insight")
+        return text
+
+    def forget_sql(self, user_query: str):
+        """Drop the cached SQL for a question, e.g. because it failed to run, so the model is asked again."""
+        if self.model is not None:
+            key, _ = self._sql_request(user_query)
+            llm_cache.delete(key)
+
+    def _insight_fallback(self, data, query, error):
+        print(f" [ERR] Gemini Insight Error: {error}")
+        mock_insight = self._mock_generate_insight(data, query)
+        error_msg = "⚠️ AI Service Unavailable (Quota Limit Reached). Showing automated analysis."
+        return f"{error_msg}\n\n{mock_insight}"
+
+    def _gemini_text_to_sql(self, query):
+        key, prompt = self._sql_request(query)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            return self._store_sql(key, self._complete(prompt))
+        except Exception as e:
+            print(f"Gemini API Error: {e}")
+            return self._mock_text_to_sql(query)
+
+    def _gemini_generate_insight(self, data, query):
+        key, prompt = self._insight_request(data, query)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            # Text access raises if the response was blocked
+            return self._store_insight(key, self._complete(prompt))
+        except Exception as e:
+            return self._insight_fallback(data, query, e)
+
+    # The cache is a SQLite file; its reads and writes run on a thread to keep the event loop free
+    async def _agemini_text_to_sql(self, query):
+        key, prompt = self._sql_request(query)
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            return cached
+        try:
+            text = await self._acomplete(prompt)
+            return await asyncio.to_thread(self._store_sql, key, text)
+        except Exception as e:
+            print(f"Gemini API Error: {e!r}")
+            return self._mock_text_to_sql(query)
+
+    async def _agemini_generate_insight(self, data, query):
+        key, prompt = self._insight_request(data, query)
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            return cached
         try:
-            response = self.model.generate_content(prompt)
-            # Check for block content if attributes exist, though text access should raise error if blocked
-            return response.text
+            text = await self._acomplete(prompt)
+            return await asyncio.to_thread(self._store_insight, key, text)
         except Exception as e:
-             print(f" [ERR] Gemini Insight Error: {e}")
-             mock_insight = self._mock_generate_insight(data, query)
-             error_msg = "⚠️ AI Service Unavailable (Quota Limit Reached). Showing automated analysis."
-             return f"{error_msg}\n\n{mock_insight}"
+            return self._insight_fallback(data, query, repr(e))
+
+    def _complete(self, prompt: str) -> str:
+        started, outcome = time.perf_counter(), "error"
+        try:
+            text = self.model.generate_content(prompt).text
+            outcome = "ok"
+            return text
+        finally:
+            LLM_CALL_SECONDS.labels(provider=self.provider, outcome=outcome).observe(time.perf_counter() - started)
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            # Added alongside the other loops' entries, which may still be running
+            state = self._loop_state[loop] = {"semaphore": asyncio.Semaphore(LLM_MAX_CONCURRENCY), "inflight": {}}
+        return state
+
+    async def _acomplete(self, prompt: str) -> str:
+        """
+        One model completion. Identical prompts already in flight share that call instead of
+        starting their own (single-flight), and a caller giving up doesn't cancel it for the others.
+        """
+        inflight = self._state()["inflight"]
+        task = inflight.get(prompt)
+        if task is None:
+            task = asyncio.ensure_future(self._call_model(prompt))
+            inflight[prompt] = task
+            task.add_done_callback(lambda _: inflight.pop(prompt, None))
+        else:
+            self.coalesced_calls += 1
+        return await asyncio.shield(task)
+
+    async def _call_model(self, prompt: str) -> str:
+        async with self._state()["semaphore"]:
+            self.upstream_calls += 1
+            if hasattr(self.model, "generate_content_async"):
+                call = self.model.generate_content_async(prompt)
+            else:
+                # Blocking clients run on a thread; after a timeout that thread finishes on its own
+                call = asyncio.to_thread(self.model.generate_content, prompt)
+            # Timed once the semaphore is held, so the histogram is upstream latency, not queueing
+            started, outcome = time.perf_counter(), "error"
+            try:
+                response = await asyncio.wait_for(call, timeout=LLM_TIMEOUT_S)
+                outcome = "ok"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise
+            finally:
+                LLM_CALL_SECONDS.labels(provider=self.provider, outcome=outcome).observe(time.perf_counter() - started)
+        return response.text
 
     def _mock_text_to_sql(self, query):
         """
@@ -1,21 +1,32 @@
-from fastapi import FastAPI, UploadFile, File, Depends
+import time
+import asyncio
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from database import engine, Base, SessionLocal
+from database import engine, SessionLocal, ReadSessionLocal
+from migrations import run_migrations
 from ingestion import run_ingestion
+from jobs import Job, ingestion_jobs, report_jobs
+from cache import analytics_cache, sql_result_cache, cached_response, current_generation
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, page, paginate_records
 from agent import ClinicalAgent
+from report_store import report_params, request_report, build_report, list_artifacts, artifact_dict, recover_interrupted
+from metrics import HTTP_REQUEST_SECONDS, render_metrics
 from pydantic import BaseModel
+from typing import List, Optional
 import pandas as pd
-<<<<<<< HEAD
 import models
 from datetime import datetime
-=======
 from dotenv import load_dotenv
 
 load_dotenv()
->>>>>>> 782bab7 (feat: Implement Scientific AI Agent with Gemini, fix ingestion, refine UI)
 
-Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+
+# Report jobs run in-process; any cut off by the last shutdown are marked failed
+with SessionLocal() as db:
+    recover_interrupted(db)
 
 app = FastAPI(title="Clinical Trial Insights")
 
@@ -27,6 +38,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Labelled by route template (/sites/{site_number}/patients), not the raw path, to keep the series bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method, route=route.path if route else "unmatched", status=status
+        ).observe(time.perf_counter() - started)
+
 agent = ClinicalAgent()
 
 class ChatRequest(BaseModel):
@@ -39,110 +65,217 @@ def get_db():
     finally:
         db.close()
 
+# Read-only endpoints use the read pool, so they keep serving while ingestion holds the writer
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def paginate_or_400(records, sort, descending, limit, cursor, tie_key):
+    try:
+        return paginate_records(records, sort, descending, limit, cursor, tie_key=tie_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/")
 def read_root():
     return {"message": "Clinical Trial Insights API is running"}
 
 @app.post("/ingest")
 def trigger_ingestion():
-    run_ingestion()
-    return {"message": "Ingestion triggered"}
+    # Full rescan runs in the background; poll /ingest/jobs/{job_id} or stream its events
+    job = Job("rescan")
+    ingestion_jobs.submit(job, lambda job: run_ingestion(progress=job.report))
+    return {"message": "Ingestion triggered", "job_id": job.id, "status": job.status}
 
+# Async so requests waiting on the model don't each hold a threadpool worker
 @app.post("/chat")
-def chat_with_agent(request: ChatRequest):
-    response = agent.query(request.query)
+async def chat_with_agent(request: ChatRequest):
+    response = await agent.aquery(request.query)
     return response
 
 @app.get("/stats")
-def get_stats():
-    return agent.get_summary()
+async def get_stats():
+    return await agent.aget_summary()
 
+# Analytics responses only change when ingestion commits new data, so they are served from
+# analytics_cache until the data generation moves on
 @app.get("/analytics/risk")
-def get_risk_heatmap(db: Session = Depends(get_db)):
+def get_risk_heatmap(db: Session = Depends(get_read_db)):
     from analytics import get_risk_heatmap_data
-    return get_risk_heatmap_data(db)
+    return cached_response(db, "risk", lambda: get_risk_heatmap_data(db))
 
 @app.get("/analytics/score")
-def get_study_score(db: Session = Depends(get_db)):
-    from analytics import calculate_study_health_score
-    score = calculate_study_health_score(db)
-    return {"score": score}
+def get_study_score(study_id: str = None, by_study: bool = False, db: Session = Depends(get_read_db)):
+    from analytics import calculate_study_health_score, calculate_study_health_scores
+    score = cached_response(db, "score", lambda: calculate_study_health_score(db, study_id), study_id=study_id)
+    if not by_study:
+        return {"score": score}
+    studies = cached_response(db, "study-scores", lambda: calculate_study_health_scores(db))
+    return {"score": score, "studies": studies}
 
 @app.get("/analytics/trend")
-def get_trends(db: Session = Depends(get_db)):
+def get_trends(db: Session = Depends(get_read_db)):
     from analytics import get_sae_trend
-    return get_sae_trend(db)
+    return cached_response(db, "trend", lambda: get_sae_trend(db))
 
 @app.get("/analytics/risk-monitor")
-def get_risk_monitor(db: Session = Depends(get_db)):
-    from analytics import get_detailed_risk_data
-    return get_detailed_risk_data(db)
+def get_risk_monitor(
+    risk_level: str = None,
+    study: str = None,
+    country: str = None,
+    dqi_min: int = None,
+    dqi_max: int = None,
+    q: str = None,
+    sort: str = "dqi",
+    order: str = "asc",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    db: Session = Depends(get_read_db),
+):
+    from analytics import get_detailed_risk_data, filter_risk_data, RISK_SORT_FIELDS
+    if sort not in RISK_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(RISK_SORT_FIELDS)}")
+    # Scored once per data generation; each request only filters and pages that list
+    risk_data = cached_response(db, "risk-monitor", lambda: get_detailed_risk_data(db))
+    sites = filter_risk_data(
+        risk_data,
+        risk_levels=risk_level.split(",") if risk_level else None,
+        study=study, country=country, dqi_min=dqi_min, dqi_max=dqi_max, search=q,
+    )
+    items, next_cursor = paginate_or_400(sites, sort, order == "desc", limit, cursor, tie_key="id")
+    response = page(items, next_cursor, total=len(sites))
+    response["studies"] = sorted({site["study_id"] for site in risk_data})
+    response["risk_counts"] = {level: sum(1 for site in risk_data if site["risk_level"] == level) for level in ("High", "Medium", "Low")}
+    return response
+
+@app.get("/analytics/cache")
+def get_analytics_cache_stats():
+    import llm_cache
+    return {"responses": analytics_cache.stats(), "agent_sql": sql_result_cache.stats(), "llm": llm_cache.stats()}
+
+# Prometheus scrape endpoint; values are per process
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+class ReportRequest(BaseModel):
+    study: Optional[str] = None
 
 @app.get("/reports")
-def get_reports():
-    from analytics import get_generated_reports
-    return get_generated_reports()
+def get_reports(db: Session = Depends(get_read_db)):
+    generation = current_generation(db)
+    return [artifact_dict(artifact, generation) for artifact in list_artifacts(db)]
 
+# Reports render in the background into the artifact store; the same report for unchanged data
+# is served from the store instead of being rendered again
 @app.post("/reports/generate")
-def generate_report(db: Session = Depends(get_db)):
-    from analytics import get_detailed_risk_data
-    from reports import generate_pdf_report
-    from fastapi.responses import StreamingResponse
-    
-    # Fetch real data for the report
-    risk_data = get_detailed_risk_data(db)
-    
-    # Calculate summary stats for the report
-    high_risk = len([r for r in risk_data if r['risk_level'] == 'High'])
-    
-    # Generate AI Narrative
-    # Use the agent to create a natural language summary
-    try:
-        from main import agent
-        summary_prompt = f"Summarize the risk status for {len(risk_data)} clinical sites. There are {high_risk} high risk sites. The average DQI is {sum(r['dqi'] for r in risk_data)/len(risk_data):.1f}."
-        ai_summary = agent.query(summary_prompt).get('answer', '')
-    except:
-        ai_summary = None
-
-    report_context = {
-        "study_id": "CT-2024-001", # Mock context
-        "sites": risk_data,
-        "site_count": len(risk_data),
-        "high_risk_count": high_risk,
-        "executive_summary": ai_summary
-    }
-    
-    pdf_buffer = generate_pdf_report(report_context)
-    
-    return StreamingResponse(
-        pdf_buffer, 
-        media_type="application/pdf", 
-        headers={"Content-Disposition": "attachment; filename=risk_assessment_report.pdf"}
-    )
+def generate_report(request: Optional[ReportRequest] = None, db: Session = Depends(get_db)):
+    params = report_params(request.study if request else None)
+    job = Job("report")
+    artifact, reused = request_report(db, params, job.id)
+    if not reused:
+        artifact_id = artifact.id
+        report_jobs.submit(job, lambda job: build_report(job, artifact_id, summarize=agent.query))
+    response = artifact_dict(artifact, current_generation(db))
+    response["reused"] = reused
+    return response
+
+def get_report_or_404(db: Session, report_id: int):
+    report = db.get(models.ReportArtifact, report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
+
+@app.get("/reports/{report_id}")
+def get_report(report_id: int, db: Session = Depends(get_read_db)):
+    return artifact_dict(get_report_or_404(db, report_id), current_generation(db))
+
+@app.get("/reports/{report_id}/download")
+def download_report(report_id: int, db: Session = Depends(get_read_db)):
+    import os
+    from fastapi.responses import FileResponse
+    report = get_report_or_404(db, report_id)
+    if report.status != "ready" or not report.path or not os.path.exists(report.path):
+        raise HTTPException(status_code=409, detail=f"Report is {report.status}" if report.status != "ready" else "Report file is missing")
+    return FileResponse(report.path, media_type="application/pdf", filename=f"risk_assessment_report_{report.id}.pdf")
 
 @app.post("/ingest/file")
 async def ingest_file(file: UploadFile = File(...)):
     import shutil
     import os
+    import time
     from ingestion import DATA_DIR
     
     # Ensure DATA_DIR exists
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
     
-    file_location = os.path.join(DATA_DIR, file.filename)
+    file_location = os.path.join(DATA_DIR, os.path.basename(file.filename))
+    job = Job("file", filename=file.filename)
     
     try:
+        job.report("upload", "running")
+        start = time.perf_counter()
         with open(file_location, "wb+") as file_object:
             shutil.copyfileobj(file.file, file_object)
-        
-        # Trigger ingestion pipeline
-        run_ingestion()
-        
-        return {"message": f"Successfully ingested {file.filename}", "status": "processing"}
+        job.report("upload", "done", bytes=os.path.getsize(file_location), seconds=round(time.perf_counter() - start, 3))
     except Exception as e:
         return {"message": f"Error interacting with file: {str(e)}", "status": "error"}
 
+    # Only the uploaded workbook is processed, in the background
+    ingestion_jobs.submit(job, lambda job: ingest_uploaded_file(job, file_location))
+    return {"message": f"Queued {file.filename} for ingestion", "status": "processing", "job_id": job.id}
+
+def ingest_uploaded_file(job: Job, path: str):
+    from ingestion import ingest_file as ingest_single_file
+    db = SessionLocal()
+    try:
+        result = ingest_single_file(db, path, progress=job.report)
+    finally:
+        db.close()
+    if result["status"] in ("failed", "unidentified"):
+        raise ValueError(result.get("error") or f"{result['file']} is not a recognized clinical report")
+    return result
+
+def get_job_or_404(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/ingest/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    return get_job_or_404(job_id).to_dict()
+
+@app.get("/ingest/jobs/{job_id}/events")
+async def stream_ingestion_job(job_id: str):
+    import json
+    from fastapi.responses import StreamingResponse
+
+    job = get_job_or_404(job_id)
+
+    async def event_stream():
+        # Server-Sent Events: replay everything so far, then follow until the job finishes
+        seq = 0
+        while True:
+            finished = job.finished
+            for event in job.events_since(seq):
+                seq = event["seq"]
+                yield f"id: {seq}\nevent: progress\ndata: {json.dumps(event, default=str)}\n\n"
+            if finished:
+                yield f"event: end\ndata: {json.dumps(job.to_dict(), default=str)}\n\n"
+                break
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 class CommentRequest(BaseModel):
     comment: str
     author: str
@@ -162,12 +295,59 @@ def add_site_comment(site_number: str, request: CommentRequest, db: Session = De
     return {"status": "success", "message": "Comment added"}
 
 @app.get("/sites/{site_number}/comments")
-def get_site_comments(site_number: str, db: Session = Depends(get_db)):
-    return db.query(models.SiteComment).filter(models.SiteComment.site_number == site_number).all()
+def get_site_comments(
+    site_number: str,
+    tag: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    db: Session = Depends(get_read_db),
+):
+    # Newest first, paged on id through the site_number index
+    query = db.query(models.SiteComment).filter(models.SiteComment.site_number == site_number)
+    if tag:
+        query = query.filter(models.SiteComment.tag == tag)
+    if cursor:
+        try:
+            (before_id,) = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(models.SiteComment.id < before_id)
+    comments = query.order_by(models.SiteComment.id.desc()).limit(limit + 1).all()
+    items = comments[:limit]
+    next_cursor = encode_cursor([items[-1].id]) if len(comments) > limit else None
+    return page(items, next_cursor)
 
 @app.get("/sites/{site_number}/patients")
-def get_site_patients(site_number: str, db: Session = Depends(get_db)):
+def get_site_patients(
+    site_number: str,
+    clean: bool = None,
+    q: str = None,
+    sort: str = "subject_id",
+    order: str = "asc",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    db: Session = Depends(get_read_db),
+):
     from analytics import get_site_patients_data
-    return get_site_patients_data(db, site_number)
+    if sort not in ("subject_id", "missing_pages", "sae_pending", "status"):
+        raise HTTPException(status_code=400, detail="sort must be one of subject_id, missing_pages, sae_pending, status")
+    site = cached_response(db, "site-patients", lambda: get_site_patients_data(db, site_number), site=site_number)
+    patients = site["topics"]
+    if clean is not None:
+        patients = [p for p in patients if p["is_clean"] == clean]
+    if q:
+        patients = [p for p in patients if q.lower() in str(p["subject_id"]).lower()]
+    items, next_cursor = paginate_or_400(patients, sort, order == "desc", limit, cursor, tie_key="id")
+    # Site-level totals still describe every subject; topics is the requested page
+    return {**site, "topics": items, "next_cursor": next_cursor, "total_matching": len(patients)}
+
+class SitesRequest(BaseModel):
+    sites: List[str]
+
+@app.post("/sites/patients")
+def get_sites_patients(request: SitesRequest, db: Session = Depends(get_read_db)):
+    # Batch drill-down: {site_number: patients view} for many sites in one call
+    from analytics import get_sites_patients_data
+    return get_sites_patients_data(db, request.sites)
 
 
@@ -0,0 +1,135 @@
+import math
+import threading
+
+# In-process counters and histograms, rendered in the Prometheus text exposition format on /metrics.
+# Each process keeps its own values, so run one API worker per scrape target (or scrape each worker).
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def format_value(value: float):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        return BoundMetric(self, key)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class BoundMetric:
+    def __init__(self, metric: Metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount: float = 1):
+        self.metric._inc(self.key, amount)
+
+    def observe(self, value: float):
+        self.metric._observe(self.key, value)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1):
+        self._inc((), amount)
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float):
+        self._observe((), value)
+
+    def _observe(self, key, value):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][i] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, entry in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry["buckets"]):
+                    cumulative += count
+                    labels = format_labels(self.labelnames, key, [("le", format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {format_value(entry['sum'])}")
+                lines.append(f"{self.name}_count{labels} {entry['count']}")
+        return lines
+
+REGISTRY = []
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route template.",
+    ["method", "route", "status"])
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time, by connection pool.",
+    ["pool"])
+AGENT_SQL_SECONDS = Histogram(
+    "agent_sql_duration_seconds", "Generated agent SQL execution time, by engine and outcome.",
+    ["engine", "outcome"])
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_duration_seconds", "Upstream model call latency, by provider and outcome.",
+    ["provider", "outcome"], buckets=SLOW_BUCKETS)
+PDF_RENDER_SECONDS = Histogram(
+    "pdf_render_duration_seconds", "Time to render a report PDF to disk.",
+    ["mode"], buckets=SLOW_BUCKETS)
+INGEST_FILES = Counter(
+    "ingestion_files_total", "Workbooks seen by ingestion, by file type and outcome.",
+    ["file_type", "status"])
+INGEST_ROWS = Counter("ingestion_rows_total", "Rows written by ingestion.", ["file_type"])
+INGEST_BYTES = Counter("ingestion_bytes_total", "Workbook bytes ingested.", ["file_type"])
+INGEST_SECONDS = Counter("ingestion_seconds_total", "Parse and write time spent on ingested workbooks.", ["file_type", "stage"])
+INGEST_ERRORS = Counter("ingestion_errors_total", "Workbooks that failed to ingest.", ["file_type"])
@@ -0,0 +1,106 @@
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from keys import canonical_keys
+import models
+
+# Schema changes to existing databases, applied in order. PRAGMA user_version records the last one applied.
+# create_all() still builds new tables; migrations cover what it won't do to tables that already exist.
+# Every migration must be safe on a database that create_all() has just built from the current models.
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+# Tables filled from source workbooks, with the source columns their site_key/subject_key are derived from
+KEY_SOURCE_COLUMNS = {
+    "sae_metrics": ("site", "patient_id"),
+    "missing_pages": ("site_number", "subject_name"),
+    "edc_metrics": ("site_id", "subject_id"),
+}
+
+def add_missing_columns(conn, columns):
+    for table in KEY_SOURCE_COLUMNS:
+        existing = {c['name'] for c in inspect(conn).get_columns(table)}
+        for column in columns:
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} VARCHAR"))
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})"))
+
+@migration(1, "Track the source workbook of ingested rows")
+def add_source_file(conn):
+    add_missing_columns(conn, ["source_file"])
+
+def backfill_keys(conn, only_missing: bool):
+    for table, (site_col, subject_col) in KEY_SOURCE_COLUMNS.items():
+        where = " WHERE site_key IS NULL" if only_missing else ""
+        df = pd.read_sql(text(f"SELECT id, {site_col}, {subject_col} FROM {table}{where}"), conn)
+        if df.empty:
+            continue
+        updates = pd.DataFrame({
+            "row_id": df["id"],
+            "site_key": canonical_keys(df[site_col]),
+            "subject_key": canonical_keys(df[subject_col]),
+        })
+        conn.execute(
+            text(f"UPDATE {table} SET site_key = :site_key, subject_key = :subject_key WHERE id = :row_id"),
+            updates.to_dict(orient="records")
+        )
+        print(f"🔑 Backfilled site/subject keys for {len(updates)} rows in {table}")
+
+@migration(2, "Canonical site/subject keys")
+def add_canonical_keys(conn):
+    add_missing_columns(conn, ["site_key", "subject_key"])
+    backfill_keys(conn, only_missing=True)
+
+@migration(3, "Composite indexes for the analytics access paths")
+def add_composite_indexes(conn):
+    for model in (models.SAEMetrics, models.MissingPages, models.EDCMetrics):
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+@migration(4, "Site risk and study health rollups")
+def build_rollups(conn):
+    # Tables come from create_all(); fill them from the rows already ingested
+    from rollups import refresh_summaries
+    db = Session(bind=conn)
+    refresh_summaries(db)
+    db.flush()
+
+@migration(5, "Comment tags")
+def add_comment_tag(conn):
+    # SiteComment.tag was added to the model without touching databases created before it
+    columns = {c['name'] for c in inspect(conn).get_columns("site_comments")}
+    if "tag" not in columns:
+        conn.execute(text("ALTER TABLE site_comments ADD COLUMN tag VARCHAR DEFAULT 'Info'"))
+
+@migration(6, "Canonical keys that keep separators between identifier parts")
+def recompute_canonical_keys(conn):
+    # Keys from before v6 dropped every separator, so '10-1' and '101' joined as one subject
+    backfill_keys(conn, only_missing=False)
+    from rollups import refresh_summaries
+    from cache import bump_generation
+    db = Session(bind=conn)
+    refresh_summaries(db)
+    # Stored reports and cached responses were built from the old joins
+    bump_generation(db)
+    db.flush()
+
+def schema_version(conn):
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+def run_migrations(engine):
+    """Create missing tables, then apply any migrations newer than the database's user_version."""
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        current = schema_version(conn)
+        for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version <= current:
+                continue
+            print(f"🛠️ Migrating schema to v{version}: {description}")
+            fn(conn)
+            conn.execute(text(f"PRAGMA user_version = {version}"))
+    return max((m[0] for m in MIGRATIONS), default=0)
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -17,6 +17,16 @@ class SAEMetrics(Base):
     patient_id = Column(String)
     review_status = Column(String)
     action_status = Column(String)
+    site_key = Column(String, index=True)
+    subject_key = Column(String, index=True)
+    source_file = Column(String, index=True)
+
+    # Composite indexes follow the analytics access paths; existing databases get them from migrations.py
+    __table_args__ = (
+        Index("ix_sae_metrics_site_review", "site_key", "review_status"),
+        Index("ix_sae_metrics_site_subject_review", "site_key", "subject_key", "review_status"),
+        Index("ix_sae_metrics_study_site_review", "study_id", "site_key", "review_status"),
+    )
     
 class MissingPages(Base):
     __tablename__ = "missing_pages"
@@ -27,6 +37,14 @@ class MissingPages(Base):
     form_name = Column(String)
     visit_date = Column(String) # Keeping as string for flexibility with bad data
     missing_days = Column(Integer)
+    site_key = Column(String, index=True)
+    subject_key = Column(String, index=True)
+    source_file = Column(String, index=True)
+
+    __table_args__ = (
+        Index("ix_missing_pages_site_subject", "site_key", "subject_key", "site_number", "subject_name"),
+        Index("ix_missing_pages_study_site_subject", "study_id", "site_key", "subject_key"),
+    )
 
 class VisitProjection(Base):
     __tablename__ = "visit_projections"
@@ -45,6 +63,14 @@ class EDCMetrics(Base):
     subject_id = Column(String)
     subject_status = Column(String)
     latest_visit = Column(String)
+    site_key = Column(String, index=True)
+    subject_key = Column(String, index=True)
+    source_file = Column(String, index=True)
+
+    __table_args__ = (
+        Index("ix_edc_metrics_site_subject", "site_key", "subject_key"),
+        Index("ix_edc_metrics_study_site_subject", "study_id", "site_key", "subject_key"),
+    )
 
 class SiteComment(Base):
     __tablename__ = "site_comments"
@@ -54,3 +80,71 @@ class SiteComment(Base):
     tag = Column(String, default="Info")
     author = Column(String)
     created_at = Column(DateTime)
+
+class IngestionManifest(Base):
+    __tablename__ = "ingestion_manifest"
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, unique=True, index=True)
+    size = Column(Integer)
+    mtime = Column(Float)
+    content_hash = Column(String)
+    file_type = Column(String)
+    row_count = Column(Integer)
+    ingested_at = Column(DateTime)
+
+class SiteRiskSummary(Base):
+    # Per-study site aggregates, rebuilt by rollups.refresh_summaries() whenever a study's data changes
+    __tablename__ = "site_risk_summary"
+    id = Column(Integer, primary_key=True, index=True)
+    study_id = Column(String)
+    site_key = Column(String, index=True)
+    site_number = Column(String)
+    missing_pages = Column(Integer)
+    sae_count = Column(Integer)
+    sae_pending = Column(Integer)
+    refreshed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_site_risk_summary_study_site", "study_id", "site_key", unique=True),
+    )
+
+class StudyHealthSummary(Base):
+    __tablename__ = "study_health_summary"
+    id = Column(Integer, primary_key=True, index=True)
+    study_id = Column(String, unique=True, index=True)
+    missing_pages = Column(Integer)
+    sae_count = Column(Integer)
+    sae_pending = Column(Integer)
+    health_score = Column(Integer)
+    refreshed_at = Column(DateTime)
+
+class DataGeneration(Base):
+    # Single row, bumped whenever ingestion commits new data; cached responses from older generations are stale
+    __tablename__ = "data_generation"
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, default=0)
+    updated_at = Column(DateTime)
+
+class ReportArtifact(Base):
+    # A rendered report PDF in the artifact store, with what it was built from
+    __tablename__ = "report_artifacts"
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String)
+    report_type = Column(String)
+    study_id = Column(String, nullable=True)
+    params = Column(String)
+    params_hash = Column(String)
+    data_generation = Column(Integer)
+    status = Column(String, default="queued")
+    job_id = Column(String)
+    path = Column(String, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    site_count = Column(Integer, nullable=True)
+    render_seconds = Column(Float, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_report_artifacts_lookup", "params_hash", "data_generation", "status"),
+    )
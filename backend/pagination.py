@@ -0,0 +1,64 @@
+import base64
+import json
+from bisect import bisect_left, bisect_right
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(values):
+    """Opaque cursor for the sort key of the last item on a page."""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii"))))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def page(items, next_cursor, total=None):
+    response = {"items": items, "next_cursor": next_cursor}
+    if total is not None:
+        response["total"] = total
+    return response
+
+def sort_value(value):
+    # None sorts first, and never gets compared with a real value
+    return (value is not None, value if value is not None else 0)
+
+def paginate_records(records, sort: str, descending: bool, limit: int, cursor: str = None, tie_key: str = None):
+    """
+    Keyset pagination over an in-memory list of dicts, ordered by (sort, tie_key).
+    The cursor is the key of the last row served, so pages stay stable when earlier rows are
+    filtered out, and finding the next page is a binary search instead of an offset scan.
+    Returns (page_items, next_cursor).
+    """
+    tie_key = tie_key or sort
+
+    def key(record):
+        return (sort_value(record.get(sort)), sort_value(record.get(tie_key)))
+
+    ordered = sorted(records, key=key)
+    keys = [key(record) for record in ordered]
+    after = decode_cursor(cursor) if cursor else None
+    try:
+        if after:
+            after = tuple(tuple(part) for part in after)
+        if descending:
+            end = bisect_left(keys, after) if after else len(ordered)
+        else:
+            start = bisect_right(keys, after) if after else 0
+    except TypeError:
+        # A cursor from a different sort order; its values don't compare with this one's
+        raise ValueError("Invalid cursor")
+
+    if descending:
+        start = max(0, end - limit)
+        items = ordered[start:end][::-1]
+        has_more = start > 0
+    else:
+        end = start + limit
+        items = ordered[start:end]
+        has_more = end < len(ordered)
+
+    next_cursor = encode_cursor(key(items[-1])) if items and has_more else None
+    return items, next_cursor
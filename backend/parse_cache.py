@@ -0,0 +1,135 @@
+import os
+import glob
+import hashlib
+import pandas as pd
+
+# Parquet support is optional; without pyarrow every read goes straight to Excel
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".parse_cache"))
+# Total size the cache may grow to before least-recently-used sheets are evicted; 0 disables caching
+CACHE_MAX_MB = float(os.getenv("PARSE_CACHE_MAX_MB", "500"))
+
+def cache_enabled():
+    return HAS_ARROW and CACHE_MAX_MB > 0
+
+def compute_file_hash(filepath, chunk_size=1024 * 1024):
+    """SHA-256 of the file contents, read in chunks so large workbooks aren't loaded at once."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def header_signature(columns):
+    """Short digest of the normalized sheet headers, recorded in the entry's file name."""
+    joined = "|".join(str(c).strip().lower() for c in columns)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:16]
+
+def find_entry(content_hash):
+    """Path of the cached sheet for this workbook content, or None."""
+    matches = glob.glob(os.path.join(CACHE_DIR, f"{content_hash}_*.parquet"))
+    return matches[0] if matches else None
+
+def to_arrow_frame(df):
+    """
+    Parquet needs one type per column. Mixed object columns (ints, text, dates in one column)
+    are stored as strings, which is what ingestion turns them into anyway.
+    """
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col]
+            df[col] = values.where(values.isna(), values.astype(str)).astype(object)
+    return df
+
+def load(content_hash):
+    """Cached sheet as a DataFrame, or None on a miss."""
+    if not cache_enabled():
+        return None
+    path = find_entry(content_hash)
+    if path is None:
+        return None
+    try:
+        df = pq.read_table(path).to_pandas()
+    except Exception as e:
+        print(f"⚠️ Dropping unreadable parse cache entry {os.path.basename(path)}: {e}")
+        os.remove(path)
+        return None
+    os.utime(path)  # mark as recently used for LRU eviction
+    return df
+
+def iter_chunks(content_hash, chunk_size):
+    """Yield a cached sheet in DataFrames of at most chunk_size rows, or return None on a miss."""
+    if not cache_enabled():
+        return None
+    path = find_entry(content_hash)
+    if path is None:
+        return None
+    os.utime(path)
+
+    def chunks():
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    return chunks()
+
+def store(content_hash, df):
+    if not cache_enabled():
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    frame = to_arrow_frame(df)
+    path = os.path.join(CACHE_DIR, f"{content_hash}_{header_signature(frame.columns)}.parquet")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp_path)
+        # Atomic rename, so parse workers racing on the same workbook never see a partial file
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"⚠️ Could not cache parsed sheet for {content_hash[:12]}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    evict()
+
+def evict(max_mb=None):
+    """Delete least-recently-used entries until the cache fits in max_mb."""
+    max_bytes = (CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    entries = []
+    for path in glob.glob(os.path.join(CACHE_DIR, "*.parquet")):
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+def read_workbook(filepath, content_hash=None):
+    """pd.read_excel with the parse cache in front of it."""
+    if not cache_enabled():
+        return pd.read_excel(filepath)
+    content_hash = content_hash or compute_file_hash(filepath)
+    df = load(content_hash)
+    if df is None:
+        df = pd.read_excel(filepath)
+        store(content_hash, df)
+    return df
+
+def preview_workbook(filepath, rows: int = 5):
+    """
+    The first rows of a workbook: from the cached sheet when there is one, otherwise only those
+    rows are read from Excel. Nothing is cached, so previews stay cheap on big workbooks.
+    """
+    if cache_enabled():
+        chunks = iter_chunks(compute_file_hash(filepath), rows)
+        for chunk in chunks or ():
+            return chunk
+    return pd.read_excel(filepath, nrows=rows)
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from cache import current_generation, cached_response
+import models
+
+# Rendered PDFs live here; metadata rows in report_artifacts point at them
+REPORT_STORE_DIR = os.getenv("REPORT_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".reports"))
+
+REPORT_TYPE = "Risk Assessment"
+
+# Serializes the reuse check and the insert, so concurrent identical requests share one artifact
+_request_lock = threading.Lock()
+
+def report_params(study: str = None):
+    return {"type": REPORT_TYPE, "study": study or None}
+
+def params_hash(params: dict):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+def report_title(params: dict):
+    return f"{params['type']} - {params['study'] or 'All Studies'}"
+
+def find_reusable(db: Session, params: dict, generation: int):
+    """
+    A ready artifact built from this generation's data with the same parameters, or one
+    already queued or rendering, so repeated requests don't render the same report twice.
+    """
+    candidates = db.query(models.ReportArtifact).filter(
+        models.ReportArtifact.params_hash == params_hash(params),
+        models.ReportArtifact.data_generation == generation,
+        models.ReportArtifact.status.in_(("ready", "queued", "running"))
+    ).order_by(models.ReportArtifact.id.desc()).all()
+    for artifact in candidates:
+        # A ready row whose file has been removed can't be served
+        if artifact.status != "ready" or (artifact.path and os.path.exists(artifact.path)):
+            return artifact
+    return None
+
+def create_artifact(db: Session, params: dict, generation: int, job_id: str):
+    artifact = models.ReportArtifact(
+        title=report_title(params),
+        report_type=params["type"],
+        study_id=params["study"],
+        params=json.dumps(params, sort_keys=True),
+        params_hash=params_hash(params),
+        data_generation=generation,
+        status="queued",
+        job_id=job_id,
+        created_at=datetime.now()
+    )
+    db.add(artifact)
+    db.commit()
+    db.refresh(artifact)
+    return artifact
+
+def request_report(db: Session, params: dict, job_id: str):
+    """Returns (artifact, reused). Only a new artifact needs a job to be submitted for it."""
+    with _request_lock:
+        generation = current_generation(db)
+        existing = find_reusable(db, params, generation)
+        if existing:
+            return existing, True
+        return create_artifact(db, params, generation, job_id), False
+
+def recover_interrupted(db: Session):
+    """Jobs run in-process, so anything still queued or running at startup was lost with the old process."""
+    updated = db.query(models.ReportArtifact).filter(
+        models.ReportArtifact.status.in_(("queued", "running"))
+    ).update({"status": "failed", "error": "Interrupted by a server restart", "finished_at": datetime.now()},
+             synchronize_session=False)
+    db.commit()
+    return updated
+
+def report_context(db: Session, params: dict, summarize=None):
+    from analytics import get_detailed_risk_data, filter_risk_data
+    risk_data = cached_response(db, "risk-monitor", lambda: get_detailed_risk_data(db))
+    sites = filter_risk_data(risk_data, study=params["study"]) if params["study"] else risk_data
+    high_risk = len([r for r in sites if r['risk_level'] == 'High'])
+
+    ai_summary = None
+    if summarize and sites:
+        try:
+            summary_prompt = f"Summarize the risk status for {len(sites)} clinical sites. There are {high_risk} high risk sites. The average DQI is {sum(r['dqi'] for r in sites)/len(sites):.1f}."
+            ai_summary = summarize(summary_prompt).get('answer', '')
+        except Exception as e:
+            print(f"⚠️ Report summary unavailable: {e}")
+
+    return {
+        "study_id": params["study"] or "All Studies",
+        "sites": sites,
+        "site_count": len(sites),
+        "high_risk_count": high_risk,
+        "executive_summary": ai_summary
+    }
+
+def build_report(job, artifact_id: int, summarize=None):
+    """Job body: gather the data, render the PDF into the store and fill in the artifact row."""
+    from reports import generate_pdf_report
+    db = SessionLocal()
+    try:
+        artifact = db.get(models.ReportArtifact, artifact_id)
+        params = json.loads(artifact.params)
+        artifact.status = "running"
+        # The generation the data is actually read at, in case ingestion ran while this was queued
+        artifact.data_generation = current_generation(db)
+        db.commit()
+
+        try:
+            job.report("data", "running")
+            context = report_context(db, params, summarize)
+            job.report("data", "done", sites=context["site_count"])
+
+            job.report("render", "running")
+            start = time.perf_counter()
+            os.makedirs(REPORT_STORE_DIR, exist_ok=True)
+            path = os.path.join(REPORT_STORE_DIR, f"report-{artifact.id}.pdf")
+            # Rendered under a temporary name first, so a half-written file is never served
+            generate_pdf_report(context, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            render_seconds = round(time.perf_counter() - start, 3)
+            job.report("render", "done", bytes=os.path.getsize(path), seconds=render_seconds)
+        except Exception as e:
+            db.rollback()
+            artifact.status = "failed"
+            artifact.error = str(e)
+            artifact.finished_at = datetime.now()
+            db.commit()
+            raise
+
+        artifact.status = "ready"
+        artifact.path = path
+        artifact.size_bytes = os.path.getsize(path)
+        artifact.site_count = context["site_count"]
+        artifact.render_seconds = render_seconds
+        artifact.finished_at = datetime.now()
+        db.commit()
+        print(f"📄 Report {artifact.id} ready: {artifact.size_bytes} bytes in {render_seconds}s")
+        return artifact_dict(artifact)
+    finally:
+        db.close()
+
+def list_artifacts(db: Session, limit: int = 100):
+    return db.query(models.ReportArtifact).order_by(models.ReportArtifact.id.desc()).limit(limit).all()
+
+def artifact_dict(artifact, generation: int = None):
+    return {
+        "id": artifact.id,
+        "title": artifact.title,
+        "type": artifact.report_type,
+        "study": artifact.study_id,
+        "date": (artifact.finished_at or artifact.created_at).strftime("%Y-%m-%d %H:%M"),
+        # Display status, as the reports page shows it
+        "status": {"ready": "Ready", "failed": "Failed"}.get(artifact.status, "Processing"),
+        "state": artifact.status,
+        "job_id": artifact.job_id,
+        "data_generation": artifact.data_generation,
+        "stale": generation is not None and artifact.data_generation != generation,
+        "size_bytes": artifact.size_bytes,
+        "site_count": artifact.site_count,
+        "render_seconds": artifact.render_seconds,
+        "error": artifact.error,
+    }
@@ -1,79 +1,256 @@
-import io
+import os
+import time
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from datetime import datetime
+from metrics import PDF_RENDER_SECONDS
 
-def generate_pdf_report(report_data):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
+# Study sections are rendered as separate PDFs and merged; without pypdf the pack is rendered as one document
+try:
+    from pypdf import PdfReader
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+    HAS_PYPDF = True
+except ImportError:
+    HAS_PYPDF = False
+
+# Worker processes rendering study sections; 1 renders them in-process
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "1"))
+# Site rows per table. Each table starts with the header row, and a table is never laid out
+# over more than a couple of pages, so big site matrices don't slow ReportLab's page splitting down
+REPORT_TABLE_ROWS = int(os.getenv("REPORT_TABLE_ROWS", "30"))
+
+SITE_COLUMNS = ['Site ID', 'Risk Level', 'DQI', 'Query Rate', 'Deviations', 'Action']
+SITE_COLUMN_WIDTHS = [60, 60, 40, 60, 60, 150]
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')), # Blue header
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+styles = getSampleStyleSheet()
+
+def site_row(site):
+    return [
+        site.get('site', 'N/A'),
+        site.get('risk_level', 'Unknown'),
+        str(site.get('dqi', 'N/A')),
+        f"{site.get('query_resolution_rate', 0)}%",
+        str(site.get('protocol_deviations', 0)),
+        site.get('recommendation', 'Monitor')[:20] + "..." # Truncate for table fit
+    ]
+
+def site_tables(sites, rows_per_table: int = None):
+    """The site matrix as a run of tables of at most rows_per_table sites, each with its own header row."""
+    rows_per_table = rows_per_table or REPORT_TABLE_ROWS
+    for start in range(0, len(sites), rows_per_table):
+        table_data = [SITE_COLUMNS] + [site_row(site) for site in sites[start:start + rows_per_table]]
+        # repeatRows carries the header over when a table still breaks across a page
+        yield Table(table_data, colWidths=SITE_COLUMN_WIDTHS, repeatRows=1, style=TABLE_STYLE)
+
+def report_sections(report_data):
+    """One section per study, from report_data['sections'] or by grouping the sites on study_id."""
+    if report_data.get('sections'):
+        return report_data['sections']
+    by_study = {}
+    for site in report_data.get('sites') or []:
+        by_study.setdefault(site.get('study_id') or report_data.get('study_id', 'N/A'), []).append(site)
+    return [{"study_id": study_id, "sites": by_study[study_id]} for study_id in sorted(by_study)]
+
+def cover_story(report_data, sections):
     story = []
+    normal_style = styles['Normal']
 
     # Title
-    title_style = styles['Title']
-    story.append(Paragraph(f"Clinical Trial Risk Assessment Report", title_style))
+    story.append(Paragraph(f"Clinical Trial Risk Assessment Report", styles['Title']))
     story.append(Spacer(1, 12))
 
     # Meta Info
-    normal_style = styles['Normal']
     story.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", normal_style))
     story.append(Paragraph(f"Study ID: {report_data.get('study_id', 'N/A')}", normal_style))
     story.append(Spacer(1, 24))
 
     # Executive Summary (AI Generated or Default)
     story.append(Paragraph("Executive Summary", styles['Heading2']))
-    
+
     if report_data.get('executive_summary'):
         summary_text = report_data.get('executive_summary')
     else:
         summary_text = f"""
-        This report summarizes the risk profile for {report_data.get('site_count', 0)} clinical sites. 
-        High-risk indicators were detected in {report_data.get('high_risk_count', 0)} sites, primarily driven by 
+        This report summarizes the risk profile for {report_data.get('site_count', 0)} clinical sites.
+        High-risk indicators were detected in {report_data.get('high_risk_count', 0)} sites, primarily driven by
         SAE velocity and missing page cleanup rates.
         """
-        
+
     story.append(Paragraph(summary_text, normal_style))
     story.append(Spacer(1, 12))
 
-    # Table Data (if available)
-    if 'sites' in report_data and report_data['sites']:
-        story.append(Paragraph("Detailed Site Performance Matrix", styles['Heading2']))
+    if sections:
+        story.append(Paragraph("Studies in this Report", styles['Heading2']))
         story.append(Spacer(1, 12))
-
-        # Adjusted column headers for new metrics
-        table_data = [['Site ID', 'Risk Level', 'DQI', 'Query Rate', 'Deviations', 'Action']]
-        
-        for site in report_data['sites']:
-            table_data.append([
-                site.get('site', 'N/A'),
-                site.get('risk_level', 'Unknown'),
-                str(site.get('dqi', 'N/A')),
-                f"{site.get('query_resolution_rate', 0)}%",
-                str(site.get('protocol_deviations', 0)),
-                site.get('recommendation', 'Monitor')[:20] + "..." # Truncate for table fit
+        overview = [['Study', 'Sites', 'High Risk', 'Avg DQI']]
+        for section in sections:
+            sites = section['sites']
+            overview.append([
+                section['study_id'],
+                str(len(sites)),
+                str(sum(1 for site in sites if site.get('risk_level') == 'High')),
+                f"{sum(site.get('dqi', 0) for site in sites) / len(sites):.1f}" if sites else "N/A",
             ])
+        story.append(Table(overview, colWidths=[200, 60, 60, 60], repeatRows=1, style=TABLE_STYLE))
+
+    story.append(Spacer(1, 24))
+    story.append(Paragraph("Metrics Definitions:", styles['Heading3']))
+    story.append(Paragraph("• DQI: Data Quality Index (0-100)", normal_style))
+    story.append(Paragraph("• Query Rate: % of queries resolved within 14 days", normal_style))
+    story.append(Paragraph("• Deviations: Count of major protocol deviations", normal_style))
+    return story
+
+def section_story(section):
+    sites = section['sites']
+    high_risk = sum(1 for site in sites if site.get('risk_level') == 'High')
+    story = [
+        Paragraph(f"{section['study_id']}: Site Performance Matrix", styles['Heading2']),
+        Paragraph(f"{len(sites)} sites, {high_risk} high risk.", styles['Normal']),
+        Spacer(1, 12),
+    ]
+    for table in site_tables(sites):
+        story.append(table)
+        story.append(Spacer(1, 12))
+    return story
+
+def render_document(story, path: str, label: str):
+    def footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(colors.grey)
+        canvas.drawString(doc.leftMargin, 30, f"{label} - page {doc.page}")
+        canvas.restoreState()
+
+    # Written straight to the file rather than an in-memory buffer
+    doc = SimpleDocTemplate(path, pagesize=letter, title=label)
+    doc.build(story, onFirstPage=footer, onLaterPages=footer)
+    return path
+
+def render_section(section, path: str):
+    """Process-pool entry point: one study's section as its own PDF."""
+    return render_document(section_story(section), path, section['study_id'])
+
+def renumber(obj, ref):
+    """Point every indirect reference inside obj (in place) at its object number in the merged file."""
+    if isinstance(obj, DictionaryObject):
+        for key, value in list(obj.items()):
+            if isinstance(value, IndirectObject):
+                obj[key] = ref(value.idnum)
+            else:
+                renumber(value, ref)
+    elif isinstance(obj, ArrayObject):
+        for i, value in enumerate(obj):
+            if isinstance(value, IndirectObject):
+                obj[i] = ref(value.idnum)
+            else:
+                renumber(value, ref)
+
+def merge_pdfs(paths, path: str):
+    """
+    Concatenate the pages of PDFs into path, one part at a time. Each part's objects are written out
+    under new object numbers as soon as it is read, so memory holds one part plus the xref offsets
+    rather than the whole pack; the page tree and xref table are written at the end.
+    """
+    offsets = [None]
+    page_refs = []
+
+    def reserve():
+        offsets.append(None)
+        return len(offsets) - 1
+
+    pages_ref = IndirectObject(reserve(), 0, None)
+    with open(path, "wb") as out:
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        def write_object(number, obj):
+            offsets[number] = out.tell()
+            out.write(f"{number} 0 obj\n".encode("ascii"))
+            obj.write_to_stream(out)
+            out.write(b"\nendobj\n")
+
+        for part in paths:
+            reader = PdfReader(part)
+            numbers, queue = {}, []
+
+            def ref(idnum, obj=None):
+                if idnum not in numbers:
+                    numbers[idnum] = reserve()
+                    queue.append((idnum, obj))
+                return IndirectObject(numbers[idnum], 0, None)
+
+            # Pages come with their inherited attributes filled in; their old parent isn't copied
+            for page in reader.pages:
+                page[NameObject("/Parent")] = pages_ref
+                page_refs.append(ref(page.indirect_reference.idnum, page))
+            while queue:
+                idnum, obj = queue.pop()
+                obj = obj if obj is not None else reader.get_object(idnum)
+                renumber(obj, ref)
+                write_object(numbers[idnum], obj)
+
+        pages = DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(page_refs),
+            NameObject("/Count"): NumberObject(len(page_refs)),
+        })
+        write_object(pages_ref.idnum, pages)
+        root = reserve()
+        write_object(root, DictionaryObject({NameObject("/Type"): NameObject("/Catalog"), NameObject("/Pages"): pages_ref}))
+
+        xref = out.tell()
+        out.write(f"xref\n0 {len(offsets)}\n0000000000 65535 f \n".encode("ascii"))
+        out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets[1:]).encode("ascii"))
+        out.write(f"trailer\n<< /Size {len(offsets)} /Root {root} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+
+def generate_pdf_report(report_data, path: str, workers: int = None):
+    """
+    Render the report pack to path: a cover with the executive summary and a study overview,
+    then one section per study. With pypdf installed and more than one worker, the study
+    sections are rendered in parallel worker processes and merged on disk.
+    """
+    started = time.perf_counter()
+    path = render_pack(report_data, path, workers or REPORT_WORKERS)
+    PDF_RENDER_SECONDS.labels(mode="merged" if HAS_PYPDF else "single").observe(time.perf_counter() - started)
+    return path
+
+def render_pack(report_data, path: str, workers: int):
+    sections = report_sections(report_data)
+    label = f"Risk Assessment - {report_data.get('study_id', 'N/A')}"
+
+    if not HAS_PYPDF:
+        story = cover_story(report_data, sections)
+        for section in sections:
+            story.append(PageBreak())
+            story.extend(section_story(section))
+        return render_document(story, path, label)
 
-        t = Table(table_data, colWidths=[60, 60, 40, 60, 60, 150])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')), # Blue header
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        story.append(t)
-
-        story.append(Spacer(1, 24))
-        story.append(Paragraph("Metrics Definitions:", styles['Heading3']))
-        story.append(Paragraph("• DQI: Data Quality Index (0-100)", normal_style))
-        story.append(Paragraph("• Query Rate: % of queries resolved within 14 days", normal_style))
-        story.append(Paragraph("• Deviations: Count of major protocol deviations", normal_style))
-
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    parts_dir = tempfile.mkdtemp(prefix="report_parts_", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        cover = render_document(cover_story(report_data, sections), os.path.join(parts_dir, "cover.pdf"), label)
+        part_paths = [os.path.join(parts_dir, f"section-{i:04d}.pdf") for i in range(len(sections))]
+        if workers > 1 and len(sections) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(render_section, sections, part_paths))
+        else:
+            for section, part_path in zip(sections, part_paths):
+                render_section(section, part_path)
+        merge_pdfs([cover] + part_paths, path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    return path
@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Iterable
+import pandas as pd
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from analytics import study_health_score
+import models
+
+def site_aggregates(db: Session, study_ids=None):
+    """Missing pages, SAE totals and pending SAEs per (study, site_key), straight from the raw tables."""
+    missing = db.query(
+        models.MissingPages.study_id,
+        models.MissingPages.site_key,
+        func.min(models.MissingPages.site_number).label('site_number'),
+        func.count(models.MissingPages.id).label('missing_pages')
+    ).group_by(models.MissingPages.study_id, models.MissingPages.site_key)
+
+    saes = db.query(
+        models.SAEMetrics.study_id,
+        models.SAEMetrics.site_key,
+        func.count(models.SAEMetrics.id).label('sae_count'),
+        func.sum(case((models.SAEMetrics.review_status != 'Reviewed', 1), else_=0)).label('sae_pending')
+    ).group_by(models.SAEMetrics.study_id, models.SAEMetrics.site_key)
+
+    if study_ids is not None:
+        missing = missing.filter(models.MissingPages.study_id.in_(study_ids))
+        saes = saes.filter(models.SAEMetrics.study_id.in_(study_ids))
+
+    # A site can have SAEs in a study with no missing pages, or the reverse; keep both sides
+    df = pd.merge(
+        pd.read_sql(missing.statement, db.bind),
+        pd.read_sql(saes.statement, db.bind),
+        on=['study_id', 'site_key'], how='outer'
+    )
+    for col in ('missing_pages', 'sae_count', 'sae_pending'):
+        df[col] = df[col].fillna(0).astype(int)
+    # SAE-only rows keep site_number NULL so MIN(site_number) on read picks the missing-pages label
+    df['site_number'] = df['site_number'].astype(object).where(df['site_number'].notna(), None)
+    return df
+
+def refresh_summaries(db: Session, study_ids: Iterable[str] = None):
+    """
+    Rebuild site_risk_summary and study_health_summary rows for the given studies, or for everything.
+    Does not commit; the caller commits alongside the rows that changed.
+    """
+    if study_ids is not None:
+        study_ids = sorted(set(study_ids))
+        if not study_ids:
+            return 0
+
+    for model in (models.SiteRiskSummary, models.StudyHealthSummary):
+        query = db.query(model)
+        if study_ids is not None:
+            query = query.filter(model.study_id.in_(study_ids))
+        query.delete(synchronize_session=False)
+
+    now = datetime.now()
+    sites = site_aggregates(db, study_ids)
+    if not sites.empty:
+        db.execute(models.SiteRiskSummary.__table__.insert(), sites.assign(refreshed_at=now).to_dict(orient="records"))
+
+    studies = sites.groupby('study_id', as_index=False)[['missing_pages', 'sae_count', 'sae_pending']].sum()
+    if not studies.empty:
+        studies['health_score'] = [
+            study_health_score(sae, pending, missing)
+            for sae, pending, missing in zip(studies['sae_count'], studies['sae_pending'], studies['missing_pages'])
+        ]
+        db.execute(models.StudyHealthSummary.__table__.insert(), studies.assign(refreshed_at=now).to_dict(orient="records"))
+
+    scope = f"{len(study_ids)} studies" if study_ids is not None else "all studies"
+    print(f"📊 Refreshed risk summaries for {scope}: {len(sites)} site rows")
+    return len(sites)
@@ -0,0 +1,112 @@
+import os
+import random
+import argparse
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+
+# Writes synthetic SAE Dashboard, Global Missing Pages and EDC Metrics workbooks with the same
+# sheet and column layouts as the CPID input files in data/, one folder per study, so they go
+# through run_ingestion exactly like the real exports.
+
+SAE_HEADER = ['Discrepancy ID', 'Study ID', 'Country', 'Site', 'Patient ID', 'Form Name',
+              'Discrepancy Created Timestamp in Dashboard', 'Review Status', 'Action Status']
+MISSING_PAGES_HEADER = ['Study Name', 'SiteGroupName(CountryName)', 'SiteNumber', 'SubjectName',
+                        'Overall Subject Status', 'Visit Level Subject Status', 'FolderName', 'Visit date',
+                        'Form Type (Summary or Visit)', 'FormName', 'No. #Days Page Missing']
+EDC_HEADER = ['Project Name', 'Region', 'Country', 'Site ID', 'Subject ID',
+              'Latest Visit (SV) (Source: Rave EDC: BO4)', 'Subject Status (Source: PRIMARY Form)']
+
+COUNTRIES = {"USA": "NA", "CAN": "NA", "FRA": "EMEA", "DEU": "EMEA", "ESP": "EMEA", "GBR": "EMEA",
+             "CHN": "APAC", "JPN": "APAC", "IND": "APAC", "BRA": "LATAM"}
+SUBJECT_STATUSES = [("On Trial", 5), ("Screen Failure", 3), ("Discontinued", 2), ("Completed", 2), ("Screening", 1)]
+VISITS = ["Screening", "Baseline", "Week 2", "Week 4", "Week 8", "Week 12", "Follow-up (1)", "End of Treatment"]
+FOLDERS = ["Screening", "Baseline", "Treatment", "Disposition", "Adverse Events"]
+REVIEW_STATUSES = [("Review Completed", 12), ("Pending for Review", 2), ("Reviewed", 1)]
+ACTION_STATUSES = [(None, 8), ("Open", 1), ("Closed", 1)]
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+def write_sheet(path: str, sheet_name: str, header, rows):
+    """Stream rows into a one-sheet workbook; write_only mode keeps memory flat however many rows there are."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(header)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+def study_sites(study: int, sites: int, rng):
+    # Site numbers are unique across studies, like the real exports
+    return [(f"Site {(study - 1) * sites + i + 1}", rng.choice(list(COUNTRIES))) for i in range(sites)]
+
+def study_subjects(study: int, sites, subjects: int, rng):
+    for s, (site, country) in enumerate(sites):
+        for i in range(subjects):
+            number = ((study - 1) * len(sites) + s) * subjects + i + 1
+            yield site, country, f"Subject {number}", weighted(rng, SUBJECT_STATUSES)
+
+def sae_rows(study_name, subjects, rng, start: datetime):
+    discrepancy_id = 60000
+    for site, country, subject, _ in subjects:
+        # Most subjects have no or few SAE discrepancies; a few have many
+        for _ in range(min(int(rng.expovariate(0.7)), 12)):
+            discrepancy_id += 1
+            yield [discrepancy_id, study_name, country, site, subject, f"Form {rng.randint(1, 6)}",
+                   start + timedelta(minutes=rng.randint(0, 60 * 24 * 180)),
+                   weighted(rng, REVIEW_STATUSES), weighted(rng, ACTION_STATUSES)]
+
+def missing_page_rows(study_name, subjects, rng, start: datetime):
+    for site, country, subject, status in subjects:
+        for _ in range(min(int(rng.expovariate(0.9)), 10)):
+            summary = rng.random() < 0.3
+            visit_date = None if summary else (start + timedelta(days=rng.randint(0, 180))).strftime("%d-%b-%Y")
+            yield [study_name, country, site, subject, status, None if summary else "Active",
+                   rng.choice(FOLDERS), visit_date, "Summary Page" if summary else "Visit Page",
+                   f"Form {rng.randint(1, 30)}", None if summary else rng.randint(1, 120)]
+
+def edc_rows(study_name, subjects, rng):
+    for site, country, subject, status in subjects:
+        yield [study_name, COUNTRIES[country], country, site, subject, rng.choice(VISITS), status]
+
+def generate_dataset(out_dir: str, studies: int = 3, sites: int = 20, subjects: int = 10, seed: int = 7):
+    """
+    Write studies x (SAE, missing pages, EDC) workbooks under out_dir, each study with `sites` sites
+    of `subjects` subjects. The same arguments and seed always produce the same rows.
+    Returns the number of rows written per workbook type.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    counts = {"sae_metrics": 0, "missing_pages": 0, "edc_metrics": 0}
+    for study in range(1, studies + 1):
+        study_name = f"Study {study}"
+        study_dir = os.path.join(out_dir, f"{study_name}_CPID_Input Files - Synthetic")
+        os.makedirs(study_dir, exist_ok=True)
+        site_list = study_sites(study, sites, rng)
+        subject_list = list(study_subjects(study, site_list, subjects, rng))
+
+        counts["sae_metrics"] += write_sheet(
+            os.path.join(study_dir, f"{study_name}_eSAE Dashboard_DM_Safety_synthetic.xlsx"),
+            "SAE Dashboard_DM", SAE_HEADER, sae_rows(study_name, subject_list, rng, start))
+        counts["missing_pages"] += write_sheet(
+            os.path.join(study_dir, f"{study_name}_Global_Missing_Pages_Report_synthetic.xlsx"),
+            "All Pages Missing", MISSING_PAGES_HEADER, missing_page_rows(study_name, subject_list, rng, start))
+        counts["edc_metrics"] += write_sheet(
+            os.path.join(study_dir, f"{study_name}_CPID_EDC_Metrics_URSV2.0_synthetic.xlsx"),
+            "Subject Level Metrics", EDC_HEADER, edc_rows(study_name, subject_list, rng))
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic clinical trial workbooks")
+    parser.add_argument("out_dir", help="directory to write the study folders into, e.g. a DATA_DIR for run_ingestion")
+    parser.add_argument("--studies", type=int, default=3)
+    parser.add_argument("--sites", type=int, default=20, help="sites per study")
+    parser.add_argument("--subjects", type=int, default=10, help="subjects per site")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    counts = generate_dataset(args.out_dir, args.studies, args.sites, args.subjects, args.seed)
+    print(f"✅ Wrote {args.studies} studies to {args.out_dir}: {counts}")
@@ -0,0 +1,116 @@
+"""
+Checks for bounded execution and result caching of generated agent SQL, on a throwaway database.
+Run with `python -m pytest test_agent_sql.py` from backend/.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from agent import ClinicalAgent, QueryTimeout, execute_bounded, normalize_sql
+from cache import ResponseCache, bump_generation, current_generation
+import agent as agent_module
+from migrations import run_migrations
+import models
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('agent_sql') / 'agent.db'}", connect_args={"check_same_thread": False})
+    # As in production, readers keep their snapshot while a writer commits
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sae_metrics (id INTEGER PRIMARY KEY, site TEXT)"))
+        conn.execute(text("INSERT INTO sae_metrics (site) VALUES " + ", ".join(f"('Site {i % 7}')" for i in range(50))))
+    models.DataGeneration.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+def test_row_cap_marks_truncation(engine):
+    df, truncated = execute_bounded("SELECT * FROM sae_metrics", max_rows=10, engine=engine)
+    assert len(df) == 10 and truncated
+    df, truncated = execute_bounded("SELECT * FROM sae_metrics;", max_rows=50, engine=engine)
+    assert len(df) == 50 and not truncated
+
+def test_trailing_line_comment(engine):
+    df, _ = execute_bounded("SELECT site, count(*) AS count FROM sae_metrics GROUP BY site -- per site", engine=engine)
+    assert len(df) == 7
+    df, _ = execute_bounded("SELECT count(*) AS count FROM sae_metrics\n-- total SAEs\n", engine=engine)
+    assert df["count"][0] == 50
+
+def test_only_selects_run(engine):
+    with pytest.raises(ValueError):
+        execute_bounded("DELETE FROM sae_metrics", engine=engine)
+
+def test_slow_queries_time_out(engine):
+    slow = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+    with pytest.raises(QueryTimeout):
+        execute_bounded(slow, timeout_s=0.2, engine=engine)
+
+def test_normalized_sql_keeps_string_literals():
+    assert normalize_sql("SELECT  site\nFROM sae_metrics ;") == normalize_sql("select site from SAE_METRICS")
+    assert normalize_sql("SELECT * FROM sae_metrics WHERE site = 'Site  1'") != normalize_sql("SELECT * FROM sae_metrics WHERE site = 'site 1'")
+
+def test_result_cache_runs_each_query_once_per_generation(engine, monkeypatch):
+    runs = []
+    monkeypatch.setattr(agent_module, "sql_result_cache", ResponseCache(max_entries=8))
+    monkeypatch.setattr(agent_module, "execute_bounded", lambda sql, **kw: runs.append(sql) or execute_bounded(sql, **kw))
+    clinical = ClinicalAgent(llm=object(), engine=engine)
+
+    first = clinical.run_sql("SELECT site, count(*) AS count FROM sae_metrics GROUP BY site")
+    again = clinical.run_sql("select site, COUNT(*) as count\nfrom sae_metrics group by site;")
+    assert again == first and first["rows"] == 7 and len(runs) == 1
+
+    with Session(engine) as db:
+        bump_generation(db)
+        db.commit()
+    assert clinical.run_sql("SELECT site, count(*) AS count FROM sae_metrics GROUP BY site") == first
+    assert len(runs) == 2
+
+def test_result_cache_skips_large_results(engine, monkeypatch):
+    runs = []
+    monkeypatch.setattr(agent_module, "sql_result_cache", ResponseCache(max_entries=8))
+    monkeypatch.setattr(agent_module, "SQL_RESULT_CACHE_MAX_ROWS", 10)
+    monkeypatch.setattr(agent_module, "execute_bounded", lambda sql, **kw: runs.append(sql) or execute_bounded(sql, **kw))
+    clinical = ClinicalAgent(llm=object(), engine=engine)
+
+    for _ in range(2):
+        clinical.run_sql("SELECT * FROM sae_metrics")
+        clinical.run_sql("SELECT * FROM sae_metrics LIMIT 5")
+    assert runs == ["SELECT * FROM sae_metrics", "SELECT * FROM sae_metrics LIMIT 5", "SELECT * FROM sae_metrics"]
+
+def test_result_is_cached_under_the_generation_it_read(engine, monkeypatch):
+    def ingest_then_run(sql, **kw):
+        # Ingestion commits new rows and a new generation after the generation was read
+        with Session(engine) as db:
+            db.execute(text("INSERT INTO sae_metrics (site) VALUES ('Site 99')"))
+            bump_generation(db)
+            db.commit()
+        return execute_bounded(sql, **kw)
+
+    responses = ResponseCache(max_entries=8)
+    monkeypatch.setattr(agent_module, "sql_result_cache", responses)
+    monkeypatch.setattr(agent_module, "execute_bounded", ingest_then_run)
+    clinical = ClinicalAgent(llm=object(), engine=engine)
+    with Session(engine) as db:
+        generation = current_generation(db)
+    try:
+        result = clinical.run_sql("SELECT count(*) AS count FROM sae_metrics")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM sae_metrics WHERE site = 'Site 99'"))
+    # The cached count is the one the generation it is filed under had
+    assert result["data"][0]["count"] == 50
+    assert responses.generation == generation
+
+def test_row_bound_is_below_the_row_cap():
+    assert agent_module.SQL_RESULT_CACHE_MAX_ROWS < agent_module.AGENT_MAX_ROWS
+
+def test_columnar_trailing_line_comment():
+    pytest.importorskip("duckdb")
+    from columnar import fetch_rows
+    from database import engine as scratch_engine, read_snapshot
+    # The columnar copy is built from the scratch database conftest.py points DATABASE_URL at
+    run_migrations(scratch_engine)
+    with read_snapshot() as (_, generation):
+        pass
+    columns, rows = fetch_rows("SELECT count(*) AS count FROM sae_metrics -- total SAEs", 10, 5, generation=generation)
+    assert columns == ["count"] and rows[0][0] > 0
@@ -0,0 +1,72 @@
+"""
+Checks for the generation-versioned response cache, on a throwaway database.
+Run with `python -m pytest test_cache.py` from backend/.
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from cache import ResponseCache, bump_generation, cached_response, current_generation
+import cache
+import models
+
+@pytest.fixture
+def SessionLocal(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"call": self.calls}
+
+def test_hit_within_a_generation_and_miss_after_it_moves():
+    responses, compute = ResponseCache(max_entries=8), Counter()
+    assert responses.get_or_compute("risk", 1, compute) == {"call": 1}
+    assert responses.get_or_compute("risk", 1, compute) == {"call": 1}
+    assert compute.calls == 1
+
+    # A new generation drops everything cached for the old one
+    assert responses.get_or_compute("risk", 2, compute) == {"call": 2}
+    stats = responses.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"], stats["entries"]) == (1, 2, 1, 1)
+
+def test_least_recently_used_entry_is_evicted():
+    responses = ResponseCache(max_entries=2)
+    for key in ("a", "b"):
+        responses.get_or_compute(key, 1, lambda: key)
+    responses.get_or_compute("a", 1, lambda: "recomputed")
+    responses.get_or_compute("c", 1, lambda: "c")
+    assert responses.get_or_compute("a", 1, lambda: "recomputed") == "a"
+    assert responses.get_or_compute("b", 1, lambda: "recomputed") == "recomputed"
+    assert responses.stats()["evictions"] == 2
+
+def test_values_are_kept_only_when_storable():
+    responses, compute = ResponseCache(max_entries=8), Counter()
+    responses.get_or_compute("big", 1, compute, should_store=lambda value: False)
+    responses.get_or_compute("big", 1, compute, should_store=lambda value: False)
+    assert compute.calls == 2 and responses.stats()["entries"] == 0
+
+    disabled = ResponseCache(max_entries=0)
+    disabled.get_or_compute("risk", 1, compute)
+    disabled.get_or_compute("risk", 1, compute)
+    assert compute.calls == 4
+
+def test_cached_response_follows_the_committed_generation(SessionLocal, monkeypatch):
+    monkeypatch.setattr(cache, "analytics_cache", ResponseCache(max_entries=8))
+    compute = Counter()
+    with SessionLocal() as db:
+        start = current_generation(db)
+        first = cached_response(db, "score", compute, study_id="STUDY_1", page=2)
+        # Parameters are part of the key, in any order
+        assert cached_response(db, "score", compute, page=2, study_id="STUDY_1") == first
+        assert cached_response(db, "score", compute, study_id="STUDY_2", page=2) == {"call": 2}
+
+        bump_generation(db)
+        db.commit()
+        assert current_generation(db) == start + 1
+        assert cached_response(db, "score", compute, study_id="STUDY_1", page=2) == {"call": 3}
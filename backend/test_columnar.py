@@ -0,0 +1,88 @@
+"""
+Checks for the DuckDB columnar copy's rebuilds, on small in-memory copies.
+Run with `python -m pytest test_columnar.py` from backend/.
+"""
+import threading
+import pytest
+from columnar import ColumnarCopy, ColumnarStore, StaleCopy
+
+duckdb = pytest.importorskip("duckdb")
+
+class FakeLoads:
+    """Stands in for ColumnarStore._load: each copy holds the generation it was built for."""
+
+    def __init__(self):
+        self.generation = 1
+        self.copies = []
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        assert self.release.wait(10)
+        conn = duckdb.connect(":memory:")
+        conn.execute(f"CREATE TABLE data_generation AS SELECT {self.generation} AS generation")
+        copy = ColumnarCopy(conn, self.generation)
+        self.copies.append(copy)
+        return copy
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ColumnarStore()
+    loads = FakeLoads()
+    monkeypatch.setattr(store, "_load", loads)
+    return store, loads
+
+def read_generation(store, generation):
+    with store.cursor(generation) as cursor:
+        return cursor.execute("SELECT generation FROM data_generation").fetchone()[0]
+
+def test_old_copy_is_closed_once_its_last_cursor_is_released(store):
+    store, loads = store
+    assert read_generation(store, 1) == 1
+    with store.cursor(1) as old_cursor:
+        loads.generation = 2
+        assert read_generation(store, 2) == 2
+        # Still open for the query that was running on it
+        assert old_cursor.execute("SELECT generation FROM data_generation").fetchone()[0] == 1
+    old, new = loads.copies
+    with pytest.raises(duckdb.ConnectionException):
+        old.conn.execute("SELECT 1")
+    assert new.conn.execute("SELECT 1").fetchone() == (1,) and store.generation == 2
+
+def test_unused_copy_is_closed_at_the_swap(store):
+    store, loads = store
+    read_generation(store, 1)
+    loads.generation = 2
+    read_generation(store, 2)
+    with pytest.raises(duckdb.ConnectionException):
+        loads.copies[0].conn.execute("SELECT 1")
+
+def test_queries_keep_running_while_a_copy_is_built(store):
+    store, loads = store
+    read_generation(store, 1)
+    loads.generation = 2
+    loads.release.clear()
+    loads.started.clear()
+    builder = threading.Thread(target=read_generation, args=(store, 2))
+    builder.start()
+    try:
+        assert loads.started.wait(10)
+        # The build of generation 2 is still waiting; generation 1 is served without waiting on it
+        assert read_generation(store, 1) == 1
+    finally:
+        loads.release.set()
+        builder.join(10)
+    assert store.generation == 2 and len(loads.copies) == 2
+
+def test_snapshots_older_or_newer_than_the_copy_are_stale(store):
+    store, loads = store
+    loads.generation = 3
+    # Ingestion committed generation 3 before the copy for a generation 2 query was read
+    with pytest.raises(StaleCopy):
+        read_generation(store, 2)
+    assert store.generation == 3
+    with pytest.raises(StaleCopy):
+        read_generation(store, 2)
+    assert read_generation(store, 3) == 3 and len(loads.copies) == 1
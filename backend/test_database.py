@@ -0,0 +1,59 @@
+"""
+Checks for the read-only connection pool, against the scratch database copy conftest.py sets up.
+Nothing here commits a write.
+Run with `python -m pytest test_database.py` from backend/.
+"""
+import sqlite3
+import time
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+from database import READ_POOL_SIZE, ReadSessionLocal, engine, read_engine, read_only_connection
+from migrations import run_migrations
+import models
+
+def setup_module(module=None):
+    run_migrations(engine)
+
+def test_read_only_connections_refuse_writes():
+    conn = read_only_connection()
+    try:
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        assert conn.execute("SELECT count(*) FROM sae_metrics").fetchone()[0] > 0
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("DELETE FROM sae_metrics")
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("CREATE TABLE scratch (id INTEGER)")
+    finally:
+        conn.close()
+
+def test_read_pool_refuses_writes():
+    assert isinstance(read_engine.pool, QueuePool) and read_engine.pool.size() == READ_POOL_SIZE
+    with read_engine.connect() as conn:
+        with pytest.raises(OperationalError, match="readonly"):
+            conn.execute(text("UPDATE data_generation SET generation = generation + 1"))
+
+    with ReadSessionLocal() as db:
+        db.add(models.SiteComment(site_number="1", comment="should not be stored", author="test"))
+        with pytest.raises(OperationalError, match="readonly"):
+            db.commit()
+
+def test_reads_continue_while_the_writer_holds_its_lock():
+    with engine.connect() as probe:
+        assert probe.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    with read_engine.connect() as conn:
+        before = conn.execute(text("SELECT count(*) FROM site_comments")).scalar()
+
+    writer = engine.connect()
+    try:
+        writer.exec_driver_sql("BEGIN IMMEDIATE")
+        writer.execute(text("INSERT INTO site_comments (site_number, comment, author) VALUES ('1', 'pending', 'test')"))
+        started = time.perf_counter()
+        with read_engine.connect() as conn:
+            # Readers see the last commit, without waiting out the busy timeout
+            assert conn.execute(text("SELECT count(*) FROM site_comments")).scalar() == before
+        assert time.perf_counter() - started < 1
+    finally:
+        writer.rollback()
+        writer.close()
@@ -0,0 +1,194 @@
+"""
+Ingestion checks against synthetic workbooks, each test on its own throwaway database.
+Run with `python -m pytest test_ingestion.py` from backend/.
+"""
+import os
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from migrations import run_migrations
+from synthetic_data import generate_dataset
+import ingestion
+import parse_cache
+import models
+
+@pytest.fixture
+def scratch(monkeypatch, tmp_path):
+    """A fresh database, data directory and parse cache for run_ingestion; returns the sessionmaker."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}", connect_args={"check_same_thread": False})
+    run_migrations(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(ingestion, "SessionLocal", Session)
+    monkeypatch.setattr(ingestion, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", str(tmp_path / "parse_cache"))
+    # run_ingestion also scans ./uploads
+    monkeypatch.chdir(tmp_path)
+    generate_dataset(str(tmp_path / "data"), studies=2, sites=3, subjects=4)
+    yield Session
+    engine.dispose()
+
+def row_counts(Session):
+    with Session() as db:
+        return {name: db.query(model).count() for name, model in ingestion.INGESTED_MODELS.items()}
+
+def workbooks(data_dir):
+    return sorted(os.path.join(root, f) for root, _, files in os.walk(data_dir) for f in files)
+
+def test_unchanged_workbooks_are_skipped(scratch):
+    first = ingestion.run_ingestion(workers=1)
+    assert first["ingested"] == 6 and first["skipped"] == 0
+    counts = row_counts(scratch)
+    assert all(counts.values())
+
+    second = ingestion.run_ingestion(workers=1)
+    assert second["ingested"] == 0 and second["skipped"] == 6
+    assert row_counts(scratch) == counts
+
+    # Touched but byte-identical files are recognized by their hash
+    for path in workbooks(ingestion.DATA_DIR):
+        os.utime(path, (1, 1))
+    assert ingestion.run_ingestion(workers=1)["skipped"] == 6
+
+def test_changed_workbook_replaces_only_its_rows(scratch):
+    ingestion.run_ingestion(workers=1)
+    before = row_counts(scratch)
+    sae_path = next(path for path in workbooks(ingestion.DATA_DIR) if "Study 1_eSAE" in path)
+
+    # Rewrite study 1 with more sites; only its three workbooks have changed content
+    generate_dataset(ingestion.DATA_DIR, studies=1, sites=5, subjects=4)
+    summary = ingestion.run_ingestion(workers=1)
+    assert summary["ingested"] == 3 and summary["skipped"] == 3
+
+    with scratch() as db:
+        sae_rows = db.query(models.SAEMetrics).filter(models.SAEMetrics.source_file == sae_path).count()
+        manifest = {entry.path: entry.row_count for entry in db.query(models.IngestionManifest)}
+    # The old rows of a changed workbook are replaced, not added to
+    assert sae_rows == manifest[sae_path] > 0
+    counts = row_counts(scratch)
+    assert counts != before
+    assert counts["sae_metrics"] == sum(rows for path, rows in manifest.items() if "eSAE" in path)
+    # A rescan of the same files loads nothing twice
+    assert ingestion.run_ingestion(workers=1)["skipped"] == 6
+
+def test_prepare_resolves_alternate_headers_and_coerces_values():
+    sheet = pd.DataFrame({
+        "Site ID": ["Site 010", None, 7.0],
+        "Subject Name": ["Subject-01", "Subject 2", np.nan],
+        "Form": ["AE", "CM", None],
+        "Missing Days": ["12", "n/a", np.inf],
+    })
+    rows = ingestion.prepare_missing_pages(sheet, "STUDY_1", "/data/pages.xlsx")
+    assert rows["site_number"].tolist() == ["Site 010", "", "7.0"]
+    assert rows["subject_name"].tolist() == ["Subject-01", "Subject 2", ""]
+    assert rows["missing_days"].tolist() == [12, 0, 0]
+    assert rows["site_key"].tolist() == ["10", "", "7"]
+    assert rows["subject_key"].tolist() == ["1", "2", ""]
+    assert set(rows["study_id"]) == {"STUDY_1"} and set(rows["source_file"]) == {"/data/pages.xlsx"}
+    # Fields without a matching header come out blank rather than failing
+    assert rows["visit_date"].tolist() == ["", "", ""]
+
+def test_bulk_insert_writes_every_row_across_chunks(scratch, monkeypatch):
+    monkeypatch.setattr(ingestion, "BULK_INSERT_CHUNK_SIZE", 7)
+    sheet = pd.DataFrame({"Site": [f"Site {i % 3}" for i in range(20)], "Patient ID": [f"P{i}" for i in range(20)],
+                          "Review Status": "Reviewed"})
+    rows = ingestion.prepare_sae_metrics(sheet, "STUDY_9", "/data/sae.xlsx")
+    with scratch() as db:
+        assert ingestion.bulk_insert(db, models.SAEMetrics, rows) == 20
+        db.commit()
+        stored = db.query(models.SAEMetrics.patient_id).order_by(models.SAEMetrics.id).all()
+    assert [patient for (patient,) in stored] == [f"P{i}" for i in range(20)]
+
+def test_sheet_without_site_column_fails_validation(scratch, tmp_path):
+    path = str(tmp_path / "data" / "Study 7_eSAE Dashboard_bad.xlsx")
+    pd.DataFrame({"Patient ID": ["P1"], "Review Status": ["Reviewed"]}).to_excel(path, index=False)
+    with scratch() as db:
+        timing = ingestion.ingest_file(db, path)
+    assert timing["status"] == "failed" and "site" in timing["error"]
+
+def snapshot(Session):
+    """Every ingested row without its id, sorted, per table."""
+    tables = {}
+    with Session() as db:
+        for name, model in ingestion.INGESTED_MODELS.items():
+            columns = [c for c in model.__table__.columns if c.name != "id"]
+            tables[name] = sorted(tuple("" if v is None else str(v) for v in row) for row in db.query(*columns))
+    return tables
+
+def use_new_database(monkeypatch, path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    run_migrations(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(ingestion, "SessionLocal", Session)
+    return Session
+
+def test_streamed_and_whole_loads_write_the_same_rows(scratch, monkeypatch, tmp_path):
+    whole = ingestion.run_ingestion(workers=1, streaming_threshold_mb=1024)
+    assert whole["ingested"] == 6
+    expected = snapshot(scratch)
+
+    streamed_db = use_new_database(monkeypatch, tmp_path / "streamed.db")
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", str(tmp_path / "empty_cache"))
+    assert ingestion.run_ingestion(workers=1, streaming_threshold_mb=0)["ingested"] == 6
+    assert snapshot(streamed_db) == expected
+
+def test_streaming_in_small_chunks_matches_read_excel(scratch, tmp_path):
+    path = str(tmp_path / "data" / "Study 8_Global_Missing_Pages_Report_chunks.xlsx")
+    sheet = pd.DataFrame({
+        "SiteNumber": [f"Site {i % 4}" for i in range(23)],
+        "SubjectName": [f"Subject {i}" for i in range(23)],
+        "FormName": [None if i % 5 == 0 else f"Form {i}" for i in range(23)],
+        "No. #Days Page Missing": [i if i % 3 else None for i in range(23)],
+    })
+    sheet.to_excel(path, index=False)
+
+    chunks = list(ingestion.iter_excel_chunks(path, chunk_size=5))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 5, 5, 3]
+    streamed = pd.concat(chunks, ignore_index=True)
+    whole = pd.read_excel(path)
+    assert list(streamed.columns) == list(whole.columns)
+    assert streamed.astype(str).replace("None", "nan").equals(whole.astype(str))
+
+    task = {"path": path, "file_type": "missing_pages", "content_hash": parse_cache.compute_file_hash(path),
+            "study_id": "STUDY_8", "streaming": True}
+    with scratch() as db:
+        count, _, _ = ingestion.stream_workbook(db, task, chunk_size=5)
+        stored = db.query(models.MissingPages).filter(models.MissingPages.source_file == path).count()
+    assert count == stored == 23
+
+class RecordingPool:
+    """Runs submissions inline and records them, in place of a ProcessPoolExecutor."""
+    submitted = []
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, path, file_type, content_hash):
+        RecordingPool.submitted.append(path)
+        future = Future()
+        future.set_result(([path], 0.0))
+        return future
+
+def test_parse_tasks_keeps_a_bounded_window(monkeypatch):
+    monkeypatch.setattr(ingestion, "ProcessPoolExecutor", RecordingPool)
+    RecordingPool.submitted = []
+    tasks = [{"path": f"file-{i}.xlsx", "file_type": "sae_metrics", "content_hash": str(i), "streaming": i == 3}
+             for i in range(12)]
+
+    seen = []
+    for task, rows, seconds, error in ingestion.parse_tasks(tasks, workers=2):
+        seen.append(task["path"])
+        # Never more than `workers` workbooks parsed ahead of the one being written
+        parsed_ahead = [path for path in RecordingPool.submitted if path not in seen]
+        assert len(parsed_ahead) <= 2
+        assert rows == (None if task["streaming"] else [task["path"]])
+    assert seen == [task["path"] for task in tasks]
+    assert len(RecordingPool.submitted) == 11
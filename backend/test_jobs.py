@@ -0,0 +1,97 @@
+"""
+Background ingestion jobs: status polling and the Server-Sent Events stream, through the API.
+Uploaded workbooks are written to a throwaway database, not the scratch copy the other tests share.
+Run with `python -m pytest test_jobs.py` from backend/.
+"""
+import json
+import os
+import time
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from migrations import run_migrations
+from synthetic_data import generate_dataset
+from jobs import Job
+import ingestion
+import parse_cache
+import main
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    run_migrations(engine)
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    monkeypatch.setattr(ingestion, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", str(tmp_path / "parse_cache"))
+    yield TestClient(main.app)
+    engine.dispose()
+
+def upload(client, path):
+    with open(path, "rb") as f:
+        response = client.post("/ingest/file", files={"file": (os.path.basename(path), f)})
+    assert response.status_code == 200 and response.json()["status"] == "processing"
+    return response.json()["job_id"]
+
+def wait_for(client, job_id, timeout_s=30):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        job = client.get(f"/ingest/jobs/{job_id}").json()
+        if job["status"] in ("complete", "failed"):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"job {job_id} still {job['status']} after {timeout_s}s")
+
+def read_events(client, job_id):
+    """(event, data) pairs from the job's SSE stream, which ends once the job has finished."""
+    response = client.get(f"/ingest/jobs/{job_id}/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_uploaded_workbook_job_reports_each_stage(client, tmp_path):
+    generate_dataset(str(tmp_path / "source"), studies=1, sites=3, subjects=4)
+    path = next(os.path.join(root, f) for root, _, files in os.walk(tmp_path / "source") for f in files if "eSAE" in f)
+
+    job = wait_for(client, upload(client, path))
+    assert job["status"] == "complete" and job["error"] is None
+    assert job["result"]["status"] == "ingested" and job["result"]["rows"] > 0
+    assert {stage: entry["status"] for stage, entry in job["stages"].items()} == {
+        "upload": "done", "parse": "done", "validate": "done", "write": "done"
+    }
+
+    events = read_events(client, job["job_id"])
+    progress = [data for event, data in events if event == "progress"]
+    assert [data["seq"] for data in progress] == list(range(1, len(progress) + 1))
+    assert (progress[0]["stage"], progress[-1]["stage"], progress[-1]["status"]) == ("upload", "write", "done")
+    # The stream closes with the final job state
+    assert events[-1][0] == "end" and events[-1][1]["status"] == "complete"
+
+def test_unrecognized_upload_fails_the_job(client, tmp_path):
+    path = tmp_path / "notes.xlsx"
+    pd.DataFrame({"Note": ["nothing clinical"]}).to_excel(path, index=False)
+
+    job = wait_for(client, upload(client, str(path)))
+    assert job["status"] == "failed" and "recognized" in job["error"]
+    assert job["stages"]["validate"]["status"] == "failed"
+    assert read_events(client, job["job_id"])[-1][1]["status"] == "failed"
+
+def test_unknown_job_is_404(client):
+    assert client.get("/ingest/jobs/missing").status_code == 404
+    assert client.get("/ingest/jobs/missing/events").status_code == 404
+
+def test_failure_marks_the_running_stage_failed():
+    job = Job("file")
+    job.start()
+    job.report("parse", "done", rows=3)
+    job.report("write", "running")
+    job.finish(error="disk full")
+    state = job.to_dict()
+    assert state["status"] == "failed" and state["seconds"] is not None
+    assert state["stages"]["parse"]["status"] == "done"
+    assert state["stages"]["write"] == {"status": "failed", "error": "disk full"}
+    assert [event["seq"] for event in job.events_since(1)] == [2, 3]
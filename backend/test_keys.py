@@ -0,0 +1,28 @@
+"""
+Checks for canonical site/subject keys.
+Run with `python -m pytest test_keys.py` from backend/.
+"""
+import pandas as pd
+from keys import canonical_key, canonical_keys
+
+def test_formats_of_one_site_share_a_key():
+    assert set(canonical_keys(pd.Series(["Site 020", "site-20", "SITE20", "20", " Site 20 "]))) == {"20"}
+    assert canonical_key(20.0) == "20"
+    assert canonical_key("Subject-0042") == canonical_key("SUBJ 42") == canonical_key("PT42") == "42"
+
+def test_separators_keep_identifiers_apart():
+    assert canonical_key("10-1") != canonical_key("101")
+    assert canonical_key("Subject 10-1") != canonical_key("Subject 101")
+    assert canonical_key("2/11") != canonical_key("21-1")
+    # Separator style and zero padding inside the identifier don't matter
+    assert canonical_key("10-001") == canonical_key("10 / 1") == canonical_key("10_1") == "10-1"
+
+def test_label_prefix_needs_a_separator_or_digit():
+    assert canonical_key("PTX-12") == "PTX-12"
+    assert canonical_key("Patrick 5") == "PATRICK-5"
+    assert canonical_key("SITEA") == "SITEA"
+    assert canonical_key("Site A") == "A"
+    assert canonical_key("PT-7") == canonical_key("PT 7") == "7"
+
+def test_missing_values_become_empty_keys():
+    assert canonical_keys(pd.Series([None, float("nan")])).tolist() == ["", ""]
@@ -0,0 +1,140 @@
+"""
+Concurrent-load checks for the async LLM path against a local fake provider: no network, no API key.
+Run with `python -m pytest test_llm_async.py` from backend/.
+"""
+import asyncio
+import threading
+import time
+import pytest
+import llm_cache
+import llm_service
+from llm_service import LLMService
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+class FakeAsyncModel:
+    """Answers after a fixed delay and records how many calls overlapped."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if "Return ONLY raw SQL" in prompt:
+            return Response("SELECT count(*) AS count FROM sae_metrics")
+        return Response(f"Insight for {len(prompt)} chars")
+
+class FakeBlockingModel:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        return Response("SELECT 1")
+
+@pytest.fixture(autouse=True)
+def cold_cache(monkeypatch, tmp_path):
+    # Cold cache each time, so every question reaches the fake provider
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(llm_cache, "CACHE_MAX_ENTRIES", 1000)
+
+def test_identical_inflight_prompts_share_one_call():
+    model = FakeAsyncModel(delay=0.1)
+    service = LLMService(model=model, provider="fake", model_name="fake-async")
+
+    async def burst():
+        return await asyncio.gather(*[service.agenerate_sql("How many SAEs?") for _ in range(50)])
+
+    results = asyncio.run(burst())
+    assert len(set(results)) == 1
+    assert model.calls == 1
+    assert service.coalesced_calls == 49
+
+def test_concurrency_is_bounded():
+    model = FakeAsyncModel(delay=0.05)
+    service = LLMService(model=model, provider="fake", model_name="fake-async")
+
+    async def burst():
+        return await asyncio.gather(*[service.agenerate_sql(f"question {i}") for i in range(20)])
+
+    start = time.perf_counter()
+    asyncio.run(burst())
+    elapsed = time.perf_counter() - start
+    assert model.calls == 20
+    assert model.peak <= llm_service.LLM_MAX_CONCURRENCY
+    # 20 calls in waves of LLM_MAX_CONCURRENCY, not one after another
+    assert elapsed < 20 * model.delay
+
+def test_timeout_falls_back_without_caching(monkeypatch):
+    model = FakeAsyncModel(delay=0.5)
+    service = LLMService(model=model, provider="fake", model_name="fake-async")
+    monkeypatch.setattr(llm_service, "LLM_TIMEOUT_S", 0.05)
+    sql = asyncio.run(service.agenerate_sql("missing pages count by site"))
+    assert sql.startswith("SELECT site_number")  # the offline template
+    assert llm_cache.stats()["entries"] == 0
+
+def test_blocking_clients_run_off_the_event_loop():
+    model = FakeBlockingModel(delay=0.05)
+    service = LLMService(model=model, provider="fake", model_name="fake-blocking")
+
+    async def burst():
+        return await asyncio.gather(*[service.agenerate_sql(f"q{i}") for i in range(8)])
+
+    start = time.perf_counter()
+    asyncio.run(burst())
+    assert model.calls == 8
+    assert time.perf_counter() - start < 8 * model.delay
+
+def test_cache_io_runs_off_the_event_loop(monkeypatch):
+    service = LLMService(model=FakeAsyncModel(delay=0.01), provider="fake", model_name="fake-async")
+    threads = []
+    original_get, original_put = llm_cache.get, llm_cache.put
+    monkeypatch.setattr(llm_cache, "get", lambda *a: threads.append(threading.current_thread()) or original_get(*a))
+    monkeypatch.setattr(llm_cache, "put", lambda *a: threads.append(threading.current_thread()) or original_put(*a))
+
+    async def ask():
+        await service.agenerate_sql("How many SAEs?")
+        await service.agenerate_insight([{"count": 1}], "How many SAEs?")
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(ask())
+    assert len(threads) == 4
+    assert loop_thread not in threads
+
+def test_each_event_loop_keeps_its_own_state():
+    model = FakeAsyncModel(delay=0.3)
+    service = LLMService(model=model, provider="fake", model_name="fake-async")
+    first_started, second_done = threading.Event(), threading.Event()
+
+    async def asked_twice():
+        first = asyncio.ensure_future(service.agenerate_sql("slow question"))
+        await asyncio.sleep(0.05)
+        first_started.set()
+        await asyncio.to_thread(second_done.wait)
+        # Still in flight on this loop, so the repeat shares it
+        return await asyncio.gather(first, service.agenerate_sql("slow question"))
+
+    results = []
+    other = threading.Thread(target=lambda: results.append(asyncio.run(asked_twice())))
+    other.start()
+    first_started.wait()
+    # Another loop starting up in the meantime must not drop the first loop's in-flight calls
+    model.delay = 0.01
+    asyncio.run(service.agenerate_sql("another question"))
+    second_done.set()
+    other.join()
+    assert model.calls == 2
+    assert service.coalesced_calls == 1
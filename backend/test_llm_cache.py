@@ -0,0 +1,122 @@
+"""
+Offline checks for the persistent LLM cache, using a stub model in place of Gemini.
+Run with `python -m pytest test_llm_cache.py` from backend/.
+"""
+import sqlite3
+import time
+import pytest
+import llm_cache
+import llm_service
+from llm_service import LLMService
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Counts calls; can be told to fail like an exhausted quota."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.sql = None
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("429 quota exceeded")
+        if "Return ONLY raw SQL" in prompt:
+            return Response(self.sql or f"SELECT {self.calls} AS answer")
+        return Response(f"Insight #{self.calls}")
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(llm_cache, "CACHE_MAX_ENTRIES", 100)
+    monkeypatch.setattr(llm_cache, "CACHE_TTL_HOURS", 1)
+
+def stub_service():
+    model = StubModel()
+    return LLMService(model=model, provider="stub", model_name="stub-1"), model
+
+def test_repeated_question_skips_the_model():
+    service, model = stub_service()
+    first = service.generate_sql("How many SAEs are pending?")
+    assert service.generate_sql("  how many SAEs are   PENDING ") == first
+    assert model.calls == 1
+    # Survives a new service instance, i.e. a restart
+    other, other_model = stub_service()
+    assert other.generate_sql("How many SAEs are pending?") == first
+    assert other_model.calls == 0
+
+def test_insights_are_keyed_on_the_data():
+    service, model = stub_service()
+    rows = [{"site": "Site 1", "count": 3}]
+    first = service.generate_insight(rows, "Pending SAEs?")
+    assert service.generate_insight(rows, "Pending SAEs?") == first
+    assert service.generate_insight([{"site": "Site 1", "count": 4}], "Pending SAEs?") != first
+    assert model.calls == 2
+
+def test_key_includes_model_and_prompt_version(monkeypatch):
+    service, model = stub_service()
+    service.generate_sql("Sites with missing pages")
+    service.model_name = "stub-2"
+    service.generate_sql("Sites with missing pages")
+    monkeypatch.setattr(llm_service, "SQL_PROMPT_VERSION", llm_service.SQL_PROMPT_VERSION + 1)
+    service.generate_sql("Sites with missing pages")
+    assert model.calls == 3
+
+def test_failures_are_not_cached():
+    service, model = stub_service()
+    model.fail = True
+    fallback = service.generate_sql("missing pages count by site")
+    assert fallback.startswith("SELECT site_number")
+    model.fail = False
+    assert service.generate_sql("missing pages count by site").startswith("SELECT ")
+    assert model.calls == 2
+
+def test_ttl_and_size_limits(monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_MAX_ENTRIES", 3)
+    service, model = stub_service()
+    for i in range(5):
+        service.generate_sql(f"question {i}")
+    assert llm_cache.stats()["entries"] == 3
+    # Expired entries are misses
+    key = llm_cache.make_key("stub", "stub-1", llm_service.SQL_PROMPT_VERSION, "sql", "question 4")
+    with llm_cache.connect() as conn:
+        conn.execute("UPDATE llm_cache SET created_at = ? WHERE key = ?", (time.time() - 7200, key))
+    assert llm_cache.get(key) is None
+    calls = model.calls
+    service.generate_sql("question 4")
+    assert model.calls == calls + 1
+
+def test_sql_that_fails_to_run_is_not_served_again():
+    from database import engine
+    from migrations import run_migrations
+    from agent import ClinicalAgent
+    run_migrations(engine)
+    service, model = stub_service()
+    agent = ClinicalAgent(llm=service)
+    model.sql = "SELECT nonexistent_column FROM sae_metrics"
+    assert agent.query("Broken question")["data"] == []
+    model.sql = "SELECT count(*) AS count FROM sae_metrics"
+    assert agent.query("Broken question")["sql"] == model.sql
+    assert model.calls == 3  # SQL, SQL again, then the insight
+    # SQL that ran stays cached
+    agent.query("Broken question")
+    assert model.calls == 3
+
+def test_schema_is_created_once_per_file(monkeypatch):
+    statements = []
+    real_connect = sqlite3.connect
+
+    def tracing_connect(*args, **kwargs):
+        conn = real_connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", tracing_connect)
+    for i in range(3):
+        llm_cache.put(f"key {i}", "value", "stub", "stub-1", "sql")
+        llm_cache.get(f"key {i}")
+    assert sum(1 for statement in statements if statement.startswith("CREATE")) == 2
@@ -0,0 +1,57 @@
+"""
+Checks for the Prometheus metrics and the /metrics endpoint, against the scratch database copy conftest.py sets up.
+Run with `python -m pytest test_metrics.py` from backend/.
+"""
+from fastapi.testclient import TestClient
+from metrics import REGISTRY, Counter, Histogram
+import main
+
+def unregistered(metric):
+    # Metrics made here would otherwise show up on /metrics for the rest of the process
+    REGISTRY.remove(metric)
+    return metric
+
+def test_histogram_buckets_are_cumulative():
+    histogram = unregistered(Histogram("test_seconds", "Test timings.", ["route"], buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.labels(route='/a "quoted"\npath').observe(value)
+    lines = histogram.render()
+    labels = 'route="/a \\"quoted\\"\\npath"'
+    assert lines[:2] == ["# HELP test_seconds Test timings.", "# TYPE test_seconds histogram"]
+    assert lines[2:] == [
+        f'test_seconds_bucket{{{labels},le="0.1"}} 1',
+        f'test_seconds_bucket{{{labels},le="1"}} 3',
+        f'test_seconds_bucket{{{labels},le="+Inf"}} 4',
+        f"test_seconds_sum{{{labels}}} 4.05",
+        f"test_seconds_count{{{labels}}} 4",
+    ]
+
+def test_counters_add_up_per_label_set():
+    counter = unregistered(Counter("test_total", "Test events.", ["kind"]))
+    counter.labels(kind="b").inc()
+    counter.labels(kind="a").inc(2)
+    counter.labels(kind="b").inc(0.5)
+    assert counter.render()[2:] == ['test_total{kind="a"} 2', 'test_total{kind="b"} 1.5']
+
+def request_count(body, route, status):
+    series = f'http_request_duration_seconds_count{{method="GET",route="{route}",status="{status}"}} '
+    counts = [int(line[len(series):]) for line in body.splitlines() if line.startswith(series)]
+    return counts[0] if counts else 0
+
+def test_requests_are_labelled_by_route_template():
+    client = TestClient(main.app)
+    before = client.get("/metrics").text
+    for site in ("1", "2", "3"):
+        assert client.get(f"/sites/{site}/patients", params={"limit": 1}).status_code == 200
+    assert client.get("/no/such/page").status_code == 404
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    body = response.text
+    # Other tests in the session may have hit the same routes already
+    for route, status, requests in (("/sites/{site_number}/patients", 200, 3), ("unmatched", 404, 1)):
+        assert request_count(body, route, status) - request_count(before, route, status) == requests
+    # Raw paths would give every site its own series
+    assert 'route="/sites/1/patients"' not in body
+    assert 'db_query_duration_seconds_count{pool="read"}' in body
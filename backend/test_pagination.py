@@ -0,0 +1,79 @@
+"""
+Checks for keyset pagination, on in-memory records and through the risk monitor endpoint.
+Run with `python -m pytest test_pagination.py` from backend/.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from pagination import encode_cursor, paginate_records
+import main
+
+# Repeated and missing sort values, so the tie key has to keep pages apart
+RECORDS = [{"id": f"S{i:02d}", "dqi": None if i % 9 == 0 else i % 4} for i in range(23)]
+
+def walk(records, sort, descending, limit, tie_key="id"):
+    pages, cursor = [], None
+    while True:
+        items, cursor = paginate_records(records, sort, descending, limit, cursor, tie_key=tie_key)
+        pages.append(items)
+        if cursor is None:
+            return pages
+
+def test_pages_cover_every_record_once_in_order():
+    for descending in (False, True):
+        pages = walk(RECORDS, "dqi", descending, limit=5)
+        assert [len(items) for items in pages] == [5, 5, 5, 5, 3]
+        served = [record for items in pages for record in items]
+        expected = sorted(RECORDS, key=lambda r: (r["dqi"] is not None, r["dqi"] or 0, r["id"]), reverse=descending)
+        assert served == expected
+
+def test_exact_final_page_has_no_cursor():
+    items, cursor = paginate_records(RECORDS[:10], "id", False, 10, tie_key="id")
+    assert len(items) == 10 and cursor is None
+    assert paginate_records([], "id", False, 10) == ([], None)
+
+def test_cursor_survives_rows_removed_before_it():
+    first, cursor = paginate_records(RECORDS, "id", False, 5, tie_key="id")
+    remaining = [record for record in RECORDS if record not in first[:3]]
+    second, _ = paginate_records(remaining, "id", False, 5, cursor, tie_key="id")
+    assert [record["id"] for record in second] == ["S05", "S06", "S07", "S08", "S09"]
+
+def test_bad_cursors_are_rejected():
+    for cursor in ("not-a-cursor", encode_cursor([[True, "text"], [True, "S01"]])):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            paginate_records(RECORDS, "dqi", False, 5, cursor, tie_key="id")
+
+def test_risk_monitor_pages_through_every_site():
+    client = TestClient(main.app)
+    everything = client.get("/analytics/risk-monitor", params={"limit": 500, "sort": "dqi", "order": "desc"}).json()
+    assert everything["total"] > 3 and everything["next_cursor"] is None
+
+    served, cursor = [], None
+    while True:
+        params = {"limit": 3, "sort": "dqi", "order": "desc", **({"cursor": cursor} if cursor else {})}
+        body = client.get("/analytics/risk-monitor", params=params).json()
+        assert body["total"] == everything["total"]
+        served += [site["id"] for site in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert served == [site["id"] for site in everything["items"]]
+
+    assert client.get("/analytics/risk-monitor", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/analytics/risk-monitor", params={"sort": "password"}).status_code == 400
+
+def test_site_patients_with_repeated_subject_ids_page_completely():
+    client = TestClient(main.app)
+    everything = client.get("/sites/Site 2/patients", params={"limit": 500}).json()["topics"]
+    # The same subject id appears on several rows of this site
+    assert len({patient["subject_id"] for patient in everything}) < len(everything)
+
+    served, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/sites/Site 2/patients", params=params).json()
+        served += [patient["id"] for patient in body["topics"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert served == [patient["id"] for patient in everything]
+    assert len(set(served)) == len(everything)
@@ -0,0 +1,69 @@
+"""
+Checks for the Parquet parse cache, on throwaway workbooks and cache directories.
+Run with `python -m pytest test_parse_cache.py` from backend/.
+"""
+import os
+
+import pandas as pd
+import pytest
+import parse_cache
+
+pytest.importorskip("pyarrow")
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(parse_cache, "CACHE_MAX_MB", 50)
+
+def write_workbook(path, rows=40):
+    pd.DataFrame({"Site": [f"Site {i % 4}" for i in range(rows)], "Subject": range(rows)}).to_excel(path, index=False)
+    return str(path)
+
+def test_second_read_comes_from_the_cache(tmp_path, monkeypatch):
+    path = write_workbook(tmp_path / "sheet.xlsx")
+    first = parse_cache.read_workbook(path)
+    assert parse_cache.find_entry(parse_cache.compute_file_hash(path))
+
+    monkeypatch.setattr(pd, "read_excel", lambda *a, **k: pytest.fail("re-parsed a cached workbook"))
+    second = parse_cache.read_workbook(path)
+    assert second.astype(str).equals(first.astype(str))
+
+def test_unreadable_entries_are_dropped(tmp_path):
+    path = write_workbook(tmp_path / "sheet.xlsx")
+    parse_cache.read_workbook(path)
+    content_hash = parse_cache.compute_file_hash(path)
+    with open(parse_cache.find_entry(content_hash), "wb") as f:
+        f.write(b"not parquet")
+    assert parse_cache.load(content_hash) is None
+    assert parse_cache.find_entry(content_hash) is None
+
+def test_preview_reads_only_the_first_rows(tmp_path, monkeypatch):
+    path = write_workbook(tmp_path / "sheet.xlsx")
+    calls = []
+    read_excel = pd.read_excel
+    monkeypatch.setattr(pd, "read_excel", lambda *a, **k: calls.append(k) or read_excel(*a, **k))
+
+    preview = parse_cache.preview_workbook(path, rows=5)
+    assert list(preview.columns) == ["Site", "Subject"] and len(preview) == 5
+    assert calls == [{"nrows": 5}]
+    # A preview doesn't fill the cache
+    assert parse_cache.find_entry(parse_cache.compute_file_hash(path)) is None
+
+    parse_cache.read_workbook(path)
+    calls.clear()
+    cached = parse_cache.preview_workbook(path, rows=5)
+    assert len(cached) == 5 and calls == []
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    frame = pd.DataFrame({"Site": [f"Site {i % 4}" for i in range(200)], "Subject": range(200)})
+    for age, content_hash in enumerate(("a" * 64, "b" * 64, "c" * 64)):
+        parse_cache.store(content_hash, frame)
+        os.utime(parse_cache.find_entry(content_hash), (1000 + age, 1000 + age))
+    # Reading the oldest entry makes it the most recently used
+    assert parse_cache.load("a" * 64) is not None
+
+    size = os.path.getsize(parse_cache.find_entry("a" * 64))
+    monkeypatch.setattr(parse_cache, "CACHE_MAX_MB", 2.5 * size / (1024 * 1024))
+    parse_cache.store("d" * 64, frame)
+    assert parse_cache.find_entry("b" * 64) is None and parse_cache.find_entry("c" * 64) is None
+    assert parse_cache.find_entry("a" * 64) and parse_cache.find_entry("d" * 64)
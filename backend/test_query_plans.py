@@ -0,0 +1,128 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot analytics queries, against a throwaway database.
+Run with `python -m pytest test_query_plans.py` from backend/.
+"""
+import re
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from database import apply_pragmas
+from migrations import MIGRATIONS, run_migrations
+from rollups import refresh_summaries
+import analytics
+import models
+
+HOT_TABLES = ("sae_metrics", "missing_pages", "edc_metrics")
+READS_HOT_TABLE = re.compile(rf"\b(FROM|JOIN)\s+({'|'.join(HOT_TABLES)})\b")
+
+def seed(db):
+    for site in range(1, 6):
+        for subject in range(1, 4):
+            site_number, subject_id = f"Site {site}", f"Subject {site}0{subject}"
+            db.add(models.EDCMetrics(study_id="STUDY_1", site_id=site_number, subject_id=subject_id,
+                                     subject_status="Active", site_key=str(site), subject_key=f"{site}0{subject}"))
+            db.add(models.MissingPages(study_id="STUDY_1", site_number=site_number, subject_name=subject_id,
+                                       form_name="AE", missing_days=subject, site_key=str(site), subject_key=f"{site}0{subject}"))
+            db.add(models.SAEMetrics(study_id="STUDY_1", site=site_number, patient_id=subject_id,
+                                     review_status="Pending" if subject == 1 else "Reviewed",
+                                     site_key=str(site), subject_key=f"{site}0{subject}"))
+    db.commit()
+
+def captured_statements(engine, fn):
+    """Run fn and return the (sql, params) of every SELECT it issues against the hot tables."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and READS_HOT_TABLE.search(statement):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+def query_plan(engine, statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+def assert_indexed(engine, fn):
+    """Every access to a hot table in fn's queries must go through an index, never a full table scan."""
+    statements = captured_statements(engine, fn)
+    assert statements, "no queries captured"
+    used = set()
+    for statement, parameters in statements:
+        for detail in query_plan(engine, statement, parameters):
+            if not any(f" {table}" in detail for table in HOT_TABLES):
+                continue
+            assert "USING" in detail, f"full table scan: {detail}\n{statement}"
+            used.add(detail.split(" INDEX ")[-1].split(" ")[0])
+    return used
+
+# A dedicated engine on a throwaway file, so seeding can never reach the database.engine another
+# test module (or an earlier import) already bound to DATABASE_URL
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('query_plans') / 'plans.db'}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", lambda dbapi_connection, record: apply_pragmas(dbapi_connection))
+    run_migrations(engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        seed(db)
+        refresh_summaries(db)
+        db.commit()
+    finally:
+        db.close()
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def SessionLocal(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def test_migrations_are_recorded(engine):
+    with engine.connect() as conn:
+        version = conn.execute(text("PRAGMA user_version")).scalar()
+        indexes = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert version == max(m[0] for m in MIGRATIONS)
+    assert {"ix_sae_metrics_site_review", "ix_missing_pages_study_site_subject", "ix_edc_metrics_site_subject"} <= indexes
+    # Re-running is a no-op
+    run_migrations(engine)
+
+def test_risk_monitor_reads_rollups_only(engine, SessionLocal):
+    db = SessionLocal()
+    try:
+        statements = captured_statements(engine, lambda: analytics.get_detailed_risk_data(db))
+        statements += captured_statements(engine, lambda: analytics.calculate_study_health_score(db))
+    finally:
+        db.close()
+    assert not statements, f"dashboard reads touched raw tables: {statements}"
+
+def test_rollup_refresh_uses_indexes(engine, SessionLocal):
+    db = SessionLocal()
+    try:
+        used = assert_indexed(engine, lambda: refresh_summaries(db, ["STUDY_1"]))
+        db.rollback()
+    finally:
+        db.close()
+    assert "ix_sae_metrics_study_site_review" in used
+    assert "ix_missing_pages_study_site_subject" in used
+
+def test_patient_drilldown_uses_indexes(engine, SessionLocal):
+    db = SessionLocal()
+    try:
+        used = assert_indexed(engine, lambda: analytics.get_sites_patients_data(db, ["Site 1", "Site 3"]))
+    finally:
+        db.close()
+    assert "ix_sae_metrics_site_subject_review" in used
+    assert "ix_missing_pages_site_subject" in used
+
+def test_data_quality_index_uses_indexes(engine, SessionLocal):
+    db = SessionLocal()
+    try:
+        assert_indexed(engine, lambda: analytics.calculate_data_quality_index(db, "Site 2"))
+    finally:
+        db.close()
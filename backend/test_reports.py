@@ -0,0 +1,99 @@
+"""
+Report pack and report store checks against the scratch database copy conftest.py sets up.
+Run with `python -m pytest test_reports.py` from backend/.
+"""
+import os
+import pytest
+from fastapi.testclient import TestClient
+from database import SessionLocal, engine
+from migrations import run_migrations
+from rollups import refresh_summaries
+from cache import bump_generation
+from jobs import Job
+from report_store import build_report, report_context, report_params, request_report
+from reports import merge_pdfs, render_section, report_sections
+import analytics
+import models
+import main
+
+def setup_module(module=None):
+    run_migrations(engine)
+    with SessionLocal() as db:
+        refresh_summaries(db)
+        db.commit()
+
+def test_risk_rows_carry_the_rollup_study_id():
+    with SessionLocal() as db:
+        risk_data = analytics.get_detailed_risk_data(db)
+        rollup = {(row.study_id, row.site_key) for row in db.query(models.SiteRiskSummary).filter(models.SiteRiskSummary.missing_pages > 0)}
+    assert risk_data
+    assert {tuple(site["id"].split("/", 1)) for site in risk_data} == rollup
+    assert len({site["id"] for site in risk_data}) == len(risk_data)
+
+def test_sections_are_one_per_real_study():
+    with SessionLocal() as db:
+        context = report_context(db, report_params())
+        studies = sorted({site["study_id"] for site in context["sites"]})
+        sections = report_sections(context)
+        assert [section["study_id"] for section in sections] == studies
+        for section in sections:
+            assert {site["study_id"] for site in section["sites"]} == {section["study_id"]}
+
+        single = report_context(db, report_params(studies[0]))
+    assert single["sites"] and {site["study_id"] for site in single["sites"]} == {studies[0]}
+    assert [section["study_id"] for section in report_sections(single)] == [studies[0]]
+
+def test_identical_requests_share_one_artifact():
+    with SessionLocal() as db:
+        study = report_context(db, report_params())["sites"][0]["study_id"]
+        first, reused = request_report(db, report_params(study), "job-1")
+        assert not reused and first.status == "queued"
+        again, reused = request_report(db, report_params(study), "job-2")
+        assert reused and again.id == first.id
+        other, reused = request_report(db, report_params(), "job-3")
+        assert not reused and other.id != first.id
+
+        # Reports of older data aren't handed out once ingestion has moved the generation on
+        bump_generation(db)
+        db.commit()
+        fresh, reused = request_report(db, report_params(study), "job-4")
+        assert not reused and fresh.id != first.id
+
+def test_built_report_is_downloaded_and_reused():
+    client = TestClient(main.app)
+    with SessionLocal() as db:
+        study = report_context(db, report_params())["sites"][-1]["study_id"]
+        artifact, _ = request_report(db, report_params(study), "job-build")
+        artifact_id = artifact.id
+    assert client.get(f"/reports/{artifact_id}/download").status_code == 409
+
+    job = Job("report")
+    built = build_report(job, artifact_id)
+    assert built["state"] == "ready" and built["size_bytes"] > 0 and built["site_count"] > 0
+    assert [stage for stage, entry in job.stages.items() if entry["status"] == "done"] == ["data", "render"]
+    download = client.get(f"/reports/{artifact_id}/download")
+    assert download.status_code == 200 and download.content.startswith(b"%PDF")
+
+    response = client.post("/reports/generate", json={"study": study}).json()
+    assert response["reused"] and response["id"] == artifact_id and response["state"] == "ready"
+
+    # A ready row whose file is gone is rendered again rather than served
+    with SessionLocal() as db:
+        os.remove(db.get(models.ReportArtifact, artifact_id).path)
+        replacement, reused = request_report(db, report_params(study), "job-rebuild")
+    assert not reused and replacement.id != artifact_id
+    assert client.get(f"/reports/{artifact_id}/download").status_code == 409
+
+def test_merged_pack_keeps_every_page_in_order(tmp_path):
+    pypdf = pytest.importorskip("pypdf")
+    parts = [
+        render_section({"study_id": f"STUDY_{s}", "sites": [{"site": f"Site {s}-{i}", "study_id": f"STUDY_{s}"} for i in range(40 * s)]},
+                       str(tmp_path / f"section-{s}.pdf"))
+        for s in (1, 2, 3)
+    ]
+    expected = [page.extract_text() for part in parts for page in pypdf.PdfReader(part).pages]
+    merge_pdfs(parts, str(tmp_path / "pack.pdf"))
+
+    merged = pypdf.PdfReader(str(tmp_path / "pack.pdf"), strict=True)
+    assert len(expected) > len(parts)
+    assert [page.extract_text() for page in merged.pages] == expected
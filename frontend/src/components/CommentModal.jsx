@@ -5,6 +5,7 @@ import { Send, User, Clock } from 'lucide-react';
 
 const CommentModal = ({ isOpen, onClose, siteNumber }) => {
     const [comments, setComments] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [newComment, setNewComment] = useState('');
     const [tag, setTag] = useState('Info');
     const [loading, setLoading] = useState(false);
@@ -15,11 +16,15 @@ const CommentModal = ({ isOpen, onClose, siteNumber }) => {
         }
     }, [isOpen, siteNumber]);
 
-    const fetchComments = async () => {
+    // Newest first, one page at a time; "Load older" follows the cursor
+    const fetchComments = async (cursor = null) => {
         try {
-            const res = await fetch(`http://127.0.0.1:8000/sites/${siteNumber}/comments`);
+            const params = new URLSearchParams({ limit: 20 });
+            if (cursor) params.set('cursor', cursor);
+            const res = await fetch(`http://127.0.0.1:8000/sites/${siteNumber}/comments?${params}`);
             const data = await res.json();
-            setComments(data);
+            setComments(prev => cursor ? [...prev, ...data.items] : data.items);
+            setNextCursor(data.next_cursor);
         } catch (error) {
             console.error("Failed to fetch comments", error);
         }
@@ -83,6 +88,14 @@ const CommentModal = ({ isOpen, onClose, siteNumber }) => {
                             </div>
                         ))
                     )}
+                    {nextCursor && (
+                        <button
+                            onClick={() => fetchComments(nextCursor)}
+                            className="w-full text-center text-blue-600 dark:text-blue-400 text-xs font-medium hover:underline"
+                        >
+                            Load older comments
+                        </button>
+                    )}
                 </div>
                 
                 <form onSubmit={handleSubmit} className="border-t border-slate-100 dark:border-slate-700 pt-4">
@@ -6,6 +6,7 @@ import { User, CheckCircle, AlertCircle, FileText, Activity } from 'lucide-react
 const SiteDetailsModal = ({ isOpen, onClose, siteNumber }) => {
     const [data, setData] = useState(null);
     const [loading, setLoading] = useState(false);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     useEffect(() => {
         if (isOpen && siteNumber) {
@@ -16,7 +17,7 @@ const SiteDetailsModal = ({ isOpen, onClose, siteNumber }) => {
     const fetchData = async () => {
         setLoading(true);
         try {
-            const res = await fetch(`http://127.0.0.1:8000/sites/${siteNumber}/patients`);
+            const res = await fetch(`http://127.0.0.1:8000/sites/${siteNumber}/patients?limit=50`);
             const json = await res.json();
             setData(json);
         } catch (error) {
@@ -26,6 +27,21 @@ const SiteDetailsModal = ({ isOpen, onClose, siteNumber }) => {
         }
     };
 
+    // Patients arrive a page at a time; the site totals come with the first page
+    const fetchMore = async () => {
+        setLoadingMore(true);
+        try {
+            const params = new URLSearchParams({ limit: 50, cursor: data.next_cursor });
+            const res = await fetch(`http://127.0.0.1:8000/sites/${siteNumber}/patients?${params}`);
+            const json = await res.json();
+            setData(prev => ({ ...json, topics: [...prev.topics, ...json.topics] }));
+        } catch (error) {
+            console.error("Failed to fetch site details", error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     return (
         <Modal isOpen={isOpen} onClose={onClose} title={`Site Analysis: ${siteNumber}`}>
             {loading ? (
@@ -41,7 +57,7 @@ const SiteDetailsModal = ({ isOpen, onClose, siteNumber }) => {
                         <div className="bg-emerald-50 dark:bg-emerald-900/20 p-4 rounded-xl border border-emerald-100 dark:border-emerald-800">
                             <p className="text-emerald-600 dark:text-emerald-400 text-xs font-semibold uppercase">Clean Patient Rate</p>
                             <h4 className="text-2xl font-bold text-slate-800 dark:text-white mt-1">{data.clean_patient_rate}%</h4>
-                            <p className="text-[10px] text-emerald-600/70">{(data.topics.filter(p => p.is_clean).length)} / {data.total_patients} subjects clean</p>
+                            <p className="text-[10px] text-emerald-600/70">{data.clean_patient_count} / {data.total_patients} subjects clean</p>
                         </div>
                     </div>
 
@@ -81,6 +97,15 @@ const SiteDetailsModal = ({ isOpen, onClose, siteNumber }) => {
                                     </div>
                                 </div>
                             ))}
+                            {data.next_cursor && (
+                                <button
+                                    onClick={fetchMore}
+                                    disabled={loadingMore}
+                                    className="w-full text-center text-indigo-600 text-xs font-medium hover:underline disabled:opacity-50 py-2"
+                                >
+                                    {loadingMore ? 'Loading...' : `Load more patients (${data.total_matching - data.topics.length} remaining)`}
+                                </button>
+                            )}
                         </div>
                     </div>
                 </div>
@@ -3,6 +3,9 @@ import React, { useState, useRef, useEffect } from 'react';
 import { UploadCloud, CheckCircle, Database, Play, RefreshCw, Upload } from 'lucide-react';
 import { motion, AnimatePresence } from 'framer-motion';
 
+// Progress bar position once each backend stage has finished
+const STAGE_PROGRESS = { upload: 25, parse: 50, validate: 75, write: 100 };
+
 const DataIngestion = () => {
     const [status, setStatus] = useState('idle'); // idle, uploading, processing, complete, error
     const [progress, setProgress] = useState(0);
@@ -31,6 +34,54 @@ const DataIngestion = () => {
         if(fileInputRef.current) fileInputRef.current.click();
     };
 
+    const describeEvent = (event) => {
+        const label = event.stage.charAt(0).toUpperCase() + event.stage.slice(1);
+        if (event.status === 'failed') return `${label} failed: ${event.error}`;
+        if (event.status === 'skipped') return `${label} skipped: ${event.detail}`;
+        if (event.status === 'running') return `${label} started...`;
+        const rows = event.rows !== undefined ? ` ${event.rows} rows` : '';
+        const bytes = event.bytes !== undefined ? ` ${(event.bytes / 1024).toFixed(1)} KB` : '';
+        const seconds = event.seconds !== undefined ? ` in ${event.seconds}s` : '';
+        return `${label} complete:${rows}${bytes}${seconds}`;
+    };
+
+    // Follow the backend job over Server-Sent Events until it finishes
+    const followJob = (jobId) => {
+        const source = new EventSource(`http://127.0.0.1:8000/ingest/jobs/${jobId}/events`);
+
+        source.addEventListener('progress', (e) => {
+            const event = JSON.parse(e.data);
+            if (event.stage === 'upload') return; // already logged by the upload request
+            addLog(describeEvent(event));
+            if (event.status === 'done' || event.status === 'skipped') {
+                setProgress(STAGE_PROGRESS[event.stage] ?? 100);
+            }
+        });
+
+        source.addEventListener('end', (e) => {
+            const job = JSON.parse(e.data);
+            source.close();
+            if (job.status === 'complete') {
+                setProgress(100);
+                setStatus('complete');
+                addLog(`Ingestion complete in ${job.seconds}s. Knowledge base updated.`);
+
+                const now = new Date().toLocaleString();
+                setLastSync(now);
+                localStorage.setItem('last_ingestion_sync', now);
+            } else {
+                setStatus('error');
+                addLog(`Error: ${job.error}`);
+            }
+        });
+
+        source.onerror = () => {
+            source.close();
+            setStatus('error');
+            addLog("Error: Lost connection to the ingestion job.");
+        };
+    };
+
     const startPipeline = async (filename) => {
         setStatus('uploading');
         setProgress(0);
@@ -45,7 +96,7 @@ const DataIngestion = () => {
 
         try {
             // Upload Phase
-            setProgress(30);
+            setProgress(10);
             addLog("Uploading file to secure storage...");
             
             const response = await fetch('http://127.0.0.1:8000/ingest/file', {
@@ -53,30 +104,16 @@ const DataIngestion = () => {
                 body: formData,
             });
 
-            if (response.ok) {
-                setProgress(60);
+            const result = response.ok ? await response.json() : null;
+            if (result?.job_id) {
+                const { job_id } = result;
+                setProgress(STAGE_PROGRESS.upload);
                 setStatus('processing');
-                addLog("Upload complete. Triggering ingestion engine...");
-                
-                // Simulate processing delay for UX (since usage is async on backend)
-                setTimeout(() => {
-                    setProgress(85);
-                    addLog("Parsing entities and updating vector index...");
-                    
-                    setTimeout(() => {
-                        setProgress(100);
-                        setStatus('complete');
-                        addLog("Ingestion complete. Knowledge base updated.");
-                        
-                        const now = new Date().toLocaleString();
-                        setLastSync(now);
-                        localStorage.setItem('last_ingestion_sync', now);
-                    }, 1500);
-                }, 1500);
-
+                addLog(`Upload complete. Ingestion job ${job_id.slice(0, 8)} queued...`);
+                followJob(job_id);
             } else {
                 setStatus('error');
-                addLog("Error: Upload failed.");
+                addLog(`Error: ${result?.message || "Upload failed."}`);
             }
         } catch (error) {
             console.error(error);
@@ -142,7 +179,7 @@ const DataIngestion = () => {
                             <p className="text-slate-500 dark:text-slate-400 max-w-md mb-8">
                                 {status === 'idle' ? 'Upload new clinical study reports (Excel/PDF) to update the risk monitoring engine.' : 
                                  status === 'complete' ? 'New data is now available in Risk Monitor and Agent Copilot.' :
-                                 `Current operation: ${progress < 50 ? 'Uploading files...' : 'Vectorizing content...'}`}
+                                 `Current operation: ${progress < STAGE_PROGRESS.upload ? 'Uploading file...' : progress < STAGE_PROGRESS.validate ? 'Parsing and validating...' : 'Writing to database...'}`}
                             </p>
                             
                             <button 
@@ -1,31 +1,28 @@
 
-import React from 'react';
+import React, { useState } from 'react';
 import { FileText, Download, Clock } from 'lucide-react';
 import { motion } from 'framer-motion';
+import { generateReport, downloadReport, fetchReports } from '../reportJobs';
 
 const Reports = ({ searchQuery, reports, setReports }) => {
     
+    const [generating, setGenerating] = useState(false);
+
+    const refreshReports = () => fetchReports().then(setReports).catch(err => console.error(err));
+
     const handleGenerate = async () => {
+        setGenerating(true);
         try {
-            const response = await fetch('http://127.0.0.1:8000/reports/generate', {
-                method: 'POST',
-            });
-            
-            if (response.ok) {
-                const blob = await response.blob();
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = "risk_assessment_report.pdf";
-                document.body.appendChild(a);
-                a.click();
-                a.remove();
-            } else {
-                alert("Failed to generate report");
-            }
+            const pending = generateReport();
+            // Show the queued report in the list while it renders
+            setTimeout(refreshReports, 300);
+            await pending;
         } catch (error) {
             console.error("Report generation failed", error);
             alert("Error generating report");
+        } finally {
+            setGenerating(false);
+            refreshReports();
         }
     };
 
@@ -43,9 +40,10 @@ const Reports = ({ searchQuery, reports, setReports }) => {
                 </div>
                 <button 
                     onClick={handleGenerate}
-                    className="bg-blue-600 hover:bg-blue-700 text-white px-6 py-3 rounded-xl font-bold shadow-lg shadow-blue-500/30 flex items-center gap-2 transition-all hover:scale-105 active:scale-95"
+                    disabled={generating}
+                    className="disabled:opacity-60 bg-blue-600 hover:bg-blue-700 text-white px-6 py-3 rounded-xl font-bold shadow-lg shadow-blue-500/30 flex items-center gap-2 transition-all hover:scale-105 active:scale-95"
                 >
-                    <FileText className="w-5 h-5" /> Generate New Report
+                    <FileText className="w-5 h-5" /> {generating ? 'Generating...' : 'Generate New Report'}
                 </button>
             </div>
 
@@ -80,7 +78,7 @@ const Reports = ({ searchQuery, reports, setReports }) => {
                                  <button
                                     onClick={(e) => {
                                         e.stopPropagation();
-                                        alert(`Downloading ${report.title}...`);
+                                        downloadReport(report.id);
                                     }}
                                     className="w-full mt-4 flex items-center justify-center gap-2 py-2 text-sm text-blue-600 dark:text-blue-400 font-medium hover:bg-blue-50 dark:hover:bg-blue-900/20 rounded-lg transition-colors"
                                  >
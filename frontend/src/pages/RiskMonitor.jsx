@@ -5,56 +5,65 @@ import { motion } from 'framer-motion';
 import Modal from '../components/Modal';
 import CommentModal from '../components/CommentModal';
 import SiteDetailsModal from '../components/SiteDetailsModal';
+import { generateReport } from '../reportJobs';
+
+const API_URL = 'http://127.0.0.1:8000';
+const PAGE_SIZE = 50;
 
 const RiskMonitor = ({ searchQuery = "" }) => {
   const [riskData, setRiskData] = useState([]);
+  const [riskCounts, setRiskCounts] = useState({ High: 0, Medium: 0, Low: 0 });
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filterOpen, setFilterOpen] = useState(false);
   const [selectedStudy, setSelectedStudy] = useState('All');
+  const [studies, setStudies] = useState([]);
   const [commentModalOpen, setCommentModalOpen] = useState(false);
   const [detailsModalOpen, setDetailsModalOpen] = useState(false);
   const [selectedSite, setSelectedSite] = useState(null);
 
-  useEffect(() => {
-    fetch('http://127.0.0.1:8000/analytics/risk-monitor')
+  /* Sorting Logic */
+  const [sortConfig, setSortConfig] = useState({ key: 'dqi', direction: 'ascending' });
+
+  /* Search, study filter, sort and paging all happen on the server */
+  const fetchPage = (cursor = null, signal) => {
+    const params = new URLSearchParams({
+      sort: sortConfig.key,
+      order: sortConfig.direction === 'ascending' ? 'asc' : 'desc',
+      limit: PAGE_SIZE,
+    });
+    if (searchQuery) params.set('q', searchQuery);
+    if (selectedStudy !== 'All') params.set('study', selectedStudy);
+    if (cursor) params.set('cursor', cursor);
+
+    return fetch(`${API_URL}/analytics/risk-monitor?${params}`, { signal })
       .then(res => res.json())
       .then(data => {
-          setRiskData(data);
+          setRiskData(prev => cursor ? [...prev, ...data.items] : data.items);
+          setNextCursor(data.next_cursor);
+          setTotal(data.total);
+          setRiskCounts(data.risk_counts);
+          setStudies(data.studies);
           setLoading(false);
-      })
-      .catch(err => console.error("Risk API Error", err));
-  }, []);
-
-  const filteredData = riskData.filter(site => {
-      if (!site) return false;
-      const matchesSearch = 
-        (site.site?.toLowerCase().includes(searchQuery.toLowerCase()) || false) || 
-        (site.country?.toLowerCase().includes(searchQuery.toLowerCase()) || false) ||
-        (site.risk_level?.toLowerCase().includes(searchQuery.toLowerCase()) || false);
-      
-      const matchesStudy = selectedStudy === 'All' || site.study_id === selectedStudy;
-      
-      return matchesSearch && matchesStudy;
-  });
+      });
+  };
 
-  /* Sorting Logic */
-  const [sortConfig, setSortConfig] = useState({ key: 'dqi', direction: 'ascending' });
+  useEffect(() => {
+    // A newer search or sort cancels the request still in flight
+    const controller = new AbortController();
+    fetchPage(null, controller.signal)
+      .catch(err => { if (err.name !== 'AbortError') console.error("Risk API Error", err); });
+    return () => controller.abort();
+  }, [searchQuery, selectedStudy, sortConfig]);
 
-  const sortedData = React.useMemo(() => {
-    let sortableItems = [...filteredData];
-    if (sortConfig !== null) {
-      sortableItems.sort((a, b) => {
-        if (a[sortConfig.key] < b[sortConfig.key]) {
-          return sortConfig.direction === 'ascending' ? -1 : 1;
-        }
-        if (a[sortConfig.key] > b[sortConfig.key]) {
-          return sortConfig.direction === 'ascending' ? 1 : -1;
-        }
-        return 0;
-      });
-    }
-    return sortableItems;
-  }, [filteredData, sortConfig]);
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchPage(nextCursor)
+      .catch(err => console.error("Risk API Error", err))
+      .finally(() => setLoadingMore(false));
+  };
 
   const requestSort = (key) => {
     let direction = 'ascending';
@@ -72,22 +81,7 @@ const RiskMonitor = ({ searchQuery = "" }) => {
 
   const handleGenerateReport = async () => {
     try {
-        const response = await fetch('http://127.0.0.1:8000/reports/generate', {
-            method: 'POST',
-        });
-        
-        if (response.ok) {
-            const blob = await response.blob();
-            const url = window.URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = "risk_assessment_report.pdf";
-            document.body.appendChild(a);
-            a.click();
-            a.remove();
-        } else {
-            alert("Failed to generate report");
-        }
+        await generateReport(selectedStudy === 'All' ? null : selectedStudy);
     } catch (error) {
         console.error("Report generation failed", error);
         alert("Error generating report");
@@ -128,7 +122,7 @@ const RiskMonitor = ({ searchQuery = "" }) => {
             </div>
             <div>
                 <p className="text-slate-500 dark:text-slate-400 text-sm font-medium">High Risk Sites</p>
-                <h3 className="text-2xl font-bold text-slate-800 dark:text-white">{riskData.filter(r => r.risk_level === 'High').length}</h3>
+                <h3 className="text-2xl font-bold text-slate-800 dark:text-white">{riskCounts.High}</h3>
                 <p className="text-xs text-rose-500 dark:text-rose-400 mt-1 font-medium">Immediate Action Required</p>
             </div>
          </div>
@@ -138,7 +132,7 @@ const RiskMonitor = ({ searchQuery = "" }) => {
             </div>
             <div>
                 <p className="text-slate-500 dark:text-slate-400 text-sm font-medium">Medium Risk Sites</p>
-                <h3 className="text-2xl font-bold text-slate-800 dark:text-white">{riskData.filter(r => r.risk_level === 'Medium').length}</h3>
+                <h3 className="text-2xl font-bold text-slate-800 dark:text-white">{riskCounts.Medium}</h3>
                 <p className="text-xs text-amber-600 dark:text-amber-400 mt-1 font-medium">Monitor Closely</p>
             </div>
          </div>
@@ -148,7 +142,7 @@ const RiskMonitor = ({ searchQuery = "" }) => {
             </div>
             <div>
                 <p className="text-slate-500 dark:text-slate-400 text-sm font-medium">Low Risk Sites</p>
-                <h3 className="text-2xl font-bold text-slate-800 dark:text-white">{riskData.filter(r => r.risk_level === 'Low').length}</h3>
+                <h3 className="text-2xl font-bold text-slate-800 dark:text-white">{riskCounts.Low}</h3>
                 <p className="text-xs text-emerald-600 dark:text-emerald-400 mt-1 font-medium">Performing Well</p>
             </div>
          </div>
@@ -158,9 +152,9 @@ const RiskMonitor = ({ searchQuery = "" }) => {
       <div className="bg-white dark:bg-slate-800 rounded-2xl border border-slate-200 dark:border-slate-700 shadow-sm overflow-hidden min-h-[400px] transition-colors">
          <div className="px-6 py-4 border-b border-slate-100 dark:border-slate-700 flex justify-between items-center bg-slate-50/50 dark:bg-slate-800/50">
              <h3 className="font-semibold text-slate-700 dark:text-slate-200">Detailed Site Analysis</h3>
-             <div className="text-xs text-slate-400 italic">Showing {filteredData.length} records</div>
+             <div className="text-xs text-slate-400 italic">Showing {riskData.length} of {total} records</div>
          </div>
-         {filteredData.length > 0 ? (
+         {riskData.length > 0 ? (
              <table className="w-full text-sm text-left">
                   <thead className="bg-slate-50 dark:bg-slate-900/50 text-slate-500 dark:text-slate-400 font-medium">
                       <tr>
@@ -174,21 +168,17 @@ const RiskMonitor = ({ searchQuery = "" }) => {
                           <th className="px-6 py-3 cursor-pointer" onClick={() => requestSort('sae_count')}>
                               SAE Count {sortConfig.key === 'sae_count' && (sortConfig.direction === 'ascending' ? '↑' : '↓')}
                           </th>
-                          <th className="px-6 py-3 cursor-pointer" onClick={() => requestSort('protocol_deviations')}>
-                              Deviations {sortConfig.key === 'protocol_deviations' && (sortConfig.direction === 'ascending' ? '↑' : '↓')}
-                          </th>
-                          <th className="px-6 py-3 cursor-pointer" onClick={() => requestSort('query_resolution_rate')}>
-                              Query Rate {sortConfig.key === 'query_resolution_rate' && (sortConfig.direction === 'ascending' ? '↑' : '↓')}
-                          </th>
+                          <th className="px-6 py-3">Deviations</th>
+                          <th className="px-6 py-3">Query Rate</th>
                           <th className="px-6 py-3">Risk Level</th>
                           <th className="px-6 py-3">AI Recommendation</th>
                           <th className="px-6 py-3">Actions</th>
                       </tr>
                   </thead>
                  <tbody className="divide-y divide-slate-100 dark:divide-slate-700">
-                     {sortedData.map((site, index) => (
+                     {riskData.map((site, index) => (
                          <motion.tr 
-                            initial={{ opacity: 0 }} animate={{ opacity: 1 }} transition={{ delay: index * 0.05 }}
+                            initial={{ opacity: 0 }} animate={{ opacity: 1 }} transition={{ delay: (index % PAGE_SIZE) * 0.05 }}
                             key={index} className="hover:bg-slate-50/80 dark:hover:bg-slate-700/50 transition-colors"
                          >
                              <td className="px-6 py-4 font-medium text-slate-700 dark:text-slate-200">{site.site}</td>
@@ -255,12 +245,23 @@ const RiskMonitor = ({ searchQuery = "" }) => {
                  </button>
              </div>
          )}
+         {nextCursor && (
+             <div className="px-6 py-4 border-t border-slate-100 dark:border-slate-700 text-center">
+                 <button
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="text-blue-600 dark:text-blue-400 text-sm font-medium hover:underline disabled:opacity-50"
+                 >
+                     {loadingMore ? 'Loading...' : `Load more sites (${total - riskData.length} remaining)`}
+                 </button>
+             </div>
+         )}
       </div>
 
       <Modal isOpen={filterOpen} onClose={() => setFilterOpen(false)} title="Filter by Study">
           <div className="space-y-2">
               <p className="text-sm text-slate-500 dark:text-slate-400 mb-4">Select a study to isolate specific site risks.</p>
-              {['All', 'Study 101 (Oncology)', 'Study 202 (Cardio)', 'Study 303 (Neuro)'].map((study) => (
+              {['All', ...studies].map((study) => (
                   <button
                     key={study}
                     onClick={() => { setSelectedStudy(study); setFilterOpen(false); }}
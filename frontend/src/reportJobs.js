@@ -0,0 +1,38 @@
+const API = 'http://127.0.0.1:8000';
+
+/* Queue a report (or reuse a stored one for unchanged data), wait until it is rendered, then download it */
+export const generateReport = async (study = null) => {
+    const response = await fetch(`${API}/reports/generate`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ study }),
+    });
+    if (!response.ok) throw new Error('Failed to queue report');
+    let report = await response.json();
+
+    while (report.state === 'queued' || report.state === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const status = await fetch(`${API}/reports/${report.id}`);
+        if (!status.ok) throw new Error('Failed to check report status');
+        report = await status.json();
+    }
+    if (report.state !== 'ready') throw new Error(report.error || 'Report generation failed');
+
+    downloadReport(report.id);
+    return report;
+};
+
+export const downloadReport = (reportId) => {
+    const a = document.createElement('a');
+    a.href = `${API}/reports/${reportId}/download`;
+    a.download = `risk_assessment_report_${reportId}.pdf`;
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
+};
+
+export const fetchReports = async () => {
+    const response = await fetch(`${API}/reports`);
+    if (!response.ok) throw new Error('Failed to load reports');
+    return response.json();
+};
@@ -1,8 +1,13 @@
 
 import os
+import sys
 import pandas as pd
 import glob
 
+# Reuse the backend's parse cache so headers come from already-parsed sheets when possible
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from parse_cache import preview_workbook
+
 # specific file patterns to check
 patterns = [
     "*SAE Dashboard*",
@@ -12,7 +17,7 @@ patterns = [
     "*Compiled_EDRR*"
 ]
 
-base_dir = "/Users/harshithhh/Desktop/Nest-Assignment/data/QC Anonymized Study Files"
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "QC Anonymized Study Files")
 
 def find_first_file(pattern):
     # recursive search
@@ -32,7 +37,7 @@ for p in patterns:
     if f:
         try:
             # Read first few rows just to get columns
-            df = pd.read_excel(f, nrows=5)
+            df = preview_workbook(f, rows=5)
             print(f"\n--- File Type: {p} ---")
             print(f"File: {os.path.basename(f)}")
             print("Columns:", list(df.columns))